@@ -45,6 +45,99 @@ class Settings(BaseSettings):
     gemini_thinking_budget: int = -1
     agent_tools_enabled: bool = True                  # Let the chat agent call tools (RAG search, browse, YouTube)
     agent_max_tool_calls: int = 5                     # Max tool-call rounds per response (agentic loop)
+    chat_prefetch_timeout_seconds: float = 8.0        # Shared deadline for history/RAG loading before generation
+
+    # --- Embeddings / ingestion ---
+    embedding_batch_size: int = 100                   # Chunks per embed_content call (Gemini caps a batch at 100)
+    embedding_max_concurrency: int = 4                # Batches in flight at once per document
+    embedding_max_retries: int = 3                    # Attempts per batch before falling back to per-chunk calls
+    embedding_output_dimensionality: int = 0          # 0 = model default (3072); e.g. 768 shrinks vectors 4x (column dims must match)
+    embedding_wire_format: str = "json"               # Chunk vectors sent as "json", "float32" or "float16" (base64, needs migration 005)
+    embedding_cache_enabled: bool = True              # Reuse vectors for identical text (disk cache next to the app DB)
+    embedding_cache_max_entries: int = 50_000         # LRU bound (~12 KB per 3072-dim float32 vector)
+    chunk_max_tokens: int = 256                       # Chunk size in (estimated) embedding tokens, see services/chunker.py
+    chunk_overlap_tokens: int = 32                    # Whole trailing sentences carried into the next chunk
+    chunk_insert_batch_bytes: int = 2_000_000         # Max (estimated) JSON payload per document_chunks insert
+    chunk_insert_batch_rows: int = 500                # Max chunk rows per insert
+    chunk_insert_concurrency: int = 4                 # Chunk batches in flight per large document
+
+    # --- Retrieval ---
+    vector_backend: str = "supabase"                  # "supabase" (match_documents RPC) | "local" (on-disk ANN index)
+    local_index_nprobe: int = 8                       # IVF lists scanned per query in local mode
+    local_index_min_train_size: int = 10_000          # Below this, local search is an exact scan
+    rag_match_threshold: float = 0.5                  # Minimum similarity for match_documents
+    rag_search_mode: str = "hybrid"                   # "vector" | "hybrid" (vector + BM25 with reciprocal-rank fusion)
+    rag_hybrid_candidates: int = 20                   # Candidates taken from each ranking before fusion
+    rag_rrf_k: int = 60                               # RRF damping constant
+    search_cache_enabled: bool = True                 # Cache formatted search_similar results in memory
+    search_cache_ttl_seconds: int = 600
+    search_cache_max_entries: int = 512
+
+    # --- Library sync (worker pool per stage) ---
+    sync_incremental: bool = True                     # Only list assets updated since the last run's watermark
+    sync_metadata_workers: int = 8                    # Brandfolder asset-details lookups (paced by the shared rate budget)
+    sync_download_workers: int = 3                    # Attachment downloads
+    sync_extract_workers: int = 6                     # Transcription / captioning / PDF parsing (mostly waiting on the
+                                                      # transcription queue and caption batches, which bound Gemini load)
+    sync_embed_workers: int = 2                       # Chunk + embed (each already batches concurrently)
+    sync_write_workers: int = 2                       # Supabase inserts
+
+    # --- Outbound HTTP (shared pooled clients, see services/http_client.py) ---
+    http2_enabled: bool = True                        # Used only if the `h2` package is installed
+    http_timeout_seconds: float = 30.0
+    http_connect_timeout_seconds: float = 10.0
+    http_connect_retries: int = 2                     # Retries on connection errors
+    http_max_connections: int = 50
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 60.0
+    http_max_retries: int = 4                         # Retries on 429/5xx/transport errors for rate-limited upstreams
+    http_backoff_base_seconds: float = 1.0            # Jittered exponential backoff: base * 2^(attempt-1)
+    http_backoff_max_seconds: float = 60.0
+    http_default_rate_limit_per_second: float = 10.0
+    http_default_rate_limit_burst: int = 20
+    brandfolder_rate_limit_per_second: float = 10.0   # Shared by every sync worker / page fetcher
+    brandfolder_rate_limit_burst: int = 20
+    planning_center_rate_limit_per_second: float = 4.5  # PCO allows 100 requests / 20 s (adapted from headers)
+    planning_center_rate_limit_burst: int = 20
+
+    # --- Brandfolder API ---
+    brandfolder_page_concurrency: int = 8             # Asset-list pages fetched in parallel once total_pages is known
+
+    # --- Attachment downloads (shared by sync, research and /brandfolder/ingest) ---
+    download_max_concurrency: int = 4                 # Downloads in flight per process
+    download_chunk_bytes: int = 1024 * 1024           # Read buffer
+    download_parallel_threshold_bytes: int = 32 * 1024 * 1024  # Split larger files into ranged segments
+    download_segments: int = 4                        # Parallel ranges per large file
+    download_max_retries: int = 3                     # Range-resume attempts after a dropped connection
+
+    # --- Transcription queue (see services/transcription_queue.py) ---
+    transcription_workers: int = 3                    # Files uploading / processing / generating at once
+    transcription_processing_timeout_seconds: int = 1800  # Max wait for Gemini server-side processing
+    transcription_window_seconds: int = 600           # Longer recordings are split into windows of this length
+    transcription_window_overlap_seconds: int = 15    # Overlap between windows (cut at the midpoint when stitching)
+    transcription_window_workers: int = 4             # Windows of one recording transcribed in parallel
+    transcription_audio_bitrate: str = "32k"          # Mono 16 kHz MP3 track extracted with ffmpeg
+    transcription_ffmpeg_timeout_seconds: int = 600
+    transcript_cache_max_entries: int = 2_000         # Finished transcripts kept by media fingerprint (oldest dropped first)
+    media_fingerprint_sample_bytes: int = 8 * 1024 * 1024  # Head/tail bytes hashed to spot duplicate media
+
+    # --- Ingestion queue (see services/ingestion_queue.py) ---
+    ingestion_workers: int = 2                        # Upload / Brandfolder ingest / research jobs running at once
+    ingestion_max_queued: int = 200                   # Waiting jobs before new submissions get 429
+    ingestion_max_attempts: int = 3                   # Runs per job before it is marked failed
+    ingestion_retry_delay_seconds: float = 30.0       # First retry delay (doubles per attempt)
+    ingestion_failed_retention_hours: int = 72        # Failed jobs keep their files (for retry) this long
+
+    # --- PDF extraction (see services/pdf_extractor.py) ---
+    pdf_extract_processes: int = 2                    # Worker processes for large PDFs (1 = always in-process)
+    pdf_parallel_min_pages: int = 40                  # Smaller PDFs are read in-process
+    pdf_pages_per_task: int = 16                      # Pages per process-pool task
+
+    # --- Image captioning (see services/image_captioner.py) ---
+    caption_max_dimension: int = 1024                 # Long side after downsizing (needs Pillow)
+    caption_batch_size: int = 6                       # Images packed into one Gemini request
+    caption_batch_wait_seconds: float = 0.5           # Max wait for a batch to fill
+    caption_batch_concurrency: int = 3                # Caption requests in flight
 
     # --- Rate Limiting ---
     rate_limit_chat: str = "30/minute"
@@ -40,6 +40,34 @@ class AuthError(AppError):
         super().__init__(message, status_code=401)
 
 
+class TranscriptionError(AppError):
+    """Media could not be transcribed (base for the typed failures below)."""
+    def __init__(self, message: str = "Transcription failed"):
+        super().__init__(message, status_code=502)
+
+
+class MediaUploadError(TranscriptionError):
+    """Upload of the media file to Gemini failed."""
+
+
+class MediaProcessingTimeout(TranscriptionError):
+    """Gemini did not finish processing the uploaded file in time."""
+
+
+class MediaProcessingFailed(TranscriptionError):
+    """Gemini reported the uploaded file as FAILED."""
+
+
+class TranscriptGenerationError(TranscriptionError):
+    """Every model failed to produce a transcript."""
+
+
+class IngestionQueueFull(AppError):
+    """Too many ingestion jobs are already waiting (settings.ingestion_max_queued)."""
+    def __init__(self, message: str = "Ingestion queue is full"):
+        super().__init__(message, status_code=429)
+
+
 # --- Standard API Response ---
 
 def api_response(data=None, error: str = None, status_code: int = 200):
@@ -1,10 +1,13 @@
+import os
 import logging
 from fastapi import APIRouter, HTTPException, Depends
-import fastapi
 from ..models.brandfolder import SearchRequest, IngestRequest
 from ..services.brandfolder_service import BrandfolderAPI
 from ..services.rag_service import RAGManager
+from ..services.pdf_extractor import extract_pdf_text
 from ..services.chat_service import ChatService
+from ..services.ingestion_queue import PRIORITY_HIGH, PRIORITY_LOW, JobContext, ingestion_queue
+from ..core.exceptions import IngestionQueueFull, TranscriptionError
 from .auth import verify_active_user, verify_admin_role
 
 logger = logging.getLogger(__name__)
@@ -37,93 +40,127 @@ async def search_assets(request: SearchRequest, current_user: dict = Depends(ver
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/ingest")
-async def ingest_assets(request: IngestRequest, admin: dict = Depends(verify_admin_role)):
-    try:
-        api = BrandfolderAPI()
-        rag = RAGManager()
-        
-        bf_id = request.brandfolder_id
-        if not bf_id:
-             bfs = api.get_brandfolders()
-             if bfs:
-                 bf_id = bfs[0]["id"]
-        
-        # Get assets
-        if request.topic:
-            # Optimize query using LLM (Spanish -> English + Synonyms)
-            chat = ChatService()
-            optimized_topic = chat.optimize_query(request.topic)
-            logger.info(f"Optimized ingestion topic: {request.topic} -> {optimized_topic}")
-            
-            assets = api.search_assets(bf_id, optimized_topic)
-        else:
-            assets = api.get_assets(brandfolder_id=bf_id, per_page=request.max_assets)
-            
-        # Initialize Media Service
-        from ..services.media_service import MediaService
-        media_service = MediaService()
+def ingest_brandfolder_assets(payload: dict, job: JobContext = None) -> dict:
+    """Indexes Brandfolder assets (search by topic, or the first max_assets) - the "brandfolder_ingest" job."""
+    api = BrandfolderAPI()
+    rag = RAGManager()
 
-        count = 0
-        skipped = 0
-        
-        for asset in assets:
-            info = api.extract_asset_info(asset)
-            
-            content = f"Asset: {info['name']}\nDescription: {info['description']}\nTags: {', '.join(info['tags'])}"
-            
-            # Check for Media Attachments (Video/Audio)
-            # We look for the first valid media attachment to transcribe
-            transcript = ""
-            for att in info['attachments']:
-                mime = att.get('mimetype', '')
-                url = att.get('url')
-                
-                if url and ('video' in mime or 'audio' in mime or 'pdf' in mime or 'document' in mime or 'text' in mime):
-                    logger.info(f"Found ingestible asset: {info['name']} ({mime})")
+    bf_id = payload.get("brandfolder_id")
+    if not bf_id:
+         bfs = api.get_brandfolders()
+         if bfs:
+             bf_id = bfs[0]["id"]
+
+    # Get assets
+    topic = payload.get("topic")
+    if topic:
+        # Optimize query using LLM (Spanish -> English + Synonyms)
+        chat = ChatService()
+        optimized_topic = chat.optimize_query(topic)
+        logger.info(f"Optimized ingestion topic: {topic} -> {optimized_topic}")
+
+        assets = api.search_assets(bf_id, optimized_topic)
+    else:
+        assets = api.get_assets(brandfolder_id=bf_id, per_page=payload.get("max_assets"))
+
+    # Initialize Media Service
+    from ..services.media_service import MediaService
+    media_service = MediaService()
+
+    count = 0
+    skipped = 0
+    failed = []  # assets whose transcription failed: reported, not indexed
+
+    def ingestible_attachment(info):
+        # We look for the first valid media attachment to transcribe
+        for att in info['attachments']:
+            mime = att.get('mimetype', '')
+            url = att.get('url')
+            if url and ('video' in mime or 'audio' in mime or 'pdf' in mime or 'document' in mime or 'text' in mime):
+                return att
+        return None
+
+    infos = [api.extract_asset_info(asset) for asset in assets]
+    attachments = {info['id']: ingestible_attachment(info) for info in infos}
+
+    # Downloads run ahead (bounded, shared with sync/research) while earlier
+    # assets are transcribed / parsed
+    downloads = api.download_attachments_ahead(
+        infos, lambda info: (attachments[info['id']] or {}).get('url')
+    )
+
+    for done, (info, temp_file, download_error) in enumerate(downloads):
+        content = f"Asset: {info['name']}\nDescription: {info['description']}\nTags: {', '.join(info['tags'])}"
+
+        # Check for Media Attachments (Video/Audio)
+        att = attachments[info['id']]
+        transcript = ""
+        transcription_error = None
+        if download_error:
+            logger.warning(f"Failed to download media/doc for {info['name']}: {download_error}")
+        if att and temp_file:
+            mime = att.get('mimetype', '')
+            logger.info(f"Found ingestible asset: {info['name']} ({mime})")
+            try:
+                if 'video' in mime or 'audio' in mime:
+                    # Transcribe
+                    transcript = media_service.transcribe_media(temp_file, mime_type=mime)
+                    content += f"\n\n--- TRANSCRIPTION ---\n{transcript}\n---------------------"
+                else:
+                    # PDF/Document Extraction
                     try:
-                        # Download temporarily
-                        temp_file = api.download_attachment(url)
-                        if temp_file:
-                            if 'video' in mime or 'audio' in mime:
-                                # Transcribe
-                                transcript = media_service.transcribe_media(temp_file, mime_type=mime)
-                                content += f"\n\n--- TRANSCRIPTION ---\n{transcript}\n---------------------"
-                            else:
-                                # PDF/Document Extraction
-                                import pypdf
-                                try:
-                                    reader = pypdf.PdfReader(temp_file)
-                                    pdf_text = ""
-                                    for page in reader.pages:
-                                        extracted = page.extract_text()
-                                        if extracted:
-                                            pdf_text += extracted + "\n"
-                                    if pdf_text.strip():
-                                        content += f"\n\n--- DOCUMENT TEXT ---\n{pdf_text}\n---------------------"
-                                    else:
-                                        content += "\n\n[Warning: Extracted PDF text was empty. Document might be an image/scan.]"
-                                except Exception as e:
-                                    logger.error(f"Error reading PDF {temp_file}: {e}")
-                                    content += f"\n\n[PDF Extraction Failed: {e}]"
-                            
-                            # Clean up
-                            import os
-                            os.remove(temp_file)
-                            break # Only process the first main media/doc file per asset
+                        pdf_text = extract_pdf_text(temp_file)
+                        if pdf_text.strip():
+                            content += f"\n\n--- DOCUMENT TEXT ---\n{pdf_text}\n---------------------"
+                        else:
+                            content += "\n\n[Warning: Extracted PDF text was empty. Document might be an image/scan.]"
                     except Exception as e:
-                        logger.warning(f"Failed to process media/doc for {info['name']}: {e}")
+                        logger.error(f"Error reading PDF {temp_file}: {e}")
+                        content += f"\n\n[PDF Extraction Failed: {e}]"
+            except TranscriptionError as e:
+                # Typed failure: indexing the bare header would hide the asset from a later retry
+                logger.warning(f"Transcription failed for {info['name']}: {e}")
+                transcription_error = str(e)
+            except Exception as e:
+                logger.warning(f"Failed to process media/doc for {info['name']}: {e}")
+            finally:
+                # Clean up
+                os.remove(temp_file)
 
-            # Use 'web_view_link' or attachment url as source
-            source = f"https://brandfolder.com/workbench/{info['id']}" 
-            
-            if rag.add_document(content, source, title=info['name']):
-                count += 1
-            else:
-                skipped += 1
-                
-        return {"indexed": count, "skipped": skipped, "message": f"Processed {len(assets)} assets"}
-        
+        # Use 'web_view_link' or attachment url as source
+        source = f"https://brandfolder.com/workbench/{info['id']}"
+
+        if transcription_error:
+            failed.append({"asset_id": info['id'], "name": info['name'], "error": transcription_error})
+        elif rag.add_document(content, source, title=info['name']):
+            count += 1
+        else:
+            skipped += 1
+        if job:
+            job.progress((done + 1) / len(infos), f"{done + 1}/{len(infos)} assets")
+
+    return {
+        "indexed": count, "skipped": skipped, "failed": failed,
+        "message": f"Processed {len(assets)} assets" + (f", {len(failed)} failed transcription" if failed else ""),
+    }
+
+
+ingestion_queue.register("brandfolder_ingest", ingest_brandfolder_assets)
+
+
+@router.post("/ingest")
+async def ingest_assets(request: IngestRequest, admin: dict = Depends(verify_admin_role)):
+    """Queues a Brandfolder ingest; poll /jobs/{job_id} for progress and the indexed/skipped counts and failed assets."""
+    try:
+        job_id = ingestion_queue.submit(
+            "brandfolder_ingest",
+            {"brandfolder_id": request.brandfolder_id, "topic": request.topic, "max_assets": request.max_assets},
+            priority=PRIORITY_LOW,
+            created_by=admin.get("id"),
+        )
+        return {"job_id": job_id, "status": "queued", "message": "Brandfolder ingest queued."}
+    except IngestionQueueFull as e:
+        raise HTTPException(status_code=429, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -187,16 +224,28 @@ async def get_research_session(session_id: str, current_user: dict = Depends(ver
         logger.error(f"Session Status Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _run_research_job(payload: dict, job: JobContext) -> dict:
+    from ..services.research_service import ResearchService
+    return ResearchService().execute_session(payload["session_id"], progress=job.progress)
+
+
+ingestion_queue.register("research_execute", _run_research_job)
+
+
 @router.post("/research/{session_id}/execute")
-async def execute_research(session_id: str, background_tasks: fastapi.BackgroundTasks, current_user: dict = Depends(verify_active_user)):
+async def execute_research(session_id: str, current_user: dict = Depends(verify_active_user)):
     try:
-        from ..services.research_service import ResearchService
-        service = ResearchService()
-        
-        # Run in background to avoid timeout
-        background_tasks.add_task(service.execute_session, session_id)
-        
-        return {"message": "Deep Research started in background. Check status for updates."}
+        # Runs on the shared ingestion workers; a user is waiting, so it goes ahead of bulk work
+        job_id = ingestion_queue.submit(
+            "research_execute",
+            {"session_id": session_id},
+            priority=PRIORITY_HIGH,
+            created_by=current_user.get("id"),
+        )
+
+        return {"message": "Deep Research started in background. Check status for updates.", "job_id": job_id}
+    except IngestionQueueFull as e:
+        raise HTTPException(status_code=429, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import Any, Awaitable, List, Optional, Dict, Tuple
 from ..services.chat_service import ChatService
 from ..services.chat_history_service import ChatHistoryService
 from ..services.rag_service import RAGManager
 from ..services.orchestrator_service import DirectorOrchestrator
+from ..core.config import settings
 from .auth import verify_active_user
 import os
+import time
+import asyncio
 import logging
 from io import BytesIO
 
@@ -64,9 +67,115 @@ def get_history_service():
 def get_orchestrator(chat_service: ChatService = Depends(get_chat_service)):
     return DirectorOrchestrator(chat_service=chat_service)
 
+
+# ─── Pre-generation stages ───────────────────────────────────────────
+# Loading history, saving the user message and the RAG search don't depend on
+# each other, so they run concurrently under one shared deadline. Time to
+# first token becomes max(stages) instead of their sum.
+
+async def _timed(name: str, coro, timings: Dict[str, float]):
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+
+# Writes that missed the deadline but are left to finish (strong refs for the loop)
+_detached: set = set()
+
+
+def _log_detached(name: str, task: asyncio.Task):
+    _detached.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.warning(f"Pre-generation stage '{name}' failed after the deadline: {task.exception()}")
+
+
+async def _run_stages(
+    stages: Dict[str, Awaitable],
+    timings: Dict[str, float],
+    detach: Tuple[str, ...] = (),
+) -> Dict[str, Any]:
+    """
+    Runs independent stages concurrently. A stage that fails or is still
+    running at the shared deadline yields None; the chat continues without it.
+
+    Late stages are cancelled, except those named in `detach` (writes): their
+    asyncio.to_thread worker cannot be interrupted anyway, so they are left
+    to finish in the background and only their failure is logged.
+    """
+    tasks = {
+        name: asyncio.ensure_future(_timed(name, coro, timings))
+        for name, coro in stages.items()
+    }
+    if not tasks:
+        return {}
+    done, pending = await asyncio.wait(tasks.values(), timeout=settings.chat_prefetch_timeout_seconds)
+    for name, task in tasks.items():
+        if task not in pending:
+            continue
+        if name in detach:
+            _detached.add(task)
+            task.add_done_callback(lambda t, name=name: _log_detached(name, t))
+        else:
+            task.cancel()
+
+    results: Dict[str, Any] = {}
+    for name, task in tasks.items():
+        if task in pending:
+            logger.warning(f"Pre-generation stage '{name}' missed the {settings.chat_prefetch_timeout_seconds}s deadline")
+            results[name] = None
+        elif task.exception():
+            logger.warning(f"Pre-generation stage '{name}' failed: {task.exception()}")
+            results[name] = None
+        else:
+            results[name] = task.result()
+    return results
+
+
+async def _prepare_turn(
+    history_service: ChatHistoryService,
+    session_id: Optional[str],
+    is_new_session: bool,
+    message: str,
+    rag_enabled: bool,
+    timings: Dict[str, float],
+) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """
+    Saves the user message, loads prior history and fetches RAG context
+    concurrently. Returns (history excluding the current message, rag_context).
+    """
+    stages: Dict[str, Awaitable] = {
+        "save_user": history_service.aadd_message(session_id, "user", message),
+    }
+    # A session created for this turn has no history yet
+    if session_id and not is_new_session:
+        stages["history"] = history_service.aget_session_messages(session_id)
+    if rag_enabled:
+        stages["rag"] = RAGManager().asearch(message, n_results=3)
+
+    results = await _run_stages(stages, timings, detach=("save_user",))
+
+    history_dicts = [{"role": m["role"], "content": m["content"]} for m in (results.get("history") or [])]
+    # The history read races the insert; drop the current message if it landed first
+    if history_dicts and history_dicts[-1]["role"] == "user" and history_dicts[-1]["content"] == message:
+        history_dicts = history_dicts[:-1]
+
+    rag_context = results.get("rag")
+    if rag_context:
+        logger.info(f"RAG context injected ({len(rag_context)} chars) for session {session_id}")
+    return history_dicts, rag_context
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+    """Formats stage timings as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+
 @router.post("/message", response_model=ChatResponse)
 async def send_message(
     request: ChatRequest,
+    response: Response,
     chat_service: ChatService = Depends(get_chat_service),
     history_service: ChatHistoryService = Depends(get_history_service),
     current_user: dict = Depends(verify_active_user)
@@ -78,48 +187,39 @@ async def send_message(
         user_id = current_user.get("id") # Username/Email from token
         session_id = request.session_id
         session_title = None
+        timings: Dict[str, float] = {}
         
         # 1. Ensure Session Exists
         if not session_id:
             # Generate title from first message
             title = " ".join(request.message.split()[:5]) + "..."
-            session_id = history_service.create_session(user_id, request.director, title)
+            session_id = await _timed(
+                "session", history_service.acreate_session(user_id, request.director, title), timings
+            )
             session_title = title
             if session_id:
                 logger.info(f"Created new chat session: {session_id}")
             else:
                 logger.warning("Failed to create session. Chat will not be saved.")
         
-        # 2. Save User Message
-        history_service.add_message(session_id, "user", request.message)
-        
-        # 3. Load History for Context (Last 10 messages)
-        # We fetch from DB to ensure context is accurate to what's stored
-        db_messages = history_service.get_session_messages(session_id)
-        history_dicts = [{"role": m["role"], "content": m["content"]} for m in db_messages]
+        # 2-3. Save user message, load history and fetch RAG context concurrently
+        history_dicts, rag_context = await _prepare_turn(
+            history_service, session_id, session_title is not None,
+            request.message, request.rag_enabled, timings,
+        )
         
         # 4. Generate Response
-        # Get RAG context if enabled
-        rag_context = None
-        if request.rag_enabled:
-            try:
-                rag_manager = RAGManager()
-                rag_context = rag_manager.search(request.message, n_results=3)
-                if rag_context:
-                    logger.info(f"RAG context injected ({len(rag_context)} chars) for session {session_id}")
-            except Exception as rag_err:
-                logger.warning(f"RAG search failed, continuing without context: {rag_err}")
-        
-        response_text = chat_service.generate_response(
+        response_text = await _timed("generate", chat_service.agenerate_response(
             user_input=request.message,
-            history=history_dicts[:-1], # Exclude current message as it's passed separately or double counted
+            history=history_dicts,
             director=request.director,
             rag_context=rag_context
-        )
+        ), timings)
         
         # 5. Save AI Response
-        history_service.add_message(session_id, "assistant", response_text)
+        await history_service.aadd_message(session_id, "assistant", response_text)
         
+        response.headers["Server-Timing"] = _server_timing(timings)
         return {
             "message": response_text, 
             "session_id": session_id,
@@ -148,32 +248,26 @@ async def stream_message(
     user_id = current_user.get("id")
     session_id = request.session_id
     session_title = None
+    timings: Dict[str, float] = {}
 
     # 1. Ensure session exists
     if not session_id:
         title = " ".join(request.message.split()[:5]) + "..."
-        session_id = history_service.create_session(user_id, request.director, title)
+        session_id = await _timed(
+            "session", history_service.acreate_session(user_id, request.director, title), timings
+        )
         session_title = title
 
-    # 2. Save user message
-    history_service.add_message(session_id, "user", request.message)
-
-    # 3. Load history (exclude the just-saved current message)
-    db_messages = history_service.get_session_messages(session_id)
-    history_dicts = [{"role": m["role"], "content": m["content"]} for m in db_messages][:-1]
-
-    # 4. RAG context
-    rag_context = None
-    if request.rag_enabled:
-        try:
-            rag_context = RAGManager().search(request.message, n_results=3)
-        except Exception as rag_err:
-            logger.warning(f"RAG search failed, continuing without context: {rag_err}")
+    # 2-4. Save user message, load history (excluding it) and RAG context concurrently
+    history_dicts, rag_context = await _prepare_turn(
+        history_service, session_id, session_title is not None,
+        request.message, request.rag_enabled, timings,
+    )
 
-    def event_generator():
+    async def event_generator():
         collected = []
         try:
-            for chunk in chat_service.generate_response_stream(
+            async for chunk in chat_service.agenerate_response_stream(
                 user_input=request.message,
                 history=history_dicts,
                 director=request.director,
@@ -185,7 +279,7 @@ async def stream_message(
             full_text = "".join(collected).strip()
             if full_text:
                 try:
-                    history_service.add_message(session_id, "assistant", full_text)
+                    await history_service.aadd_message(session_id, "assistant", full_text)
                 except Exception as save_err:
                     logger.error(f"Failed to save streamed assistant message: {save_err}")
 
@@ -194,7 +288,8 @@ async def stream_message(
         "X-Session-Title": quote(session_title or ""),
         "Cache-Control": "no-cache",
         "X-Accel-Buffering": "no",  # disable proxy buffering (nginx/railway)
-        "Access-Control-Expose-Headers": "X-Session-Id, X-Session-Title",
+        "Server-Timing": _server_timing(timings),
+        "Access-Control-Expose-Headers": "X-Session-Id, X-Session-Title, Server-Timing",
     }
     return StreamingResponse(
         event_generator(),
@@ -278,6 +373,7 @@ async def delete_session(
 @router.post("/consult")
 async def consult_directors(
     request: ConsultRequest,
+    response: Response,
     orchestrator: DirectorOrchestrator = Depends(get_orchestrator),
     history_service: ChatHistoryService = Depends(get_history_service),
     current_user: dict = Depends(verify_active_user),
@@ -290,44 +386,37 @@ async def consult_directors(
         user_id = current_user.get("id")
         session_id = request.session_id
         session_title = None
+        timings: Dict[str, float] = {}
 
         # Ensure session exists
         if not session_id:
             title = " ".join(request.message.split()[:5]) + "..."
-            session_id = history_service.create_session(
+            session_id = await _timed("session", history_service.acreate_session(
                 user_id, request.primary_director, title
-            )
+            ), timings)
             session_title = title
 
-        # Save user message
-        history_service.add_message(session_id, "user", request.message)
-
-        # Load history
-        db_messages = history_service.get_session_messages(session_id)
-        history_dicts = [{"role": m["role"], "content": m["content"]} for m in db_messages]
-
-        # RAG context
-        rag_context = None
-        if request.rag_enabled:
-            try:
-                rag_manager = RAGManager()
-                rag_context = rag_manager.search(request.message, n_results=3)
-            except Exception as rag_err:
-                logger.warning(f"RAG search failed: {rag_err}")
+        # Save user message, load history and RAG context concurrently
+        history_dicts, rag_context = await _prepare_turn(
+            history_service, session_id, session_title is not None,
+            request.message, request.rag_enabled, timings,
+        )
 
-        # Multi-director response
-        result = orchestrator.multi_director_response(
+        # Multi-director response (sync fan-out; keep it off the event loop)
+        result = await _timed("generate", asyncio.to_thread(
+            orchestrator.multi_director_response,
             question=request.message,
             primary_director=request.primary_director,
-            history=history_dicts[:-1],
+            history=history_dicts,
             rag_context=rag_context,
             auto_detect=request.auto_collaborate,
             consulting_directors=request.consulting_directors,
-        )
+        ), timings)
 
         # Save AI response
-        history_service.add_message(session_id, "assistant", result["message"])
+        await history_service.aadd_message(session_id, "assistant", result["message"])
 
+        response.headers["Server-Timing"] = _server_timing(timings)
         return {
             "message": result["message"],
             "session_id": session_id,
@@ -361,11 +450,12 @@ async def council_meeting(
         if request.rag_enabled:
             try:
                 rag_manager = RAGManager()
-                rag_context = rag_manager.search(request.question, n_results=3)
+                rag_context = await rag_manager.asearch(request.question, n_results=3)
             except Exception as rag_err:
                 logger.warning(f"RAG search failed: {rag_err}")
 
-        result = orchestrator.consensus_response(
+        result = await asyncio.to_thread(
+            orchestrator.consensus_response,
             question=request.question,
             directors=request.directors,
             rag_context=rag_context,
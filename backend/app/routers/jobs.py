@@ -0,0 +1,57 @@
+"""
+jobs.py - Ingestion job status
+Progress, results and manual retry for the jobs queued by /knowledge/upload,
+/brandfolder/ingest and research execution (services/ingestion_queue.py).
+Admins see every job; other users only their own.
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..services.ingestion_queue import ingestion_queue
+from .auth import verify_active_user
+
+router = APIRouter()
+
+
+def _visible_job(job_id: str, user: dict) -> dict:
+    job = ingestion_queue.status(job_id)
+    if not job or (user.get("role") != "admin" and job["created_by"] != user.get("id")):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _public(job: dict) -> dict:
+    """Job fields for the API (payload paths and bookkeeping stay internal)."""
+    return {
+        key: job[key]
+        for key in ("id", "kind", "state", "priority", "progress", "message", "attempts",
+                    "max_attempts", "error", "result", "created_at", "updated_at")
+    }
+
+
+@router.get("")
+async def list_jobs(
+    kind: Optional[str] = None,
+    state: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(verify_active_user)
+):
+    created_by = None if current_user.get("role") == "admin" else current_user.get("id")
+    jobs = await asyncio.to_thread(ingestion_queue.list_jobs, kind, state, created_by, limit)
+    return {"jobs": [_public(job) for job in jobs]}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(verify_active_user)):
+    return _public(await asyncio.to_thread(_visible_job, job_id, current_user))
+
+
+@router.post("/{job_id}/retry")
+async def retry_job(job_id: str, current_user: dict = Depends(verify_active_user)):
+    await asyncio.to_thread(_visible_job, job_id, current_user)
+    if not await asyncio.to_thread(ingestion_queue.retry, job_id):
+        raise HTTPException(status_code=409, detail="Only failed jobs whose files are still available can be retried")
+    return {"status": "queued", "id": job_id}
@@ -1,15 +1,20 @@
+import asyncio
 import logging
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 import shutil
 import os
 import uuid
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
-import pypdf
 
 from ..services.rag_service import RAGManager
+from ..services.vector_store import SOURCE_TYPES, vector_store
+from ..services.sync_service import forget_sources
 from ..services.media_service import MediaService
+from ..services.pdf_extractor import iter_pdf_pages
 from ..services.supabase_service import supabase_service
+from ..services.ingestion_queue import PRIORITY_NORMAL, JobContext, ingestion_queue
+from ..core.exceptions import IngestionQueueFull
 from ..services.auth_service import verify_token
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -26,6 +31,7 @@ class UploadResponse(BaseModel):
     filename: str
     status: str
     message: str
+    job_id: Optional[str] = None
 
 async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
@@ -40,85 +46,91 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
     return profile
 
 
-def process_and_index_file(file_path: str, filename: str, content_type: str):
-    """Background task to process file, upload to Cloud Storage, and index to RAG"""
+def process_and_index_file(file_path: str, filename: str, content_type: str, job: JobContext = None) -> dict:
+    """
+    Extracts, archives and indexes one uploaded file (the "knowledge_upload"
+    ingestion job). Extraction failures raise, so the queue retries them and
+    records the error; the upload itself is deleted by the queue when the
+    job is finished.
+    """
+    def progress(fraction: float, message: str):
+        if job:
+            job.progress(fraction, message)
+
+    rag = RAGManager()
+    text_content = ""
+    prepared = None
+
+    logger.info(f"Processing file: {filename} ({content_type})")
+
+    # 1. Extract Text
+    progress(0.05, "Extracting text")
+    if content_type == "application/pdf" or filename.lower().endswith(".pdf"):
+        # Pages go straight into the chunker; the manual is never one big string
+        pages = (text for _, text in iter_pdf_pages(file_path))
+        prepared = rag.store.prepare_chunks(pages=pages)
+
+    elif content_type in ["text/plain", "text/markdown"] or filename.lower().endswith((".txt", ".md")):
+        with open(file_path, "r", encoding="utf-8") as f:
+            text_content = f.read()
+
+    elif content_type.startswith("audio/") or content_type.startswith("video/"):
+        media_service = MediaService()
+        logger.info(f"Transcribing {filename}...")
+        progress(0.1, "Transcribing")
+        transcript = media_service.transcribe_media(file_path, mime_type=content_type)
+        text_content = f"--- TRANSCRIPT OF {filename} ---\n{transcript}"
+    else:
+        logger.warning(f"Unsupported file type for auto-indexing: {content_type}")
+        return {"indexed": False, "reason": f"Unsupported file type: {content_type}"}
+
+    # 2. Upload to Supabase Storage (Archival)
+    progress(0.7, "Uploading to storage")
+    logger.info(f"Uploading {filename} to Supabase Storage...")
+    public_url = ""
     try:
-        rag = RAGManager()
-        text_content = ""
-
-        logger.info(f"Processing file: {filename} ({content_type})")
-
-        # 1. Extract Text
-        if content_type == "application/pdf" or filename.lower().endswith(".pdf"):
-            try:
-                reader = pypdf.PdfReader(file_path)
-                for page in reader.pages:
-                    text_content += page.extract_text() + "\n"
-            except Exception as e:
-                logger.error(f"Error reading PDF {filename}: {e}")
-                return
-
-        elif content_type in ["text/plain", "text/markdown"] or filename.lower().endswith((".txt", ".md")):
-            with open(file_path, "r", encoding="utf-8") as f:
-                text_content = f.read()
-
-        elif content_type.startswith("audio/") or content_type.startswith("video/"):
-            try:
-                media_service = MediaService()
-                logger.info(f"Transcribing {filename}...")
-                transcript = media_service.transcribe_media(file_path, mime_type=content_type)
-                text_content = f"--- TRANSCRIPT OF {filename} ---\n{transcript}"
-            except Exception as e:
-                logger.error(f"Error transcribing {filename}: {e}")
-                return
-        else:
-            logger.warning(f"Unsupported file type for auto-indexing: {content_type}")
-            return
-
-        # 2. Upload to Supabase Storage (Archival)
-        logger.info(f"Uploading {filename} to Supabase Storage...")
-        public_url = ""
-        try:
-            with open(file_path, "rb") as f:
-                file_bytes = f.read()
-
-            bucket_name = "knowledge-base"
-            storage_path = f"uploads/{filename}"
-
-            public_url = supabase_service.upload_file(bucket_name, storage_path, file_bytes, content_type)
-            if public_url:
-                logger.info(f"Uploaded to: {public_url}")
-            else:
-                logger.warning("Upload failed, using filename as source.")
-                public_url = f"file://{filename}"
-
-        except Exception as e:
-            logger.error(f"Error uploading to storage: {e}")
-            public_url = f"file://{filename}"
+        with open(file_path, "rb") as f:
+            file_bytes = f.read()
 
-        # 3. Index to RAG
-        if text_content.strip():
-            if rag.add_document(text_content, public_url, title=filename):
-                logger.info(f"Successfully indexed {filename}")
-            else:
-                logger.info(f"Skipped {filename} (Already exists or empty)")
+        bucket_name = "knowledge-base"
+        storage_path = f"uploads/{filename}"
+
+        public_url = supabase_service.upload_file(bucket_name, storage_path, file_bytes, content_type)
+        if public_url:
+            logger.info(f"Uploaded to: {public_url}")
         else:
-            logger.warning(f"No text extracted from {filename}")
+            logger.warning("Upload failed, using filename as source.")
+            public_url = f"file://{filename}"
 
     except Exception as e:
-        logger.error(f"Critical Error processing {filename}: {e}")
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logger.debug(f"Removed temp file {file_path}")
+        logger.error(f"Error uploading to storage: {e}")
+        public_url = f"file://{filename}"
+
+    # 3. Index to RAG
+    progress(0.8, "Indexing")
+    if not (prepared or text_content.strip()):
+        logger.warning(f"No text extracted from {filename}")
+        return {"indexed": False, "source": public_url, "reason": "No text extracted"}
+    if rag.add_document(text_content, public_url, title=filename, prepared=prepared):
+        logger.info(f"Successfully indexed {filename}")
+        return {"indexed": True, "source": public_url}
+    logger.info(f"Skipped {filename} (Already exists or empty)")
+    return {"indexed": False, "source": public_url, "reason": "Already indexed"}
+
+
+def _run_upload_job(payload: dict, job: JobContext) -> dict:
+    return process_and_index_file(payload["file_path"], payload["filename"], payload["content_type"], job=job)
+
+
+ingestion_queue.register("knowledge_upload", _run_upload_job)
 
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     admin_user: dict = Depends(get_current_admin)
 ):
+    file_path = None
     try:
         safe_name = f"{uuid.uuid4()}_{file.filename}"
         file_path = os.path.join(UPLOAD_DIR, safe_name)
@@ -126,60 +138,50 @@ async def upload_file(
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
 
-        background_tasks.add_task(
-            process_and_index_file,
-            file_path,
-            file.filename,
-            file.content_type
+        job_id = ingestion_queue.submit(
+            "knowledge_upload",
+            {"file_path": file_path, "filename": file.filename, "content_type": file.content_type or ""},
+            priority=PRIORITY_NORMAL,
+            files=[file_path],
+            created_by=admin_user.get("id"),
         )
 
         return {
             "filename": file.filename,
             "status": "queued",
-            "message": "File uploaded and queued for processing."
+            "message": "File uploaded and queued for processing.",
+            "job_id": job_id,
         }
 
+    except IngestionQueueFull as e:
+        os.remove(file_path)
+        raise HTTPException(status_code=429, detail=e.message)
     except Exception as e:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/documents")
 async def list_documents(
     source_type: str = "all",
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     admin_user: dict = Depends(get_current_admin)
 ):
     """
-    List all documents in the knowledge base.
+    List documents in the knowledge base, newest first, with their chunk_count.
     source_type: 'all' | 'direct' (file://) | 'brandfolder' | 'web'
+    Pass `next_cursor` from the response as `cursor` to get the next page.
     """
+    if source_type != "all" and source_type not in SOURCE_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown source_type: {source_type}")
     try:
-        query = supabase_service.client.table("documents").select(
-            "id, title, source, doc_type, created_at, updated_at"
-        ).order("created_at", desc=True).limit(limit)
-
-        if source_type == "direct":
-            query = query.like("source", "file://%")
-        elif source_type == "brandfolder":
-            query = query.like("source", "%brandfolder.com%")
-        elif source_type == "web":
-            query = query.like("source", "http%").not_.like("source", "%brandfolder.com%")
-
-        res = query.execute()
-
-        # Add chunk count per document
-        docs = res.data or []
-        for doc in docs:
-            try:
-                chunks_res = supabase_service.client.table("document_chunks").select(
-                    "id", count="exact", head=True
-                ).eq("document_id", doc["id"]).execute()
-                doc["chunk_count"] = chunks_res.count or 0
-            except Exception:
-                doc["chunk_count"] = 0
-
-        return {"documents": docs, "total": len(docs)}
+        docs, next_cursor = await asyncio.to_thread(vector_store.list_documents, source_type, limit, cursor)
+        return {"documents": docs, "total": len(docs), "next_cursor": next_cursor}
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -204,6 +206,11 @@ async def delete_document(
             "id", document_id
         ).execute()
 
+        # Chunks may already be gone even if the document row wasn't found
+        vector_store.notify_document_deleted(document_id)
+        # Let the next library sync re-index the asset if it still exists
+        forget_sources([row.get("source") for row in (res.data or [])])
+
         if not res.data:
             raise HTTPException(status_code=404, detail="Document not found")
 
@@ -11,12 +11,12 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 from urllib.parse import urlencode
 
-import requests
 from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import RedirectResponse
 
 from ..core.config import settings
 from ..services.supabase_service import supabase_service
+from ..services.http_client import HTTPError, get_http_client, get_async_http_client
 from .auth import verify_active_user
 
 logger = logging.getLogger(__name__)
@@ -90,7 +90,7 @@ async def pco_oauth_callback(
 
     # Exchange code for tokens
     try:
-        token_response = requests.post(
+        token_response = await get_async_http_client().post(
             PCO_TOKEN_URL,
             json={
                 "grant_type": "authorization_code",
@@ -107,7 +107,7 @@ async def pco_oauth_callback(
             raise HTTPException(status_code=400, detail="Failed to exchange authorization code")
 
         tokens = token_response.json()
-    except requests.RequestException as e:
+    except HTTPError as e:
         logger.error(f"PCO token exchange error: {e}")
         raise HTTPException(status_code=500, detail="Error connecting to Planning Center")
 
@@ -121,7 +121,7 @@ async def pco_oauth_callback(
     expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
 
     # Fetch church/organization name from Planning Center
-    church_name = _fetch_church_name(access_token)
+    church_name = await _fetch_church_name(access_token)
 
     # Store tokens in Supabase
     try:
@@ -240,8 +240,9 @@ def get_user_pco_token(user_id: str) -> Optional[str]:
 def _refresh_pco_token(user_id: str, refresh_token: str) -> Optional[str]:
     """Refresh an expired Planning Center token."""
     try:
-        response = requests.post(
+        response = get_http_client().post(
             PCO_TOKEN_URL,
+            upstream="planning_center",
             json={
                 "grant_type": "refresh_token",
                 "refresh_token": refresh_token,
@@ -279,11 +280,12 @@ def _refresh_pco_token(user_id: str, refresh_token: str) -> Optional[str]:
         return None
 
 
-def _fetch_church_name(access_token: str) -> str:
+async def _fetch_church_name(access_token: str) -> str:
     """Fetch the organization/church name from Planning Center."""
     try:
-        response = requests.get(
+        response = await get_async_http_client().get(
             f"{PCO_API_BASE}/people/v2",
+            upstream="planning_center",
             headers={"Authorization": f"Bearer {access_token}"},
             timeout=10,
         )
@@ -26,13 +26,15 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
 @router.post("/trigger")
 async def trigger_full_sync(
     background_tasks: BackgroundTasks,
+    full: bool = False,
     admin: dict = Depends(get_current_admin)
 ):
     """
-    Manually trigger a full Brandfolder library sync.
-    Only processes content that hasn't been indexed yet — no duplicates, no data loss.
+    Manually trigger a Brandfolder library sync.
+    Only processes content that is new or changed since the last sync — no duplicates, no data loss.
+    Pass ?full=true to re-list every asset instead of only recent changes.
     """
-    background_tasks.add_task(full_sync)
+    background_tasks.add_task(full_sync, full or None)
     return {
         "message": "✅ Full library sync started in the background.",
         "note": "Only NEW content will be indexed. Existing memory is preserved. Check /sync/status for progress."
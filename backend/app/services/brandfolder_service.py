@@ -7,14 +7,41 @@ Authentication: https://brandfolder.com/profile#integrations
 """
 
 import os
-import time
-import requests
-from typing import Optional, List, Dict, Any
-import tempfile
+import httpx
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Callable, Iterator
+
+from ..core.config import settings
+
+from .downloader import downloader
+from .http_client import HTTPError, get_http_client
 
 # Brandfolder API Configuration
 BRANDFOLDER_API_BASE = "https://brandfolder.com/api/v4"
 
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parses a Brandfolder ISO-8601 timestamp (e.g. '2024-05-01T12:00:00.000Z') as UTC."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def is_updated_after(asset: Dict, watermark: Optional[str]) -> bool:
+    """True if the raw asset's updated_at is later than the watermark (or either is unknown)."""
+    mark = parse_timestamp(watermark)
+    updated = parse_timestamp((asset.get("attributes") or {}).get("updated_at"))
+    if mark is None or updated is None:
+        return True
+    return updated > mark
+
+
 class BrandfolderAPI:
     """
     Service for interacting with the Brandfolder REST API.
@@ -42,18 +69,92 @@ class BrandfolderAPI:
         url = f"{BRANDFOLDER_API_BASE}{endpoint}"
         
         try:
-            response = requests.request(
-                method=method,
-                url=url,
+            response = get_http_client().request(
+                method,
+                url,
+                upstream="brandfolder",
                 headers=self.headers,
                 params=params,
                 timeout=30
             )
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except (HTTPError, ValueError) as e:
             print(f"❌ API Error: {e}")
-            return {"error": str(e), "data": []}
+            error = {"error": str(e), "data": []}
+            if isinstance(e, httpx.HTTPStatusError):
+                # Lets paginators back off properly on 429 / 5xx
+                error["status_code"] = e.response.status_code
+                error["retry_after"] = e.response.headers.get("Retry-After")
+            return error
+
+    def _request_page(self, endpoint: str, params: Dict, page: int) -> Dict[str, Any]:
+        """Fetches one page (429/5xx retries and pacing happen in the shared client)."""
+        return self._request("GET", endpoint, dict(params, page=page))
+
+    def _iter_pages(self, endpoint: str, params: Dict,
+                    on_incomplete: Optional[Callable[[], None]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields raw result pages in order. Page 1 is fetched first; once its
+        meta reveals total_pages the rest are fetched concurrently (at most
+        settings.brandfolder_page_concurrency in flight, so the consumer can
+        work on early pages while later ones download). Without total_pages
+        it falls back to walking meta.next_page serially.
+
+        A page that still fails after retries is skipped and `on_incomplete`
+        is called, so callers that must not treat the list as complete
+        (incremental sync watermarks) can tell.
+        """
+        def incomplete():
+            if on_incomplete:
+                on_incomplete()
+
+        first = self._request("GET", endpoint, params)
+        if first.get("error"):
+            print(f"❌ First page of {endpoint} failed after retries — list is empty.")
+            incomplete()
+        yield first
+
+        meta = first.get("meta", {}) or {}
+        # Brandfolder API puts pagination info directly in meta root sometimes, or in meta.pagination
+        # debug_raw_response.py showed keys: ['current_page', 'next_page', ...] directly in meta
+        total_pages = meta.get("total_pages") or (meta.get("pagination") or {}).get("total_pages")
+        next_page = meta.get("next_page")
+
+        if not total_pages:
+            while next_page:
+                print(f"📄 Fetching page {next_page}...")
+                result = self._request_page(endpoint, params, next_page)
+                if not result.get("data"):
+                    if result.get("error"):
+                        print(f"❌ Aborting pagination at page {next_page} after retries — list may be partial.")
+                        incomplete()
+                    break
+                yield result
+                next_page = (result.get("meta", {}) or {}).get("next_page")
+            return
+
+        pages = iter(range(2, int(total_pages) + 1))
+        workers = max(1, settings.brandfolder_page_concurrency)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bf-pages") as pool:
+            in_flight = deque()
+            for page in pages:
+                in_flight.append((page, pool.submit(self._request_page, endpoint, params, page)))
+                if len(in_flight) >= workers:
+                    break
+            while in_flight:
+                page, future = in_flight.popleft()
+                for upcoming in pages:
+                    in_flight.append((upcoming, pool.submit(self._request_page, endpoint, params, upcoming)))
+                    break
+                result = future.result()
+                if result.get("error"):
+                    # Skip just this page instead of truncating everything after it
+                    print(f"❌ Page {page}/{total_pages} failed after retries — list may be partial.")
+                    incomplete()
+                    continue
+                print(f"📄 Fetched page {page}/{total_pages}")
+                yield result
     
     def get_brandfolders(self) -> List[Dict]:
         """
@@ -98,11 +199,14 @@ class BrandfolderAPI:
         result = self._request("GET", f"/brandfolders/{brandfolder_id}/collections")
         return result.get("data", [])
     
-    def get_assets(self, section_id: str = None, collection_id: str = None, 
-                   brandfolder_id: str = None, include_attachments: bool = True,
-                   per_page: int = 100) -> List[Dict]:
+    def iter_assets(self, section_id: str = None, collection_id: str = None, 
+                    brandfolder_id: str = None, include_attachments: bool = True,
+                    per_page: int = 100, updated_since: Optional[str] = None,
+                    on_incomplete: Optional[Callable[[], None]] = None) -> Iterator[Dict]:
         """
-        Get assets from a section, collection, or brandfolder.
+        Yield assets from a section, collection, or brandfolder, page by page.
+        Each page's attachments are mapped as it arrives and nothing is kept
+        afterwards, so memory stays flat however large the library is.
         
         Args:
             section_id: Get assets from this section
@@ -110,10 +214,19 @@ class BrandfolderAPI:
             brandfolder_id: Get all assets from this brandfolder
             include_attachments: Whether to include attachment URLs
             per_page: Number of results per page (max 100)
+            updated_since: Only assets whose updated_at is later than this
+                ISO timestamp (incremental sync)
+            on_incomplete: Called when a page could not be fetched (the
+                listing is partial)
         """
         params = {"per": per_page}
         if include_attachments:
             params["include"] = "attachments"
+        if updated_since:
+            # Server-side filter so only changed assets are paged through
+            params["search"] = f"updated_at:>{updated_since}"
+            params["sort_by"] = "updated_at"
+            params["order"] = "DESC"
         
         if section_id:
             endpoint = f"/sections/{section_id}/assets"
@@ -124,56 +237,29 @@ class BrandfolderAPI:
         else:
             raise ValueError("Must provide section_id, collection_id, or brandfolder_id")
         
-        # Initial request
-        result = self._request("GET", endpoint, params)
-        
-        # Map included attachments to assets
-        assets = result.get("data") or []
-        included = result.get("included") or []
-        
-        # Pagination Loop
-        meta = result.get("meta", {})
-        # Brandfolder API puts pagination info directly in meta root sometimes, or in meta.pagination
-        # debug_raw_response.py showed keys: ['current_page', 'next_page', ...] directly in meta
-        next_page = meta.get("next_page")
-        
-        while next_page:
-            print(f"📄 Fetching page {next_page}...")
-
-            # Brandfolder API returns next_page as an integer in meta.
-            # It does NOT reliably return links.next.
-            params["page"] = next_page
-            result = self._request("GET", endpoint, params)
-
-            # Retry transient errors (e.g. rate limits) so a single failed page
-            # does NOT silently truncate the whole library mid-pagination.
-            attempts = 0
-            while result.get("error") and attempts < 3:
-                attempts += 1
-                print(f"⚠️ Page {next_page} error (retry {attempts}/3): {result.get('error')}")
-                time.sleep(1.5 * attempts)
-                result = self._request("GET", endpoint, params)
+        for result in self._iter_pages(endpoint, params, on_incomplete=on_incomplete):
+            page_assets = result.get("data") or []
+            if updated_since:
+                # Guard against the search filter being ignored: never return unchanged assets
+                page_assets = [a for a in page_assets if is_updated_after(a, updated_since)]
+            yield from self._map_attachments_to_assets(page_assets, result.get("included") or [])
 
-            new_assets = result.get("data") or []
-            new_included = result.get("included") or []
-            meta = result.get("meta", {})
-            upcoming = meta.get("next_page")  # None if no more pages
-
-            if not new_assets:
-                if result.get("error"):
-                    print(f"❌ Aborting pagination at page {next_page} after retries — list may be partial.")
-                break
-
-            assets.extend(new_assets)
-            included.extend(new_included)
-            next_page = upcoming
+    def get_assets(self, section_id: str = None, collection_id: str = None, 
+                   brandfolder_id: str = None, include_attachments: bool = True,
+                   per_page: int = 100, updated_since: Optional[str] = None) -> List[Dict]:
+        """
+        Get assets from a section, collection, or brandfolder as a list.
+        Prefer iter_assets for whole-library scans.
+        """
+        return list(self.iter_assets(
+            section_id=section_id, collection_id=collection_id, brandfolder_id=brandfolder_id,
+            include_attachments=include_attachments, per_page=per_page, updated_since=updated_since
+        ))
 
-        return self._map_attachments_to_assets(assets, included)
-    
-    def search_assets(self, brandfolder_id: str, query: str, 
-                      include_attachments: bool = True) -> List[Dict]:
+    def iter_search_assets(self, brandfolder_id: str, query: str,
+                           include_attachments: bool = True) -> Iterator[Dict]:
         """
-        Search for assets within a brandfolder.
+        Yield search results within a brandfolder, page by page.
         
         Args:
             brandfolder_id: The brandfolder to search in
@@ -187,37 +273,17 @@ class BrandfolderAPI:
         if include_attachments:
             params["include"] = "attachments"
         
-        # Initial Request
-        result = self._request("GET", f"/brandfolders/{brandfolder_id}/assets", params)
-        
-        # Map included attachments to assets
-        assets = result.get("data") or []
-        included = result.get("included") or []
-        
-        # Pagination Loop
-        meta = result.get("meta", {})
-        next_page = meta.get("next_page")
-        
-        while next_page:
-            print(f"🔎 Fetching search page {next_page}...")
-            
-            params["page"] = next_page
-            result = self._request("GET", f"/brandfolders/{brandfolder_id}/assets", params)
-            
-            new_assets = result.get("data") or []
-            new_included = result.get("included") or []
-            
-            if not new_assets:
-                break
-                
-            assets.extend(new_assets)
-            included.extend(new_included)
-            
-            # Update info
-            meta = result.get("meta", {})
-            next_page = meta.get("next_page")
+        for result in self._iter_pages(f"/brandfolders/{brandfolder_id}/assets", params):
+            yield from self._map_attachments_to_assets(
+                result.get("data") or [], result.get("included") or []
+            )
 
-        return self._map_attachments_to_assets(assets, included)
+    def search_assets(self, brandfolder_id: str, query: str, 
+                      include_attachments: bool = True) -> List[Dict]:
+        """
+        Search for assets within a brandfolder (all results as a list).
+        """
+        return list(self.iter_search_assets(brandfolder_id, query, include_attachments))
     
     def _map_attachments_to_assets(self, assets: List[Dict], included: List[Dict]) -> List[Dict]:
         """
@@ -265,9 +331,32 @@ class BrandfolderAPI:
         mapped_assets = self._map_attachments_to_assets([asset], included)
         return mapped_assets[0] if mapped_assets else {}
     
+    def _fetch_attachment(self, attachment_url: str, cookies: Optional[Dict] = None) -> str:
+        """Downloads an attachment through the shared downloader. Raises on failure."""
+        headers = {}
+        # Only send Auth header if it's a Brandfolder API URL, not a signed GCS/S3 link
+        if "brandfolder.com/api" in attachment_url:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        def suffix_for(content_type: str) -> str:
+            # Determine file extension
+            if "video" in content_type or "mp4" in attachment_url.lower():
+                return ".mp4"
+            if "audio" in content_type or "mp3" in attachment_url.lower():
+                return ".mp3"
+            if "pdf" in content_type or ".pdf" in attachment_url.lower():
+                return ".pdf"
+            if "word" in content_type or ".docx" in attachment_url.lower():
+                return ".docx"
+            return ".bin"
+
+        return downloader.download(attachment_url, headers=headers, cookies=cookies, suffix_for=suffix_for)
+
     def download_attachment(self, attachment_url: str, cookies: Optional[Dict] = None) -> Optional[str]:
         """
         Download an attachment to a temporary file.
+        Goes through the shared downloader (pooled connections, Range resume,
+        parallel segments for large files, process-wide concurrency bound).
         
         Args:
             attachment_url: URL of the attachment to download
@@ -278,43 +367,20 @@ class BrandfolderAPI:
         """
         try:
             print(f"⬇️ Downloading: {attachment_url[:60]}...")
-            
-            headers = {}
-            # Only send Auth header if it's a Brandfolder API URL, not a signed GCS/S3 link
-            if "brandfolder.com/api" in attachment_url:
-                headers["Authorization"] = f"Bearer {self.api_key}"
-            
-            response = requests.get(
-                attachment_url,
-                headers=headers,
-                cookies=cookies,
-                stream=True,
-                timeout=(10, 300) # 10s connect, 300s (5min) read timeout per chunk
-            )
-
-            response.raise_for_status()
-            
-            # Determine file extension
-            content_type = response.headers.get("Content-Type", "")
-            ext = ".bin"
-            if "video" in content_type or "mp4" in attachment_url.lower():
-                ext = ".mp4"
-            elif "audio" in content_type or "mp3" in attachment_url.lower():
-                ext = ".mp3"
-            elif "pdf" in content_type or ".pdf" in attachment_url.lower():
-                ext = ".pdf"
-            elif "word" in content_type or ".docx" in attachment_url.lower():
-                ext = ".docx"
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    tmp_file.write(chunk)
-                print(f"✅ Downloaded to: {tmp_file.name}")
-                return tmp_file.name
-                
+            path = self._fetch_attachment(attachment_url, cookies=cookies)
+            print(f"✅ Downloaded to: {path}")
+            return path
         except Exception as e:
             print(f"❌ Download failed: {e}")
             return None
+
+    def download_attachments_ahead(self, items, url_for):
+        """
+        Yields (item, local_path, error) in order, downloading up to
+        settings.download_max_concurrency attachments ahead of the consumer.
+        The consumer must remove each yielded file.
+        """
+        return downloader.download_ahead(items, url_for, fetch=self._fetch_attachment)
     
     def extract_asset_info(self, asset: Dict) -> Dict[str, Any]:
         """
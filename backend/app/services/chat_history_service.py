@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import List, Dict, Optional
 from .supabase_service import supabase_service
@@ -25,6 +26,19 @@ class ChatHistoryService:
         """Returns full message history for a session."""
         return supabase_service.get_session_messages(session_id)
 
+    # --- Async variants (non-blocking for async route handlers) ---
+    # The Supabase client is synchronous, so these run it in a worker thread
+    # instead of stalling the event loop for the whole HTTP round-trip.
+
+    async def acreate_session(self, user_id: str, director: str, title: str = "Nueva Conversación") -> Optional[str]:
+        return await asyncio.to_thread(self.create_session, user_id, director, title)
+
+    async def aadd_message(self, session_id: str, role: str, content: str):
+        await asyncio.to_thread(self.add_message, session_id, role, content)
+
+    async def aget_session_messages(self, session_id: str) -> List[Dict]:
+        return await asyncio.to_thread(self.get_session_messages, session_id)
+
     def update_session_title(self, session_id: str, title: str):
         """Updates the title of a session."""
         if supabase_service.client:
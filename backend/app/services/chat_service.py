@@ -7,6 +7,7 @@ from google import genai
 from google.genai import types
 from typing import List, Dict, Optional
 import os
+import asyncio
 import logging
 
 from .personas import PERSONAS
@@ -93,25 +94,8 @@ class ChatService:
 
         return types.GenerateContentConfig(**kwargs)
 
-    def generate_response(
-        self,
-        user_input: str,
-        history: List[Dict[str, str]] = [],
-        director: str = "Programación de Servicio",
-        rag_context: Optional[str] = None,
-        use_tools: bool = True,
-        model: Optional[str] = None,
-    ) -> str:
-        """
-        Generate an AI response.
-
-        When use_tools is True, the agent can autonomously search the knowledge
-        base, browse live pages, and read YouTube transcripts in a multi-step
-        loop (Gemini automatic function calling).
-        """
-        if not self.client:
-            return "⚠️ **Error:** No Google Gemini API Key configured."
-
+    def _build_system_prompt(self, director: str, rag_context: Optional[str] = None) -> str:
+        """Persona prompt + church memory + optional pre-fetched RAG grounding."""
         # Get system prompt for selected director
         system_prompt = PERSONAS.get(director, PERSONAS["Programación de Servicio"])
 
@@ -134,8 +118,11 @@ Use this context to provide more specific and accurate answers. If you need MORE
 specific information, use the `search_knowledge_base` tool. If the context doesn't
 apply, use your general knowledge.
 """
+        return system_prompt
 
-        # Build conversation history
+    @staticmethod
+    def _build_contents(user_input: str, history: List[Dict[str, str]]) -> List[types.Content]:
+        """Last 10 history turns followed by the current user message."""
         contents = []
         for msg in history[-10:]:
             role = "user" if msg["role"] == "user" else "model"
@@ -148,6 +135,29 @@ apply, use your general knowledge.
             role="user",
             parts=[types.Part.from_text(text=user_input)]
         ))
+        return contents
+
+    def generate_response(
+        self,
+        user_input: str,
+        history: List[Dict[str, str]] = [],
+        director: str = "Programación de Servicio",
+        rag_context: Optional[str] = None,
+        use_tools: bool = True,
+        model: Optional[str] = None,
+    ) -> str:
+        """
+        Generate an AI response.
+
+        When use_tools is True, the agent can autonomously search the knowledge
+        base, browse live pages, and read YouTube transcripts in a multi-step
+        loop (Gemini automatic function calling).
+        """
+        if not self.client:
+            return "⚠️ **Error:** No Google Gemini API Key configured."
+
+        system_prompt = self._build_system_prompt(director, rag_context)
+        contents = self._build_contents(user_input, history)
 
         # Generate response (agentic loop handled by the SDK when tools are enabled)
         try:
@@ -160,7 +170,39 @@ apply, use your general knowledge.
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             return f"❌ Error generating response: {str(e)}"
-    
+
+    async def agenerate_response(
+        self,
+        user_input: str,
+        history: List[Dict[str, str]] = [],
+        director: str = "Programación de Servicio",
+        rag_context: Optional[str] = None,
+        use_tools: bool = True,
+        model: Optional[str] = None,
+    ) -> str:
+        """
+        Async variant of generate_response using the async Gemini client
+        (client.aio), so the event loop stays free during the model call.
+        Sync tools run in worker threads via the SDK's async AFC loop.
+        """
+        if not self.client:
+            return "⚠️ **Error:** No Google Gemini API Key configured."
+
+        # Church memory may hit Supabase on a cache miss
+        system_prompt = await asyncio.to_thread(self._build_system_prompt, director, rag_context)
+        contents = self._build_contents(user_input, history)
+
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=model or self.model_name,
+                contents=contents,
+                config=self._build_config(system_prompt, use_tools=use_tools, model=model),
+            )
+            return response.text or "⚠️ No pude generar una respuesta. Intenta reformular tu pregunta."
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            return f"❌ Error generating response: {str(e)}"
+
     def generate_response_stream(
         self,
         user_input: str,
@@ -179,46 +221,47 @@ apply, use your general knowledge.
             yield "⚠️ **Error:** No Google Gemini API Key configured."
             return
 
-        system_prompt = PERSONAS.get(director, PERSONAS["Programación de Servicio"])
+        system_prompt = self._build_system_prompt(director, rag_context)
+        contents = self._build_contents(user_input, history)
 
-        # Inject church memory (who this church is) so advice is context-specific
         try:
-            system_prompt += church_profile_service.build_context()
-        except Exception as ctx_err:
-            logger.debug(f"Church context unavailable: {ctx_err}")
-
-        if rag_context:
-            system_prompt += f"""
-
-## RELEVANT CONTEXT FROM KNOWLEDGE BASE:
-The following is information retrieved from the church's knowledge base that may be relevant to the user's question:
-
-{rag_context}
+            stream = self.client.models.generate_content_stream(
+                model=model or self.model_name,
+                contents=contents,
+                config=self._build_config(system_prompt, use_tools=use_tools, model=model),
+            )
+            for chunk in stream:
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            yield f"\n\n❌ Error generando respuesta: {str(e)}"
 
-Use this context to provide more specific and accurate answers. If you need MORE
-specific information, use the `search_knowledge_base` tool. If the context doesn't
-apply, use your general knowledge.
-"""
+    async def agenerate_response_stream(
+        self,
+        user_input: str,
+        history: List[Dict[str, str]] = [],
+        director: str = "Programación de Servicio",
+        rag_context: Optional[str] = None,
+        use_tools: bool = True,
+        model: Optional[str] = None,
+    ):
+        """Async generator variant of generate_response_stream (client.aio)."""
+        if not self.client:
+            yield "⚠️ **Error:** No Google Gemini API Key configured."
+            return
 
-        contents = []
-        for msg in history[-10:]:
-            role = "user" if msg["role"] == "user" else "model"
-            contents.append(types.Content(
-                role=role,
-                parts=[types.Part.from_text(text=msg["content"])]
-            ))
-        contents.append(types.Content(
-            role="user",
-            parts=[types.Part.from_text(text=user_input)]
-        ))
+        system_prompt = await asyncio.to_thread(self._build_system_prompt, director, rag_context)
+        contents = self._build_contents(user_input, history)
 
         try:
-            stream = self.client.models.generate_content_stream(
+            stream = await self.client.aio.models.generate_content_stream(
                 model=model or self.model_name,
                 contents=contents,
                 config=self._build_config(system_prompt, use_tools=use_tools, model=model),
             )
-            for chunk in stream:
+            async for chunk in stream:
                 text = getattr(chunk, "text", None)
                 if text:
                     yield text
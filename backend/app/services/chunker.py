@@ -0,0 +1,147 @@
+"""
+chunker.py - Token-sized, sentence-aware chunking for the vector store.
+
+Used by VectorStoreService.prepare_chunks:
+
+  - chunks are sized in embedding-model tokens (settings.chunk_max_tokens)
+    instead of characters, so none is silently truncated by the embedder,
+  - overlap (settings.chunk_overlap_tokens) is made of whole trailing
+    sentences of the previous chunk, never a cut through a word,
+  - one pass over the text: sentence/paragraph boundaries come from a single
+    compiled regex scan, chunks are built with "".join, and nothing is
+    re-scanned except the few overlap sentences,
+  - input can be a page stream (pdf_extractor.iter_pdf_pages), so a whole
+    manual never has to be materialized as one string.
+
+Gemini has no local tokenizer, so `estimate_tokens` approximates its
+SentencePiece count (about one token per 4 characters of each word, one
+per punctuation mark); it errs on the high side, which keeps chunks under
+the model limit. Pass `count_tokens=` to use an exact counter instead.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from ..core.config import settings
+
+_WORDPIECE = re.compile(r"\w+|[^\w\s]")
+# A sentence ends at . ! ? … (plus closing quotes/brackets) followed by
+# whitespace, or at a paragraph break
+_BOUNDARY = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+|\n\s*\n")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate embedding-model token count for `text`."""
+    return sum((len(piece) + 3) // 4 for piece in _WORDPIECE.findall(text))
+
+
+@dataclass
+class _Sentence:
+    text: str
+    tokens: int
+    paragraph_start: bool  # preceded by a paragraph break
+
+
+class TokenChunker:
+    """Packs sentences into chunks of at most `max_tokens`, overlapping by whole sentences."""
+
+    def __init__(
+        self,
+        max_tokens: int = None,
+        overlap_tokens: int = None,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.max_tokens = max_tokens or settings.chunk_max_tokens
+        self.overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+        self.count_tokens = count_tokens
+        # Unterminated text carried between pages is force-split past this size
+        self._max_carry_chars = self.max_tokens * 16
+
+    # ── Sentences ────────────────────────────────────────────────
+
+    def _sentences(self, pages: Iterable[str]) -> Iterator[_Sentence]:
+        carry = ""
+        paragraph_start = True
+        for page in pages:
+            if not page:
+                continue
+            # A sentence may run across a page break
+            text = f"{carry}\n{page}" if carry else page
+            start = 0
+            for match in _BOUNDARY.finditer(text):
+                piece = text[start:match.end()].strip()
+                if piece:
+                    yield _Sentence(piece, self.count_tokens(piece), paragraph_start)
+                paragraph_start = bool(_PARAGRAPH.search(match.group()))
+                start = match.end()
+            carry = text[start:]
+            if len(carry) > self._max_carry_chars:
+                # No boundary for a long stretch: hand it over as one oversized "sentence"
+                yield _Sentence(carry.strip(), self.count_tokens(carry), paragraph_start)
+                carry, paragraph_start = "", False
+        carry = carry.strip()
+        if carry:
+            yield _Sentence(carry, self.count_tokens(carry), paragraph_start)
+
+    def _split_oversized(self, sentence: _Sentence) -> Iterator[_Sentence]:
+        """Word-boundary split of a sentence longer than max_tokens."""
+        words: List[str] = []
+        tokens = 0
+        first = True
+        for word in sentence.text.split():
+            word_tokens = self.count_tokens(word)
+            if words and tokens + word_tokens > self.max_tokens:
+                yield _Sentence(" ".join(words), tokens, sentence.paragraph_start and first)
+                words, tokens, first = [], 0, False
+            words.append(word)
+            tokens += word_tokens
+        if words:
+            yield _Sentence(" ".join(words), tokens, sentence.paragraph_start and first)
+
+    # ── Packing ──────────────────────────────────────────────────
+
+    @staticmethod
+    def _render(sentences: List[_Sentence]) -> str:
+        parts = []
+        for i, s in enumerate(sentences):
+            if i:
+                parts.append("\n\n" if s.paragraph_start else " ")
+            parts.append(s.text)
+        return "".join(parts)
+
+    def _overlap(self, sentences: List[_Sentence]) -> List[_Sentence]:
+        """Whole trailing sentences worth at most overlap_tokens."""
+        kept: List[_Sentence] = []
+        tokens = 0
+        for s in reversed(sentences):
+            if tokens + s.tokens > self.overlap_tokens:
+                break
+            kept.append(s)
+            tokens += s.tokens
+        kept.reverse()
+        return kept
+
+    def chunk_pages(self, pages: Iterable[str]) -> Iterator[str]:
+        """Yields chunks for a stream of text pieces (pages, paragraphs, or one document)."""
+        current: List[_Sentence] = []
+        tokens = 0
+        for sentence in self._sentences(pages):
+            pieces = [sentence] if sentence.tokens <= self.max_tokens else self._split_oversized(sentence)
+            for piece in pieces:
+                if current and tokens + piece.tokens > self.max_tokens:
+                    yield self._render(current)
+                    current = self._overlap(current)
+                    tokens = sum(s.tokens for s in current)
+                    # Drop overlap that would not leave room for the new sentence
+                    while current and tokens + piece.tokens > self.max_tokens:
+                        tokens -= current.pop(0).tokens
+                current.append(piece)
+                tokens += piece.tokens
+        if current:
+            yield self._render(current)
+
+    def chunk(self, content: Optional[str]) -> List[str]:
+        content = (content or "").strip()
+        return list(self.chunk_pages([content])) if content else []
@@ -0,0 +1,283 @@
+"""
+document_writer.py - Atomic, batched document + chunk writes to Supabase.
+
+store_document used to insert the `documents` row first and then every chunk
+in one `document_chunks.insert` payload: a big document produced a multi-MB
+body that timed out, and any failure left a chunkless `documents` row that
+existence checks treated as indexed forever. Writes now go through the
+server-side functions in supabase_migrations/004_atomic_document_writes.sql:
+
+  - a document whose chunks fit one batch (settings.chunk_insert_batch_bytes /
+    chunk_insert_batch_rows) is written by `store_document_atomic`: document,
+    chunks and the removal of a replaced version in one transaction,
+  - larger documents are staged under the source "staging://<id>", their chunks
+    inserted in size-bounded batches (settings.chunk_insert_concurrency in
+    flight), then published by `commit_document`, which swaps the source in
+    and drops the replaced version atomically. A failed write deletes the
+    staged rows; the real source never points at a partial document.
+    Staged chunks are kept out of search by match_published_documents
+    (migration 007), and `purge_staged` drops copies left by a crash.
+
+Until the migration is applied the functions are missing and the writer
+falls back to direct inserts (still batched, with the document row deleted
+again when a batch fails).
+
+With settings.embedding_wire_format "float32"/"float16" chunk vectors are
+sent base64-encoded (services/vector_codec.py) through the functions of
+migration 005, and read back the same way; without that migration the
+writer drops back to JSON lists.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..core.config import settings
+from .local_index import parse_embedding
+from .vector_codec import BYTES_PER_DIMENSION, check_format, decode_vector, encode_vector
+
+logger = logging.getLogger(__name__)
+
+STAGING_PREFIX = "staging://"
+
+
+def _is_missing_function(error: Exception) -> bool:
+    """PostgREST's answer when an RPC does not exist (migration not applied)."""
+    return getattr(error, "code", None) == "PGRST202" or "Could not find the function" in str(error)
+
+
+def _row_bytes(row: Dict, wire_format: str = "json") -> int:
+    """Rough JSON size of a chunk row once its embedding is encoded."""
+    return len(row["content"].encode("utf-8")) + BYTES_PER_DIMENSION[wire_format] * len(row["embedding"]) + 200
+
+
+def _encoded(rows: List[Dict], wire_format: str) -> List[Dict]:
+    if wire_format == "json":
+        return rows
+    return [dict(row, embedding=encode_vector(row["embedding"], wire_format)) for row in rows]
+
+
+class SupabaseDocumentWriter:
+    """Writes one document and its chunk rows, atomically where the server functions exist."""
+
+    def __init__(
+        self,
+        client,
+        batch_bytes: int = None,
+        batch_rows: int = None,
+        concurrency: int = None,
+        wire_format: str = None,
+    ):
+        self.client = client
+        self.batch_bytes = batch_bytes or settings.chunk_insert_batch_bytes
+        self.batch_rows = batch_rows or settings.chunk_insert_batch_rows
+        self.concurrency = concurrency or settings.chunk_insert_concurrency
+        self.wire_format = check_format(wire_format or settings.embedding_wire_format)
+        # Unknown until the first call: migration 004 (atomic writes) / 005 (compact vectors)
+        self._rpc_available: Optional[bool] = None
+        self._compact_available: Optional[bool] = None
+
+    def _format(self) -> str:
+        """Wire format for the next write: compact only while migration 005 is known or assumed present."""
+        if self.wire_format == "json" or self._compact_available is False:
+            return "json"
+        return self.wire_format
+
+    def _compact_missing(self, error: Exception):
+        logger.warning(f"Compact vector functions not found ({error}); apply supabase_migrations/005. Sending JSON.")
+        self._compact_available = False
+
+    def batches(self, rows: List[Dict], wire_format: str = "json") -> Iterator[List[Dict]]:
+        """Consecutive rows grouped under the byte and row limits."""
+        batch: List[Dict] = []
+        size = 0
+        for row in rows:
+            row_size = _row_bytes(row, wire_format)
+            if batch and (size + row_size > self.batch_bytes or len(batch) >= self.batch_rows):
+                yield batch
+                batch, size = [], 0
+            batch.append(row)
+            size += row_size
+        if batch:
+            yield batch
+
+    def write(self, document: Dict, rows: List[Dict], replace: bool = False) -> bool:
+        """
+        Stores `document` ({id, source, title, doc_type, metadata}) with its
+        chunk rows. Returns False when the source already exists and `replace`
+        is off, or when the write failed (nothing partial is left behind).
+        """
+        if not rows:
+            logger.warning(f"Refusing to store {document['source']} without chunks")
+            return False
+        wire_format = self._format()
+        batches = list(self.batches(rows, wire_format))
+        if self._rpc_available is not False and len(batches) <= 1:
+            params = {
+                "p_document": document,
+                "p_chunks": _encoded(batches[0], wire_format) if batches else [],
+                "p_replace": replace,
+            }
+            if wire_format != "json":
+                params["p_encoding"] = wire_format
+            try:
+                stored = self.client.rpc("store_document_atomic", params).execute().data
+                self._rpc_available = True
+                if wire_format != "json":
+                    self._compact_available = True
+                return bool(stored)
+            except Exception as e:
+                if not _is_missing_function(e):
+                    logger.error(f"Error storing {document['source']}: {e}")
+                    return False
+                if wire_format != "json":
+                    # 004 without 005: the p_encoding overload is what is missing
+                    self._compact_missing(e)
+                    return self.write(document, rows, replace)
+                logger.warning("store_document_atomic not found; apply supabase_migrations/004. Using direct inserts.")
+                self._rpc_available = False
+
+        staged = self._rpc_available is not False
+        source = document["source"]
+        row = dict(document, source=f"{STAGING_PREFIX}{document['id']}" if staged else source)
+        try:
+            self.client.table("documents").insert(row).execute()
+        except Exception as e:
+            logger.error(f"Error inserting document {source}: {e}")
+            return False
+
+        try:
+            self._insert_batches(batches, wire_format)
+        except Exception as e:
+            logger.error(f"Error inserting chunks for {source}: {e}")
+            self._discard(document["id"])
+            return False
+
+        if not staged:
+            logger.info(f"Stored {len(rows)} chunks for {source} in {len(batches)} batches")
+            return True
+        try:
+            committed = self.client.rpc("commit_document", {
+                "p_document_id": document["id"],
+                "p_source": source,
+                "p_replace": replace,
+            }).execute().data
+            self._rpc_available = True
+        except Exception as e:
+            if _is_missing_function(e):
+                self._rpc_available = False
+                return self._publish_without_rpc(document["id"], source, replace)
+            logger.error(f"Error publishing {source}: {e}")
+            self._discard(document["id"])
+            return False
+        if committed:
+            logger.info(f"Stored {len(rows)} chunks for {source} in {len(batches)} batches")
+        return bool(committed)
+
+    def _publish_without_rpc(self, document_id: str, source: str, replace: bool) -> bool:
+        """
+        commit_document's job done client-side (functions not deployed): not
+        atomic, but never leaves the staged copy behind or two versions of
+        `source` in place.
+        """
+        try:
+            existing = self.client.table("documents").select("id").eq("source", source).execute()
+            previous = [row["id"] for row in (existing.data or []) if row["id"] != document_id]
+            if previous and not replace:
+                logger.info(f"{source} was stored meanwhile; dropping the staged copy")
+                self._discard(document_id)
+                return False
+            self.client.table("documents").update({"source": source}).eq("id", document_id).execute()
+        except Exception as e:
+            logger.error(f"Error publishing {source}: {e}")
+            self._discard(document_id)
+            return False
+        for old_id in previous:
+            self._discard(old_id)
+        return True
+
+    def _insert_compact(self, batch: List[Dict], wire_format: str) -> bool:
+        """insert_document_chunks (an upsert) with encoded vectors; False if migration 005 is missing."""
+        if self._compact_available is False:
+            return False
+        try:
+            self.client.rpc("insert_document_chunks", {
+                "p_chunks": _encoded(batch, wire_format),
+                "p_encoding": wire_format,
+            }).execute()
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            self._compact_missing(e)
+            return False
+        self._compact_available = True
+        return True
+
+    def _insert_batches(self, batches: List[List[Dict]], wire_format: str = "json"):
+        # With the migration applied, (document_id, chunk_index) is unique and a
+        # retried batch that did land the first time is upserted, not duplicated
+        retryable = self._rpc_available is True or wire_format != "json"
+
+        def insert(batch):
+            attempts = 2 if retryable else 1
+            for attempt in range(attempts):
+                try:
+                    if wire_format != "json" and self._insert_compact(batch, wire_format):
+                        return
+                    table = self.client.table("document_chunks")
+                    if self._rpc_available is True:
+                        table.upsert(batch, on_conflict="document_id,chunk_index").execute()
+                    else:
+                        table.insert(batch).execute()
+                    return
+                except Exception as e:
+                    if attempt + 1 == attempts:
+                        raise
+                    logger.warning(f"Chunk batch failed ({e}); retrying once")
+
+        if len(batches) <= 1 or self.concurrency <= 1:
+            for batch in batches:
+                insert(batch)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+            for future in [pool.submit(insert, batch) for batch in batches]:
+                future.result()
+
+    def read_chunks(self, document_id: str) -> List[Tuple[str, List[float]]]:
+        """(content, embedding) of a stored document in chunk order, as float32 when compact reads are available."""
+        if self.wire_format != "json" and self._compact_available is not False:
+            try:
+                rows = self.client.rpc("document_chunk_vectors", {"p_document_id": document_id}).execute().data or []
+                self._compact_available = True
+                return [(r["content"], decode_vector(r["embedding"], "float32")) for r in rows]
+            except Exception as e:
+                if not _is_missing_function(e):
+                    raise
+                self._compact_missing(e)
+        rows = self.client.table("document_chunks").select("content, embedding") \
+            .eq("document_id", document_id).order("chunk_index").execute().data or []
+        return [(r["content"], parse_embedding(r["embedding"])) for r in rows]
+
+    def purge_staged(self, older_than_hours: int = 24) -> int:
+        """
+        Deletes staged documents abandoned by a crashed writer (run at startup;
+        commit_document only purges when another large document is published).
+        Returns how many were removed.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=older_than_hours)).isoformat()
+        rows = self.client.table("documents").select("id").like("source", f"{STAGING_PREFIX}%") \
+            .lt("created_at", cutoff).execute().data or []
+        for row in rows:
+            self._discard(row["id"])
+        if rows:
+            logger.info(f"Purged {len(rows)} abandoned staged documents")
+        return len(rows)
+
+    def _discard(self, document_id: str):
+        """Best-effort removal of a partially written document."""
+        try:
+            self.client.table("document_chunks").delete().eq("document_id", document_id).execute()
+            self.client.table("documents").delete().eq("id", document_id).execute()
+        except Exception as e:
+            logger.error(f"Could not clean up partial document {document_id}: {e}")
@@ -0,0 +1,171 @@
+"""
+embedding_cache.py - Persistent content-addressed embedding cache.
+
+Re-ingests, retries after a failed store_document and repeated chat questions
+all embed identical text. This cache keys every vector by a hash of
+(embedding model + normalized text) and keeps it on disk next to
+irresistible_app.db, so identical text is only ever sent to Gemini once.
+
+Vectors are stored as compact float32 blobs. The table is size-bounded:
+once it exceeds `embedding_cache_max_entries` the least recently used
+entries are evicted.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Same volume as the app DB (see research_service.py / sync_service.py)
+if os.path.exists("/app/brain_data"):
+    CACHE_DB_PATH = "/app/brain_data/embedding_cache.db"
+else:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    CACHE_DB_PATH = os.path.abspath(os.path.join(current_dir, "../../..", "embedding_cache.db"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies share one cache entry."""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def cache_key(model: str, text: str) -> str:
+    """Content address for a (model, text) pair."""
+    payload = f"{model}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _pack(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU cache of embedding vectors."""
+
+    def __init__(self, path: str = CACHE_DB_PATH, max_entries: int = None):
+        self.path = path
+        self.max_entries = max_entries or settings.embedding_cache_max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._count = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    dim INTEGER,
+                    vector BLOB,
+                    last_used REAL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_lru ON embedding_cache (last_used)")
+            conn.commit()
+            self._count = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[int, List[float]]:
+        """Returns {index: vector} for every text already cached."""
+        if not texts:
+            return {}
+        keys = [cache_key(model, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                unique = list(dict.fromkeys(keys))
+                # Stay well under SQLite's bound-parameter limit
+                for i in range(0, len(unique), 500):
+                    part = unique[i:i + 500]
+                    placeholders = ",".join("?" * len(part))
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", part
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = _unpack(blob)
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embedding_cache SET last_used=? WHERE key=?",
+                        [(now, k) for k in found]
+                    )
+                    conn.commit()
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+        return {i: found[k] for i, k in enumerate(keys) if k in found}
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text]).get(0)
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Stores vectors for texts; empty vectors (failed embeddings) are skipped."""
+        now = time.time()
+        rows = {
+            cache_key(model, t): (cache_key(model, t), model, len(v), _pack(v), now)
+            for t, v in zip(texts, vectors) if v
+        }
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                # Only keys not stored yet grow the table (a replaced key does not)
+                keys = list(rows)
+                existing = 0
+                for i in range(0, len(keys), 500):
+                    part = keys[i:i + 500]
+                    placeholders = ",".join("?" * len(part))
+                    existing += conn.execute(
+                        f"SELECT COUNT(*) FROM embedding_cache WHERE key IN ({placeholders})", part
+                    ).fetchone()[0]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (key, model, dim, vector, last_used) VALUES (?,?,?,?,?)",
+                    list(rows.values())
+                )
+                conn.commit()
+                self._count += len(rows) - existing
+                if self._count > self.max_entries:
+                    self._evict(conn)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def put(self, model: str, text: str, vector: Sequence[float]):
+        self.put_many(model, [text], [vector])
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drops least-recently-used entries down to 90% of capacity (amortizes eviction)."""
+        target = int(self.max_entries * 0.9)
+        excess = self._count - target
+        conn.execute(
+            "DELETE FROM embedding_cache WHERE key IN "
+            "(SELECT key FROM embedding_cache ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        conn.commit()
+        self._count = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        logger.info(f"Embedding cache evicted {excess} entries ({self._count} remain)")
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,280 @@
+"""
+http_client.py - Shared outbound HTTP clients (sync + async).
+
+Brandfolder, Planning Center (API + OAuth) and live-page browsing all go
+through one long-lived httpx client per flavour instead of a bare
+requests.get per call, so TCP+TLS handshakes are paid once per host:
+
+  - per-host connection pools with keep-alive (settings.http_max_connections,
+    http_max_keepalive_connections, http_keepalive_expiry_seconds),
+  - HTTP/2 when enabled and the `h2` package is installed,
+  - default timeouts and connect-error retries (settings.http_*),
+  - optional per-upstream rate budgets with Retry-After handling and
+    jittered backoff (`upstream=` argument, see rate_limiter.py),
+  - per-host metrics (requests, errors, latency, new connections) via
+    `http_metrics.snapshot()`.
+
+Use `get_http_client()` from sync code (threads, APScheduler jobs) and
+`get_async_http_client()` from async handlers.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+import httpx
+
+from ..core.config import settings
+from .rate_limiter import RETRY_STATUSES, get_upstream
+
+logger = logging.getLogger(__name__)
+
+HTTPError = httpx.HTTPError
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HttpMetrics:
+    """Thread-safe per-host counters for outbound calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"requests": 0, "errors": 0, "connections": 0, "total_ms": 0.0}
+        )
+
+    def record(self, host: str, elapsed_ms: float, error: bool = False):
+        with self._lock:
+            stats = self._hosts[host]
+            stats["requests"] += 1
+            stats["total_ms"] += elapsed_ms
+            if error:
+                stats["errors"] += 1
+
+    def connection_opened(self, host: str):
+        with self._lock:
+            self._hosts[host]["connections"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """{host: {requests, errors, connections, avg_ms}}; requests/connections shows reuse."""
+        with self._lock:
+            return {
+                host: {
+                    "requests": s["requests"],
+                    "errors": s["errors"],
+                    "connections": s["connections"],
+                    "avg_ms": round(s["total_ms"] / s["requests"], 1) if s["requests"] else 0.0,
+                }
+                for host, s in self._hosts.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+
+http_metrics = HttpMetrics()
+
+
+def _trace(request: httpx.Request):
+    """httpcore trace hook: counts new TCP connections per host."""
+    host = request.url.host
+
+    def trace(event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            http_metrics.connection_opened(host)
+
+    async def atrace(event_name: str, info: dict):
+        trace(event_name, info)
+
+    return trace, atrace
+
+
+def _client_options() -> dict:
+    http2 = settings.http2_enabled and _http2_available()
+    return {
+        "http2": http2,
+        "timeout": httpx.Timeout(settings.http_timeout_seconds, connect=settings.http_connect_timeout_seconds),
+        "limits": httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        ),
+        "follow_redirects": True,
+    }
+
+
+class HttpClient:
+    """Pooled sync client. Returns httpx.Response; raises httpx.HTTPError on transport failures."""
+
+    def __init__(self, transport: Optional[httpx.BaseTransport] = None):
+        options = _client_options()
+        transport = transport or httpx.HTTPTransport(
+            http2=options["http2"], limits=options["limits"], retries=settings.http_connect_retries
+        )
+        self._client = httpx.Client(transport=transport, **options)
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = self._client.send(request)
+        except httpx.HTTPError:
+            http_metrics.record(request.url.host, (time.perf_counter() - started) * 1000, error=True)
+            raise
+        http_metrics.record(
+            request.url.host, (time.perf_counter() - started) * 1000, error=response.status_code >= 500
+        )
+        return response
+
+    def request(self, method: str, url: str, upstream: Optional[str] = None, **kwargs) -> httpx.Response:
+        """
+        Sends a request. With `upstream` ("brandfolder", "planning_center", ...)
+        the call spends that upstream's shared rate budget and 429/5xx/transport
+        errors are retried with backoff (see rate_limiter.py).
+        """
+        request = self._client.build_request(method, url, **kwargs)
+        trace, _ = _trace(request)
+        request.extensions["trace"] = trace
+        if not upstream:
+            return self._send(request)
+
+        limiter = get_upstream(upstream)
+        attempt = 0
+        while True:
+            time.sleep(limiter.reserve())
+            try:
+                response = self._send(request)
+            except httpx.TransportError as e:
+                attempt += 1
+                if attempt > limiter.max_retries:
+                    raise
+                delay = limiter.backoff(attempt)
+                logger.warning(f"{upstream} transport error ({e}); retry {attempt} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < limiter.max_retries:
+                attempt += 1
+                delay = limiter.retry_delay(response.headers, response.status_code, attempt)
+                logger.warning(f"{upstream} HTTP {response.status_code}; retry {attempt} in {delay:.1f}s")
+                response.close()
+                time.sleep(delay)
+                continue
+            limiter.observe(response.headers, response.status_code)
+            return response
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self._client.close()
+
+
+class AsyncHttpClient:
+    """Pooled async client (same pools/limits/metrics as HttpClient)."""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        options = _client_options()
+        transport = transport or httpx.AsyncHTTPTransport(
+            http2=options["http2"], limits=options["limits"], retries=settings.http_connect_retries
+        )
+        self._client = httpx.AsyncClient(transport=transport, **options)
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self._client.send(request)
+        except httpx.HTTPError:
+            http_metrics.record(request.url.host, (time.perf_counter() - started) * 1000, error=True)
+            raise
+        http_metrics.record(
+            request.url.host, (time.perf_counter() - started) * 1000, error=response.status_code >= 500
+        )
+        return response
+
+    async def request(self, method: str, url: str, upstream: Optional[str] = None, **kwargs) -> httpx.Response:
+        """Async twin of HttpClient.request (same shared upstream budgets)."""
+        request = self._client.build_request(method, url, **kwargs)
+        _, atrace = _trace(request)
+        request.extensions["trace"] = atrace
+        if not upstream:
+            return await self._send(request)
+
+        limiter = get_upstream(upstream)
+        attempt = 0
+        while True:
+            await asyncio.sleep(limiter.reserve())
+            try:
+                response = await self._send(request)
+            except httpx.TransportError as e:
+                attempt += 1
+                if attempt > limiter.max_retries:
+                    raise
+                delay = limiter.backoff(attempt)
+                logger.warning(f"{upstream} transport error ({e}); retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < limiter.max_retries:
+                attempt += 1
+                delay = limiter.retry_delay(response.headers, response.status_code, attempt)
+                logger.warning(f"{upstream} HTTP {response.status_code}; retry {attempt} in {delay:.1f}s")
+                await response.aclose()
+                await asyncio.sleep(delay)
+                continue
+            limiter.observe(response.headers, response.status_code)
+            return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_sync_client: Optional[HttpClient] = None
+_async_client: Optional[AsyncHttpClient] = None
+_init_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Process-wide sync client (created on first use)."""
+    global _sync_client
+    if _sync_client is None:
+        with _init_lock:
+            if _sync_client is None:
+                _sync_client = HttpClient()
+                logger.info(f"Shared HTTP client ready (http2={_client_options()['http2']})")
+    return _sync_client
+
+
+def get_async_http_client() -> AsyncHttpClient:
+    """Process-wide async client, for use on the app's event loop."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncHttpClient()
+    return _async_client
+
+
+async def close_http_clients():
+    """Closes both shared clients (app shutdown)."""
+    global _sync_client, _async_client
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,230 @@
+"""
+image_captioner.py - Batched, cached image captioning for MediaService.
+
+The library is mostly graphics, so captions dominate sync call count. Instead
+of one Gemini call per image:
+
+  - images are downsized to settings.caption_max_dimension (JPEG) before
+    upload when Pillow is installed,
+  - concurrent `caption()` calls are packed into one multi-image request
+    (up to settings.caption_batch_size, waiting at most
+    settings.caption_batch_wait_seconds for a batch to fill),
+  - batches run concurrently (settings.caption_batch_concurrency),
+  - captions are cached by image fingerprint in SQLite, so an image seen
+    under any asset is captioned once.
+
+An image the batch response does not cover is retried on its own. Failures
+come back as the same "[Image caption failed: ...]" text describe_image has
+always returned, and are not cached.
+"""
+
+import io
+import os
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..core.config import settings
+from .media_preprocess import media_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Same volume as the app DB (see research_service.py / sync_service.py)
+if os.path.exists("/app/brain_data"):
+    CAPTION_DB_PATH = "/app/brain_data/image_captions.db"
+else:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    CAPTION_DB_PATH = os.path.abspath(os.path.join(current_dir, "../../..", "image_captions.db"))
+
+
+def downsize_image(file_path: str, mime_type: str, max_dimension: int = None) -> Tuple[bytes, str]:
+    """
+    Image bytes to send for captioning: re-encoded as JPEG no larger than
+    `max_dimension` on its long side. Falls back to the original bytes when
+    Pillow is missing, the image is already small, or it cannot be decoded.
+    """
+    max_dimension = max_dimension or settings.caption_max_dimension
+    with open(file_path, "rb") as f:
+        data = f.read()
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, mime_type
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if max(img.size) <= max_dimension and mime_type in ("image/jpeg", "image/png", "image/webp"):
+                return data, mime_type
+            img.thumbnail((max_dimension, max_dimension))
+            if img.mode in ("RGBA", "LA", "P"):
+                # Flatten transparency onto white (graphics are mostly designed on light backgrounds)
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.split()[-1])
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=85)
+            return out.getvalue(), "image/jpeg"
+    except Exception as e:
+        logger.warning(f"Could not downsize {file_path}, sending original: {e}")
+        return data, mime_type
+
+
+@dataclass
+class _CaptionRequest:
+    content_hash: str
+    image: bytes = field(repr=False)
+    mime_type: str
+    future: Future
+    media_service: object = None
+
+
+class ImageCaptioner:
+    """Micro-batcher in front of MediaService.caption_images, with a persistent caption cache."""
+
+    def __init__(
+        self,
+        path: str = CAPTION_DB_PATH,
+        batch_size: int = None,
+        batch_wait: float = None,
+        concurrency: int = None,
+    ):
+        self.path = path
+        self.batch_size = batch_size or settings.caption_batch_size
+        self.batch_wait = settings.caption_batch_wait_seconds if batch_wait is None else batch_wait
+        self.concurrency = concurrency or settings.caption_batch_concurrency
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: List[_CaptionRequest] = []
+        self._timer: Optional[threading.Timer] = None
+        self._inflight: Dict[str, Future] = {}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS caption_cache (
+                    content_hash TEXT PRIMARY KEY,
+                    caption TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="caption")
+        return self._executor
+
+    def cached_caption(self, content_hash: str) -> Optional[str]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT caption FROM caption_cache WHERE content_hash=?", (content_hash,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _store(self, content_hash: str, caption: str):
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO caption_cache (content_hash, caption) VALUES (?, ?)",
+                (content_hash, caption)
+            )
+            conn.commit()
+
+    # ── Public API ───────────────────────────────────────────────
+
+    def submit(self, file_path: str, mime_type: str = "image/jpeg", media_service=None) -> Future:
+        """Queues an image for the next batch; the Future resolves to its caption."""
+        content_hash = media_fingerprint(file_path)
+        cached = self.cached_caption(content_hash)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        # Downsizing runs on the caller's thread, so concurrent callers do it in parallel
+        image, mime_type = downsize_image(file_path, mime_type)
+        batch = None
+        with self._lock:
+            if content_hash in self._inflight:
+                return self._inflight[content_hash]
+            future = Future()
+            self._inflight[content_hash] = future
+            self._pending.append(_CaptionRequest(content_hash, image, mime_type, future, media_service))
+            if len(self._pending) >= self.batch_size:
+                batch = self._take_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.batch_wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._pool().submit(self._run_batch, batch)
+        return future
+
+    def flush(self):
+        """Sends whatever is pending now instead of waiting for the batch to fill."""
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._pool().submit(self._run_batch, batch)
+
+    def caption(self, file_path: str, mime_type: str = "image/jpeg", media_service=None) -> str:
+        return self.submit(file_path, mime_type, media_service=media_service).result()
+
+    def caption_many(self, images: Sequence[Tuple[str, str]], media_service=None) -> List[str]:
+        """Captions [(file_path, mime_type)] in as few requests as possible, preserving order."""
+        futures = [self.submit(path, mime, media_service=media_service) for path, mime in images]
+        self.flush()
+        return [f.result() for f in futures]
+
+    # ── Batches ──────────────────────────────────────────────────
+
+    def _take_pending(self) -> List[_CaptionRequest]:
+        """Caller holds the lock."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _run_batch(self, batch: List[_CaptionRequest]):
+        media_service = next((r.media_service for r in batch if r.media_service), None)
+        error = None
+        try:
+            if media_service is None:
+                from .media_service import MediaService
+                media_service = MediaService()
+            captions = list(media_service.caption_images([(r.image, r.mime_type) for r in batch]))
+            captions += [None] * (len(batch) - len(captions))
+        except Exception as e:
+            error = e
+            captions = [None] * len(batch)
+
+        for request, caption in zip(batch, captions):
+            if caption is None and len(batch) > 1 and media_service is not None:
+                # Missing from the batch answer: try this image alone
+                try:
+                    caption = media_service.caption_images([(request.image, request.mime_type)])[0]
+                except Exception as e:
+                    error = e
+            if caption:
+                self._store(request.content_hash, caption)
+            else:
+                caption = f"[Image caption failed: {error or 'no caption returned'}]"
+            with self._lock:
+                self._inflight.pop(request.content_hash, None)
+            request.future.set_result(caption)
+        if len(batch) > 1:
+            print(f"🖼️ Captioned batch of {len(batch)} images")
+
+
+image_captioner = ImageCaptioner()
@@ -0,0 +1,375 @@
+"""
+ingestion_queue.py - Persistent, bounded queue for heavy ingestion work.
+
+/knowledge/upload, /brandfolder/ingest and research execution used to run in
+the web worker itself (BackgroundTasks or inline), one unbounded job per
+request, so a bulk upload of 50 files ran 50 extractions next to chat. They
+now submit a job here instead:
+
+  - jobs are rows in SQLite (next to irresistible_app.db), so a restart
+    resumes them (`recover()`),
+  - a fixed pool of settings.ingestion_workers threads runs them, highest
+    priority first (FIFO within a priority),
+  - at most settings.ingestion_max_queued jobs wait; beyond that `submit`
+    raises IngestionQueueFull (HTTP 429),
+  - handlers report progress (0..1 plus a message), exposed by routers/jobs.py,
+  - a failing job is retried with exponential backoff (first delay
+    settings.ingestion_retry_delay_seconds) up to settings.ingestion_max_attempts
+    runs; `retry()` re-queues a failed job by hand,
+  - files attached to a job (uploads, downloads) are deleted when it
+    completes. A failed job keeps them so it can be retried, until
+    settings.ingestion_failed_retention_hours have passed (`purge_expired`).
+
+Handlers are registered per job kind by the module that owns the work
+(routers/knowledge.py, routers/brandfolder.py).
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+from ..core.config import settings
+from ..core.exceptions import IngestionQueueFull
+
+logger = logging.getLogger(__name__)
+
+# Same volume as the app DB (see research_service.py / sync_service.py)
+if os.path.exists("/app/brain_data"):
+    INGESTION_DB_PATH = "/app/brain_data/ingestion_jobs.db"
+else:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    INGESTION_DB_PATH = os.path.abspath(os.path.join(current_dir, "../../..", "ingestion_jobs.db"))
+
+PRIORITY_HIGH = 10     # A user is waiting on the result (research execution)
+PRIORITY_NORMAL = 0    # Admin uploads
+PRIORITY_LOW = -10     # Bulk Brandfolder ingest
+
+ACTIVE_STATES = ("queued", "running")
+
+_JSON_FIELDS = ("payload", "result", "files")
+_FILES_EXPIRED = "Files expired; upload again to retry"
+
+
+class JobContext:
+    """Handed to a handler: the job's identity and a progress reporter."""
+
+    def __init__(self, queue: "IngestionQueue", job: dict):
+        self._queue = queue
+        self.id = job["id"]
+        self.attempt = job["attempts"]
+
+    def progress(self, fraction: float, message: str = None):
+        self._queue._progress(self.id, fraction, message)
+
+
+Handler = Callable[[dict, JobContext], Optional[dict]]
+
+
+class IngestionQueue:
+    """SQLite-backed job table + fixed worker pool."""
+
+    def __init__(self, path: str = INGESTION_DB_PATH, workers: int = None, max_queued: int = None):
+        self.path = path
+        self.workers = workers or settings.ingestion_workers
+        self.max_queued = max_queued or settings.ingestion_max_queued
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._handlers: Dict[str, Handler] = {}
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT,
+                    priority INTEGER DEFAULT 0,
+                    payload TEXT,
+                    files TEXT,                   -- JSON list of paths deleted on completion (failed: after retention)
+                    state TEXT DEFAULT 'queued',  -- queued, running, completed, failed
+                    progress REAL DEFAULT 0,
+                    message TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    max_attempts INTEGER,
+                    run_after REAL DEFAULT 0,     -- epoch seconds; retry backoff
+                    error TEXT,
+                    result TEXT,
+                    created_by TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_claim ON ingestion_jobs (state, priority DESC, created_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{k}=?" for k in fields)
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                f"UPDATE ingestion_jobs SET {columns}, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+                (*fields.values(), job_id)
+            )
+            conn.commit()
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        for field in _JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+    # ── Public API ───────────────────────────────────────────────
+
+    def register(self, kind: str, handler: Handler):
+        """Sets the function that runs jobs of `kind`: handler(payload, job) -> result dict or None."""
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Starts the worker threads (idempotent; submit() calls it)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"ingest-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        """Lets running jobs finish and stops the workers (app shutdown)."""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(
+        self,
+        kind: str,
+        payload: dict,
+        priority: int = PRIORITY_NORMAL,
+        files: Sequence[str] = (),
+        created_by: str = None,
+        max_attempts: int = None,
+    ) -> str:
+        """Queues a job and returns its id. Raises IngestionQueueFull when the queue is at its bound."""
+        if kind not in self._handlers:
+            raise ValueError(f"No ingestion handler registered for {kind!r}")
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            conn = self._db()
+            waiting = conn.execute("SELECT COUNT(*) FROM ingestion_jobs WHERE state='queued'").fetchone()[0]
+            if waiting >= self.max_queued:
+                raise IngestionQueueFull(f"Ingestion queue is full ({waiting} jobs waiting). Try again later.")
+            conn.execute(
+                "INSERT INTO ingestion_jobs (id, kind, priority, payload, files, max_attempts, created_by) "
+                "VALUES (?,?,?,?,?,?,?)",
+                (job_id, kind, priority, json.dumps(payload), json.dumps(list(files)),
+                 max_attempts or settings.ingestion_max_attempts, created_by)
+            )
+            conn.commit()
+        self.purge_expired()
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM ingestion_jobs WHERE id=?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def list_jobs(self, kind: str = None, state: str = None, created_by: str = None, limit: int = 50) -> List[dict]:
+        """Most recent jobs first, optionally filtered."""
+        clauses, params = [], []
+        for column, value in (("kind", kind), ("state", state), ("created_by", created_by)):
+            if value:
+                clauses.append(f"{column}=?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT * FROM ingestion_jobs {where} ORDER BY created_at DESC, rowid DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def wait(self, job_id: str, timeout: float = None) -> Optional[dict]:
+        """Blocks until the job is no longer active (or `timeout`); returns its status."""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            job = self.status(job_id)
+            if job is None or job["state"] not in ACTIVE_STATES:
+                return job
+            if deadline and time.monotonic() > deadline:
+                return job
+            time.sleep(0.05)
+
+    def retry(self, job_id: str) -> bool:
+        """
+        Re-queues a failed job with a fresh attempt budget. False if it is not
+        failed or its files are gone (expired or removed).
+        """
+        job = self.status(job_id)
+        if job is None or job["state"] != "failed":
+            return False
+        if any(not os.path.exists(path) for path in job["files"] or []):
+            return False
+        with self._lock:
+            conn = self._db()
+            cur = conn.execute(
+                "UPDATE ingestion_jobs SET state='queued', attempts=0, run_after=0, progress=0, error=NULL, "
+                "updated_at=CURRENT_TIMESTAMP WHERE id=? AND state='failed'",
+                (job_id,)
+            )
+            conn.commit()
+        if not cur.rowcount:
+            return False
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return True
+
+    def recover(self) -> int:
+        """
+        Re-queues jobs a restart interrupted (a job that was running keeps its
+        attempt count) and starts the workers. Jobs whose files are gone fail.
+        """
+        with self._lock:
+            rows = self._db().execute("SELECT * FROM ingestion_jobs WHERE state IN ('queued', 'running')").fetchall()
+        jobs = [self._to_job(row) for row in rows]
+        resumed = 0
+        for job in jobs:
+            missing = [path for path in job["files"] or [] if not os.path.exists(path)]
+            if missing:
+                self._finish(job, "failed", error=f"Interrupted by restart; {os.path.basename(missing[0])} no longer available")
+            else:
+                if job["state"] == "running":
+                    self._update(job["id"], state="queued")
+                resumed += 1
+        if jobs:
+            logger.info(f"Ingestion queue recovered {resumed}/{len(jobs)} interrupted jobs")
+        self.purge_expired()
+        if resumed:
+            self.start()
+        return resumed
+
+    def purge_expired(self) -> int:
+        """Deletes the files of jobs failed longer than settings.ingestion_failed_retention_hours ago."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT * FROM ingestion_jobs WHERE state='failed' AND files IS NOT NULL AND files != '[]' "
+                "AND message IS NOT ? AND updated_at < datetime('now', ?)",
+                (_FILES_EXPIRED, f"{-settings.ingestion_failed_retention_hours} hours")
+            ).fetchall()
+        for row in rows:
+            job = self._to_job(row)
+            self._remove_files(job)
+            # The paths stay recorded, so retry() sees them missing
+            self._update(job["id"], message=_FILES_EXPIRED)
+        return len(rows)
+
+    # ── Workers ──────────────────────────────────────────────────
+
+    def _progress(self, job_id: str, fraction: float, message: str = None):
+        fields = {"progress": max(0.0, min(1.0, fraction))}
+        if message is not None:
+            fields["message"] = message
+        self._update(job_id, **fields)
+
+    def _claim(self) -> Optional[dict]:
+        """Marks the next runnable job as running and returns it."""
+        with self._lock:
+            conn = self._db()
+            row = conn.execute(
+                "SELECT * FROM ingestion_jobs WHERE state='queued' AND run_after <= ? "
+                "ORDER BY priority DESC, created_at, rowid LIMIT 1",
+                (time.time(),)
+            ).fetchone()
+            if row is None:
+                return None
+            # Conditional update: another process sharing the DB may have claimed it
+            cur = conn.execute(
+                "UPDATE ingestion_jobs SET state='running', attempts=attempts+1, updated_at=CURRENT_TIMESTAMP "
+                "WHERE id=? AND state='queued'",
+                (row["id"],)
+            )
+            conn.commit()
+            if not cur.rowcount:
+                return None
+            job = self._to_job(row)
+        job["attempts"] += 1
+        return job
+
+    def _seconds_until_next(self) -> Optional[float]:
+        """Delay before the earliest backed-off job becomes runnable (None if nothing is waiting)."""
+        with self._lock:
+            row = self._db().execute("SELECT MIN(run_after) FROM ingestion_jobs WHERE state='queued'").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.05, row[0] - time.time())
+
+    def _worker(self):
+        while not self._stopping:
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Ingestion queue could not claim a job: {e}")
+                job = None
+                time.sleep(1)
+            if job is None:
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(timeout=self._seconds_until_next())
+                continue
+            self._run(job)
+
+    def _run(self, job: dict):
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            self._finish(job, "failed", error=f"No handler registered for {job['kind']!r}")
+            return
+        try:
+            result = handler(job["payload"] or {}, JobContext(self, job))
+        except Exception as e:
+            if job["attempts"] < (job["max_attempts"] or 1):
+                delay = settings.ingestion_retry_delay_seconds * 2 ** (job["attempts"] - 1)
+                print(f"⚠️ Ingestion job {job['kind']} {job['id']} failed (attempt {job['attempts']}), retrying in {delay:.0f}s: {e}")
+                self._update(job["id"], state="queued", run_after=time.time() + delay, error=str(e))
+            else:
+                print(f"❌ Ingestion job {job['kind']} {job['id']} failed: {e}")
+                self._finish(job, "failed", error=str(e))
+            return
+        self._finish(job, "completed", progress=1.0, result=json.dumps(result) if result is not None else None)
+
+    def _finish(self, job: dict, state: str, **fields):
+        self._update(job["id"], state=state, **fields)
+        # Failed jobs keep their files for retry() until purge_expired()
+        if state == "completed":
+            self._remove_files(job)
+
+    @staticmethod
+    def _remove_files(job: dict):
+        for path in job["files"] or []:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove {path} after job {job['id']}: {e}")
+
+
+ingestion_queue = IngestionQueue()
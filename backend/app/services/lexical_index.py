@@ -0,0 +1,170 @@
+"""
+lexical_index.py - BM25 inverted index over chunk text (SQLite FTS5).
+
+Dense embeddings recall exact names poorly ("Waumba Land", "GroupLink",
+scripture references). This index mirrors `document_chunks` text in an FTS5
+table ranked with BM25, so VectorStoreService can fuse lexical and vector
+rankings (see `search_similar(mode="hybrid")`).
+
+Kept on disk next to irresistible_app.db and updated by store_document and
+the knowledge delete endpoint; `rebuild_from_supabase` backfills it (at
+startup, or with build_local_index.py). Until a backfill has completed the
+index only covers documents stored since it existed, so `is_backfilled()`
+gates hybrid search.
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Same volume as the app DB (see research_service.py / sync_service.py)
+if os.path.exists("/app/brain_data"):
+    LEXICAL_DB_PATH = "/app/brain_data/lexical_index.db"
+else:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    LEXICAL_DB_PATH = os.path.abspath(os.path.join(current_dir, "../../..", "lexical_index.db"))
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(query: str, max_terms: int = 32) -> str:
+    """
+    Turns free text into an FTS5 MATCH expression: every term quoted (so
+    punctuation and FTS operators in user input are inert) and OR-ed, with
+    the full phrase added so exact series/program names rank highest.
+    """
+    terms = list(dict.fromkeys(t.lower() for t in _TERM.findall(query or "")))[:max_terms]
+    if not terms:
+        return ""
+    parts = [f'"{t}"' for t in terms]
+    if len(terms) > 1:
+        parts.insert(0, '"' + " ".join(terms) + '"')
+    return " OR ".join(parts)
+
+
+class LexicalIndex:
+    """FTS5 table of chunk text with BM25 ranking."""
+
+    def __init__(self, path: str = LEXICAL_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._backfilled = False  # sticky once seen, so is_backfilled() stops querying
+        self._rebuilding = False
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # remove_diacritics: "ninos" matches "niños", "oracion" matches "oración"
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(
+                    content,
+                    document_id UNINDEXED,
+                    chunk_index UNINDEXED,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            ''')
+            conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def add_document(self, document_id: str, chunks: Sequence[Tuple[int, str]]):
+        """Indexes (chunk_index, content) pairs for a document, replacing any previous rows."""
+        with self._lock:
+            conn = self._db()
+            conn.execute("DELETE FROM chunk_fts WHERE document_id=?", (document_id,))
+            conn.executemany(
+                "INSERT INTO chunk_fts (content, document_id, chunk_index) VALUES (?,?,?)",
+                [(content, document_id, idx) for idx, content in chunks]
+            )
+            conn.commit()
+
+    def delete_document(self, document_id: str):
+        with self._lock:
+            conn = self._db()
+            conn.execute("DELETE FROM chunk_fts WHERE document_id=?", (document_id,))
+            conn.commit()
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Returns [{"document_id", "chunk_index", "content", "score"}], best first."""
+        expr = build_match_query(query)
+        if not expr:
+            return []
+        with self._lock:
+            try:
+                rows = self._db().execute(
+                    "SELECT document_id, chunk_index, content, bm25(chunk_fts) AS rank "
+                    "FROM chunk_fts WHERE chunk_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (expr, limit)
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Lexical search failed for {query!r}: {e}")
+                return []
+        # FTS5 bm25() is negative (lower = better); flip it so higher = better
+        return [
+            {"document_id": r[0], "chunk_index": r[1], "content": r[2], "score": -r[3]}
+            for r in rows
+        ]
+
+    def is_backfilled(self) -> bool:
+        """
+        True once rebuild_from_supabase has completed, i.e. the index covers
+        documents stored before it existed. False while a rebuild runs (it
+        holds the lock), so callers fall back instead of waiting on it.
+        """
+        if self._rebuilding:
+            return False
+        if not self._backfilled:
+            with self._lock:
+                row = self._db().execute("SELECT value FROM index_meta WHERE key='backfilled'").fetchone()
+                self._backfilled = row is not None
+        return self._backfilled
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM chunk_fts").fetchone()[0]
+
+    def rebuild_from_supabase(self, client, page_size: int = 1000) -> int:
+        """Re-indexes every chunk in Supabase document_chunks and marks the index backfilled."""
+        self._rebuilding = True
+        try:
+            return self._rebuild(client, page_size)
+        finally:
+            self._rebuilding = False
+
+    def _rebuild(self, client, page_size: int) -> int:
+        with self._lock:
+            conn = self._db()
+            conn.execute("DELETE FROM chunk_fts")
+            total = 0
+            start = 0
+            while True:
+                rows = client.table("document_chunks").select("document_id, chunk_index, content") \
+                    .order("id").range(start, start + page_size - 1).execute().data or []
+                conn.executemany(
+                    "INSERT INTO chunk_fts (content, document_id, chunk_index) VALUES (?,?,?)",
+                    [(r["content"], r["document_id"], r["chunk_index"]) for r in rows]
+                )
+                conn.commit()
+                total += len(rows)
+                if len(rows) < page_size:
+                    break
+                start += page_size
+            conn.execute("INSERT INTO chunk_fts (chunk_fts) VALUES ('optimize')")
+            conn.execute(
+                "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('backfilled', datetime('now'))"
+            )
+            conn.commit()
+            self._backfilled = True
+            logger.info(f"Lexical index rebuilt with {total} chunks")
+            return total
+
+
+lexical_index = LexicalIndex()
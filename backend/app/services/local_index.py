@@ -0,0 +1,380 @@
+"""
+local_index.py - Local approximate-nearest-neighbour index for RAG retrieval.
+
+An offline alternative to the Supabase `match_documents` RPC, selected with
+`VECTOR_BACKEND=local`. Vectors live in a memory-mapped float32 matrix on
+disk (one L2-normalized row per chunk) with chunk text and bookkeeping in a
+small SQLite file beside it:
+
+  - Below `local_index_min_train_size` live rows, search is an exact
+    brute-force scan (already sub-millisecond at that size).
+  - Above it, `train()` builds an IVF index (spherical k-means centroids);
+    a query only scans the `local_index_nprobe` closest inverted lists.
+  - `add_document` appends rows incrementally (assigned to the nearest
+    centroid); `delete_document` tombstones rows. `rebuild_from_supabase`
+    rebuilds from `document_chunks` and drops tombstones.
+"""
+
+import os
+import json
+import math
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Same volume as the app DB (see research_service.py / sync_service.py)
+if os.path.exists("/app/brain_data"):
+    LOCAL_INDEX_DIR = "/app/brain_data/local_index"
+else:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    LOCAL_INDEX_DIR = os.path.abspath(os.path.join(current_dir, "../../..", "local_index"))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def parse_embedding(value) -> List[float]:
+    """PostgREST returns pgvector columns as a '[0.1,0.2,...]' string."""
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value or [])
+
+
+class LocalVectorIndex:
+    """Memory-mapped float32 matrix + IVF lists + SQLite metadata."""
+
+    def __init__(self, path: str = LOCAL_INDEX_DIR):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._loaded = False
+        self.dim = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._deleted = np.zeros(0, dtype=bool)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Dict[int, np.ndarray] = {}
+
+    # ── Storage ──────────────────────────────────────────────────
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _centroids_path(self) -> str:
+        return os.path.join(self.path, "centroids.npy")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.path, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.path, "meta.db"), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    source TEXT UNIQUE,
+                    title TEXT
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rows (
+                    row INTEGER PRIMARY KEY,
+                    document_id TEXT,
+                    chunk_index INTEGER,
+                    content TEXT,
+                    list_id INTEGER DEFAULT -1,
+                    deleted INTEGER DEFAULT 0
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rows_document ON rows (document_id)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _load(self):
+        """Loads dim, tombstones, centroids and inverted lists into memory (once)."""
+        if self._loaded:
+            return
+        conn = self._db()
+        row = conn.execute("SELECT value FROM index_meta WHERE key='dim'").fetchone()
+        self.dim = int(row[0]) if row else 0
+
+        rows = conn.execute("SELECT row, list_id, deleted FROM rows ORDER BY row").fetchall()
+        self._deleted = np.array([bool(r[2]) for r in rows], dtype=bool)
+        self._truncate_vectors(len(rows))
+        self._centroids = np.load(self._centroids_path) if os.path.exists(self._centroids_path) else None
+        self._lists = {}
+        if self._centroids is not None and rows:
+            ids = np.array([r[0] for r in rows], dtype=np.int64)
+            lists = np.array([r[1] for r in rows], dtype=np.int64)
+            for list_id in np.unique(lists):
+                self._lists[int(list_id)] = ids[lists == list_id]
+        self._matrix = None
+        self._loaded = True
+
+    def _truncate_vectors(self, row_count: int):
+        """
+        Drops vectors past the last committed row: add_document appends to the
+        file before its rows commit, so a crash in between leaves extra vectors.
+        """
+        expected = row_count * self.dim * 4
+        if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > expected:
+            logger.warning(f"Local index: dropping vectors of uncommitted rows (keeping {row_count})")
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(expected)
+
+    def _vectors(self) -> np.ndarray:
+        """Read-only memmap over the vector file, reopened after appends."""
+        if self._matrix is None:
+            n = len(self._deleted)
+            if n == 0 or not self.dim:
+                return np.zeros((0, self.dim or 1), dtype=np.float32)
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self._matrix
+
+    def count(self) -> int:
+        with self._lock:
+            self._load()
+            return int((~self._deleted).sum())
+
+    # ── Writes ───────────────────────────────────────────────────
+
+    def get_document_id(self, source: str) -> Optional[str]:
+        with self._lock:
+            row = self._db().execute("SELECT id FROM documents WHERE source=?", (source,)).fetchone()
+            return row[0] if row else None
+
+    def add_document(
+        self,
+        document_id: str,
+        source: str,
+        title: str,
+        chunks: Sequence[Tuple[int, str, Sequence[float]]],
+    ) -> int:
+        """Appends (chunk_index, content, embedding) rows for a document. Returns rows added."""
+        chunks = [c for c in chunks if len(c[2])]
+        with self._lock:
+            self._load()
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (id, source, title) VALUES (?,?,?)",
+                (document_id, source, title)
+            )
+            if not chunks:
+                conn.commit()
+                return 0
+
+            vectors = _normalize(np.asarray([c[2] for c in chunks], dtype=np.float32))
+            previous_dim = self.dim
+            if not self.dim:
+                self.dim = vectors.shape[1]
+                conn.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} does not match index dim {self.dim}")
+
+            if self._centroids is not None:
+                list_ids = np.argmax(vectors @ self._centroids.T, axis=1)
+            else:
+                list_ids = np.full(len(chunks), -1)
+
+            start = len(self._deleted)
+            try:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                conn.executemany(
+                    "INSERT INTO rows (row, document_id, chunk_index, content, list_id) VALUES (?,?,?,?,?)",
+                    [
+                        (start + i, document_id, c[0], c[1], int(list_ids[i]))
+                        for i, c in enumerate(chunks)
+                    ]
+                )
+                conn.commit()
+            except Exception:
+                # Keep row ids aligned with the file (a crash here is repaired by _load)
+                conn.rollback()
+                self._truncate_vectors(start)
+                self.dim = previous_dim
+                raise
+
+            new_ids = np.arange(start, start + len(chunks), dtype=np.int64)
+            for list_id in np.unique(list_ids):
+                members = new_ids[list_ids == list_id]
+                existing = self._lists.get(int(list_id))
+                self._lists[int(list_id)] = members if existing is None else np.concatenate([existing, members])
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(chunks), dtype=bool)])
+            self._matrix = None
+            return len(chunks)
+
+    def get_chunks(self, source: str) -> List[Tuple[str, List[float]]]:
+        """(content, embedding) for a stored document, in chunk order (embeddings are unit-normalized)."""
+        with self._lock:
+            self._load()
+            document_id = self.get_document_id(source)
+            if not document_id:
+                return []
+            rows = self._db().execute(
+                "SELECT row, content FROM rows WHERE document_id=? AND deleted=0 ORDER BY chunk_index",
+                (document_id,)
+            ).fetchall()
+            vectors = self._vectors()
+            return [(content, vectors[row].tolist()) for row, content in rows]
+
+    def delete_document(self, document_id: str) -> int:
+        """Tombstones every row of a document. Returns rows removed."""
+        with self._lock:
+            self._load()
+            conn = self._db()
+            rows = [r[0] for r in conn.execute(
+                "SELECT row FROM rows WHERE document_id=? AND deleted=0", (document_id,)
+            ).fetchall()]
+            conn.execute("UPDATE rows SET deleted=1 WHERE document_id=?", (document_id,))
+            conn.execute("DELETE FROM documents WHERE id=?", (document_id,))
+            conn.commit()
+            if rows:
+                self._deleted[np.asarray(rows, dtype=np.int64)] = True
+            return len(rows)
+
+    # ── IVF training ─────────────────────────────────────────────
+
+    def train(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: int = 50_000):
+        """(Re)builds IVF centroids with spherical k-means and reassigns every row."""
+        with self._lock:
+            self._load()
+            matrix = self._vectors()
+            live = np.flatnonzero(~self._deleted)
+            if len(live) < settings.local_index_min_train_size:
+                logger.info(f"Local index has {len(live)} rows; staying in exact (brute-force) mode")
+                return
+
+            nlist = nlist or max(1, int(math.sqrt(len(live))))
+            rng = np.random.default_rng(0)
+            sample = matrix[rng.choice(live, size=min(sample_size, len(live)), replace=False)]
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                for k in range(nlist):
+                    members = sample[assign == k]
+                    if len(members):
+                        centroids[k] = members.sum(axis=0)
+                centroids = _normalize(centroids)
+
+            all_ids = np.arange(len(self._deleted), dtype=np.int64)
+            list_ids = np.empty(len(all_ids), dtype=np.int64)
+            for i in range(0, len(all_ids), 8192):
+                list_ids[i:i + 8192] = np.argmax(matrix[i:i + 8192] @ centroids.T, axis=1)
+
+            conn = self._db()
+            conn.executemany(
+                "UPDATE rows SET list_id=? WHERE row=?",
+                [(int(l), int(r)) for r, l in zip(all_ids, list_ids)]
+            )
+            conn.commit()
+            np.save(self._centroids_path, centroids.astype(np.float32))
+
+            self._centroids = centroids.astype(np.float32)
+            self._lists = {int(k): all_ids[list_ids == k] for k in np.unique(list_ids)}
+            logger.info(f"Local index trained: {nlist} lists over {len(live)} rows")
+
+    # ── Search ───────────────────────────────────────────────────
+
+    def search(self, query_vector: Sequence[float], limit: int = 5, threshold: float = 0.0) -> List[Dict]:
+        """
+        Returns rows shaped like match_documents output:
+        [{"document_id", "content", "similarity"}], best first.
+        """
+        with self._lock:
+            self._load()
+            matrix = self._vectors()
+            if not len(matrix):
+                return []
+            q = _normalize(np.asarray(query_vector, dtype=np.float32))
+
+            if self._centroids is not None:
+                nprobe = min(settings.local_index_nprobe, len(self._centroids))
+                probes = np.argsort(-(self._centroids @ q))[:nprobe]
+                parts = [self._lists[int(p)] for p in probes if int(p) in self._lists]
+                candidates = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+                candidates = candidates[~self._deleted[candidates]]
+                scores = matrix[candidates] @ q if len(candidates) else np.zeros(0, dtype=np.float32)
+            else:
+                candidates = np.flatnonzero(~self._deleted)
+                scores = matrix[candidates] @ q
+
+            keep = scores >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+            if not len(candidates):
+                return []
+            if len(candidates) > limit:
+                top = np.argpartition(-scores, limit)[:limit]
+                candidates, scores = candidates[top], scores[top]
+            order = np.argsort(-scores)
+            candidates, scores = candidates[order], scores[order]
+
+            placeholders = ",".join("?" * len(candidates))
+            rows = {
+                r[0]: r for r in self._db().execute(
+                    f"SELECT row, document_id, content FROM rows WHERE row IN ({placeholders})",
+                    [int(c) for c in candidates]
+                ).fetchall()
+            }
+            return [
+                {"document_id": rows[int(c)][1], "content": rows[int(c)][2], "similarity": float(s)}
+                for c, s in zip(candidates, scores) if int(c) in rows
+            ]
+
+    # ── Rebuild ──────────────────────────────────────────────────
+
+    def reset(self):
+        """Deletes all index files."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            for name in ("vectors.f32", "centroids.npy", "meta.db", "meta.db-wal", "meta.db-shm"):
+                p = os.path.join(self.path, name)
+                if os.path.exists(p):
+                    os.remove(p)
+            self._loaded = False
+            self.dim = 0
+            self._matrix = None
+            self._deleted = np.zeros(0, dtype=bool)
+            self._centroids = None
+            self._lists = {}
+
+    def rebuild_from_supabase(self, client, page_size: int = 500) -> int:
+        """Rebuilds the index from Supabase documents/document_chunks, then trains IVF."""
+        with self._lock:
+            self.reset()
+            total = 0
+            start = 0
+            while True:
+                docs = client.table("documents").select("id, source, title") \
+                    .order("id").range(start, start + page_size - 1).execute().data or []
+                for doc in docs:
+                    chunks = client.table("document_chunks") \
+                        .select("chunk_index, content, embedding") \
+                        .eq("document_id", doc["id"]).order("chunk_index").execute().data or []
+                    total += self.add_document(
+                        doc["id"], doc["source"], doc.get("title") or "Untitled",
+                        [(c["chunk_index"], c["content"], parse_embedding(c["embedding"])) for c in chunks]
+                    )
+                if len(docs) < page_size:
+                    break
+                start += page_size
+            logger.info(f"Local index rebuilt with {total} chunks")
+            self.train()
+            return total
+
+
+local_index = LocalVectorIndex()
@@ -9,10 +9,10 @@ Auth: Bearer token via PLANNING_CENTER_API_TOKEN env var
 """
 
 import logging
-import requests
 from typing import Any, Dict, List, Optional
 
 from ...core.config import settings
+from ..http_client import HTTPError, get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -54,12 +54,12 @@ class PlanningCenterMcpServer:
             return None
         url = f"{BASE_URL}{path}"
         try:
-            response = requests.get(url, headers=self._headers(), params=params, timeout=15)
+            response = get_http_client().get(url, upstream="planning_center", headers=self._headers(), params=params, timeout=15)
             if response.status_code == 200:
                 return response.json()
             logger.warning(f"Planning Center API {response.status_code}: {path}")
             return None
-        except requests.RequestException as e:
+        except HTTPError as e:
             logger.error(f"Planning Center API error: {e}")
             return None
 
@@ -73,7 +73,7 @@ class PlanningCenterMcpServer:
 
         while url and page < max_pages:
             try:
-                response = requests.get(url, headers=self._headers(), params=params, timeout=15)
+                response = get_http_client().get(url, upstream="planning_center", headers=self._headers(), params=params, timeout=15)
                 if response.status_code != 200:
                     break
                 data = response.json()
@@ -81,7 +81,7 @@ class PlanningCenterMcpServer:
                 url = data.get("links", {}).get("next")
                 params = None  # params only for first request
                 page += 1
-            except requests.RequestException as e:
+            except HTTPError as e:
                 logger.error(f"Planning Center pagination error: {e}")
                 break
 
@@ -0,0 +1,203 @@
+"""
+media_preprocess.py - Audio extraction and time windows for long media.
+
+Gemini only needs the audio to transcribe a sermon, so before upload:
+
+  - video is reduced to a mono 16 kHz MP3 track (a 90-minute 1080p service
+    drops from gigabytes to ~20 MB),
+  - recordings longer than settings.transcription_window_seconds are cut into
+    windows that overlap by settings.transcription_window_overlap_seconds,
+    transcribed in parallel with [HH:MM:SS] timestamps,
+  - `stitch_windows` shifts each window's timestamps to absolute time and
+    cuts the overlaps at their midpoint, so no line appears twice.
+
+Everything here shells out to ffmpeg/ffprobe. When they are not installed
+`prepare_segments` returns the original file untouched and transcription
+falls back to the single-request path.
+
+`media_fingerprint` identifies identical media across assets (same sermon
+uploaded as several Brandfolder assets) so it is transcribed only once.
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from ..core.config import settings
+
+_TIMESTAMP = re.compile(r"^\s*\[(?:(\d{1,2}):)?(\d{1,2}):(\d{2})\]\s*")
+
+
+@dataclass
+class Segment:
+    """A file to transcribe and the span of the original recording it covers."""
+    path: str
+    mime_type: str
+    start: float = 0.0
+    end: Optional[float] = None
+    temporary: bool = False
+
+
+def media_fingerprint(path: str, sample_bytes: int = None) -> str:
+    """
+    SHA-256 over the file size plus its first and last `sample_bytes`
+    (settings.media_fingerprint_sample_bytes; whole file when smaller), so a
+    multi-GB video is identified without reading all of it.
+    """
+    sample_bytes = sample_bytes or settings.media_fingerprint_sample_bytes
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= 2 * sample_bytes:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        else:
+            digest.update(f.read(sample_bytes))
+            f.seek(size - sample_bytes)
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+def ffmpeg_available() -> bool:
+    return bool(shutil.which("ffmpeg") and shutil.which("ffprobe"))
+
+
+def _run(args: List[str]) -> str:
+    result = subprocess.run(args, capture_output=True, text=True, timeout=settings.transcription_ffmpeg_timeout_seconds)
+    if result.returncode != 0:
+        raise RuntimeError(f"{args[0]} failed: {result.stderr.strip()[-300:]}")
+    return result.stdout
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Duration in seconds via ffprobe (None if unknown)."""
+    try:
+        out = _run(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", path])
+        return float(json.loads(out)["format"]["duration"])
+    except (RuntimeError, KeyError, ValueError, TypeError):
+        return None
+
+
+def extract_audio(path: str, start: float = 0.0, length: Optional[float] = None) -> str:
+    """Writes a compressed mono speech track (optionally a slice) to a temp .mp3 and returns its path."""
+    fd, out_path = tempfile.mkstemp(suffix=".mp3")
+    os.close(fd)
+    args = ["ffmpeg", "-y", "-v", "error"]
+    if start:
+        args += ["-ss", f"{start:.3f}"]
+    args += ["-i", path]
+    if length:
+        args += ["-t", f"{length:.3f}"]
+    args += ["-vn", "-ac", "1", "-ar", "16000", "-b:a", settings.transcription_audio_bitrate, out_path]
+    try:
+        _run(args)
+    except Exception:
+        os.remove(out_path)
+        raise
+    return out_path
+
+
+def plan_windows(duration: float, window: float, overlap: float) -> List[Tuple[float, float]]:
+    """[(start, end)] covering `duration` with windows of `window` seconds overlapping by `overlap`."""
+    if duration <= window:
+        return [(0.0, duration)]
+    step = max(window - overlap, 1.0)
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window, duration)
+        windows.append((start, end))
+        if end >= duration:
+            return windows
+        start += step
+
+
+def prepare_segments(path: str, mime_type: str) -> List[Segment]:
+    """
+    Audio-only segments to transcribe for `path`: one for short media, several
+    overlapping windows for long recordings, or the original file when ffmpeg
+    is unavailable / fails.
+    """
+    if not ffmpeg_available():
+        return [Segment(path, mime_type)]
+
+    try:
+        duration = probe_duration(path)
+        window = settings.transcription_window_seconds
+        if not duration or duration <= window:
+            return [Segment(extract_audio(path), "audio/mp3", 0.0, duration, temporary=True)]
+
+        segments = []
+        try:
+            for start, end in plan_windows(duration, window, settings.transcription_window_overlap_seconds):
+                segments.append(Segment(extract_audio(path, start, end - start), "audio/mp3", start, end, temporary=True))
+        except Exception:
+            cleanup_segments(segments)
+            raise
+        return segments
+    except Exception as e:
+        print(f"⚠️ Audio preprocessing failed, sending original file: {e}")
+        return [Segment(path, mime_type)]
+
+
+def cleanup_segments(segments: Sequence[Segment]):
+    for segment in segments:
+        if segment.temporary and os.path.exists(segment.path):
+            os.remove(segment.path)
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _parse_lines(text: str) -> List[Tuple[Optional[float], str]]:
+    """[(relative_seconds or None, text)] for each non-empty line of a window transcript."""
+    lines = []
+    for raw in text.splitlines():
+        if not raw.strip():
+            continue
+        match = _TIMESTAMP.match(raw)
+        if match:
+            hours, minutes, seconds = match.groups()
+            lines.append((int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds), raw[match.end():].strip()))
+        else:
+            lines.append((None, raw.strip()))
+    return lines
+
+
+def stitch_windows(windows: Sequence[Tuple[Segment, Optional[str]]]) -> str:
+    """
+    Joins window transcripts ([(segment, text or None)]) into one timestamped
+    transcript. Overlaps are split at their midpoint; a window that failed
+    leaves a gap marker instead of losing the whole recording.
+    """
+    out = []
+    for i, (segment, text) in enumerate(windows):
+        # Each window owns [keep_from, keep_until) of the recording
+        keep_from = segment.start
+        if i > 0:
+            keep_from = (segment.start + windows[i - 1][0].end) / 2
+        keep_until = None
+        if i + 1 < len(windows):
+            keep_until = (windows[i + 1][0].start + segment.end) / 2
+
+        if text is None:
+            end = keep_until if keep_until is not None else segment.end
+            out.append(f"[{format_timestamp(keep_from)}–{format_timestamp(end or keep_from)}] [Sin transcripción para este tramo]")
+            continue
+
+        current = segment.start
+        for offset, line in _parse_lines(text):
+            if offset is not None:
+                current = segment.start + offset
+            if current < keep_from or (keep_until is not None and current >= keep_until):
+                continue
+            out.append(f"[{format_timestamp(current)}] {line}" if offset is not None else line)
+    return "\n".join(out)
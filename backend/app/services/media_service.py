@@ -1,10 +1,36 @@
 
 import os
+import json
+from typing import List, Optional, Tuple
 from google import genai
 from google.genai import types
 from fastapi import HTTPException
 import time
 
+from ..core.config import settings
+from ..core.exceptions import (
+    MediaProcessingFailed,
+    MediaProcessingTimeout,
+    MediaUploadError,
+    TranscriptGenerationError,
+)
+
+CAPTION_PROMPT = (
+    "Eres un catalogador de un banco de recursos visuales de una iglesia. "
+    "Describe esta imagen de forma rica y buscable en español:\n"
+    "1. Qué muestra (personas, objetos, escena, ambiente).\n"
+    "2. Cualquier TEXTO visible — transcríbelo literalmente.\n"
+    "3. Estilo visual, tono y colores dominantes.\n"
+    "4. Para qué uso ministerial serviría (serie de prédica, redes, evento, etc.).\n"
+    "Sé concreto y conciso; esta descripción se usará para búsquedas."
+)
+
+BATCH_CAPTION_INSTRUCTIONS = (
+    "Recibirás {count} imágenes numeradas. Describe CADA una por separado con las pautas anteriores. "
+    'Responde solo con un arreglo JSON: [{{"index": 1, "caption": "..."}}, ...], un elemento por imagen.'
+)
+
+
 class MediaService:
     def __init__(self):
         self.api_key = os.environ.get("GOOGLE_API_KEY")
@@ -19,126 +45,144 @@ class MediaService:
         Describe an image with Gemini Vision so graphics become searchable by
         their visual content (not just their filename). Returns a rich Spanish
         caption: what it shows, any visible text, style, colors, and likely use.
+        Concurrent calls are batched, downsized and cached (see image_captioner.py).
         """
         if not self.client:
             raise ValueError("GOOGLE_API_KEY not configured.")
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
+        from .image_captioner import image_captioner
         try:
-            with open(file_path, "rb") as f:
-                data = f.read()
-
-            prompt = (
-                "Eres un catalogador de un banco de recursos visuales de una iglesia. "
-                "Describe esta imagen de forma rica y buscable en español:\n"
-                "1. Qué muestra (personas, objetos, escena, ambiente).\n"
-                "2. Cualquier TEXTO visible — transcríbelo literalmente.\n"
-                "3. Estilo visual, tono y colores dominantes.\n"
-                "4. Para qué uso ministerial serviría (serie de prédica, redes, evento, etc.).\n"
-                "Sé concreto y conciso; esta descripción se usará para búsquedas."
-            )
-
-            models_to_try = ["gemini-2.5-flash", "gemini-2.5-pro"]
-            last_error = None
-            for model_name in models_to_try:
-                try:
-                    response = self.client.models.generate_content(
-                        model=model_name,
-                        contents=[prompt, types.Part.from_bytes(data=data, mime_type=mime_type)],
-                    )
-                    if response and response.text:
-                        return response.text
-                except Exception as e:
-                    last_error = e
-                    continue
-
-            return f"[Image caption failed: {last_error}]"
+            return image_captioner.caption(file_path, mime_type, media_service=self)
         except Exception as e:
             print(f"❌ Image description error: {str(e)}")
             return f"Error describing image: {str(e)}"
 
+    def caption_images(self, images: List[Tuple[bytes, str]]) -> List[Optional[str]]:
+        """
+        Captions [(image_bytes, mime_type)] in one request (model fallback).
+        Returns one caption per image, None where the model gave none.
+        """
+        if len(images) == 1:
+            contents = [CAPTION_PROMPT, types.Part.from_bytes(data=images[0][0], mime_type=images[0][1])]
+            config = None
+        else:
+            contents = [CAPTION_PROMPT + "\n\n" + BATCH_CAPTION_INSTRUCTIONS.format(count=len(images))]
+            for i, (data, mime_type) in enumerate(images, start=1):
+                contents += [f"Imagen {i}:", types.Part.from_bytes(data=data, mime_type=mime_type)]
+            config = types.GenerateContentConfig(response_mime_type="application/json")
+
+        models_to_try = ["gemini-2.5-flash", "gemini-2.5-pro"]
+        last_error = None
+        for model_name in models_to_try:
+            try:
+                response = self.client.models.generate_content(model=model_name, contents=contents, config=config)
+                if not (response and response.text):
+                    continue
+                if len(images) == 1:
+                    return [response.text]
+                captions = [None] * len(images)
+                for entry in json.loads(response.text):
+                    index = int(entry.get("index", 0)) - 1
+                    if 0 <= index < len(images) and entry.get("caption"):
+                        captions[index] = entry["caption"]
+                return captions
+            except Exception as e:
+                last_error = e
+                continue
+
+        raise RuntimeError(f"All Gemini models failed. Last error: {last_error}")
+
     def transcribe_media(self, file_path: str, mime_type: str) -> str:
         """
-        Uploads an audio/video file to Gemini and retrieves the transcription.
+        Transcribes an audio/video file through the durable transcription
+        queue (shared worker pool, cached by content hash).
+        Raises a TranscriptionError subclass on failure.
         """
         if not self.client:
              raise ValueError("GOOGLE_API_KEY not configured.")
 
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
-            
+
+        from .transcription_queue import transcription_queue
+        return transcription_queue.transcribe(file_path, mime_type, media_service=self)
+
+    # ── Transcription steps (run by transcription_queue workers) ──
+
+    def upload_media(self, file_path: str, mime_type: str):
+        """Uploads a file to Gemini. Raises MediaUploadError."""
         try:
             print(f"📤 Uploading media to Gemini: {file_path} ({mime_type})")
-            
-            # Upload file using new SDK
-            # The new SDK handles upload and processing wait more gracefully in some versions,
-            # but we'll stick to the standard upload pattern.
-            media_file = self.client.files.upload(file=file_path)
-            
-            # Wait for processing state
-            attempts = 0
-            MAX_ATTEMPTS = 60 # 2 minutes max (2s sleep * 60)
-            
-            while media_file.state.name == "PROCESSING":
-                print(f"⏳ Processing media file... ({attempts}/{MAX_ATTEMPTS})", end="\r")
-                time.sleep(2)
-                media_file = self.client.files.get(name=media_file.name)
-                attempts += 1
-                
-                if attempts > MAX_ATTEMPTS:
-                    raise TimeoutError("Media processing timed out in Gemini (Server Side).")
+            return self.client.files.upload(file=file_path)
+        except Exception as e:
+            raise MediaUploadError(f"Upload failed: {e}") from e
+
+    def wait_until_active(self, media_file, timeout_seconds: float = None):
+        """
+        Polls until Gemini has processed the upload (2 s, backing off to 15 s).
+        Raises MediaProcessingTimeout / MediaProcessingFailed.
+        """
+        timeout_seconds = timeout_seconds or settings.transcription_processing_timeout_seconds
+        deadline = time.monotonic() + timeout_seconds
+        delay = 2.0
+        while media_file.state.name == "PROCESSING":
+            if time.monotonic() > deadline:
+                raise MediaProcessingTimeout(
+                    f"Media processing timed out in Gemini after {int(timeout_seconds)}s (Server Side)."
+                )
+            time.sleep(delay)
+            delay = min(delay * 1.5, 15.0)
+            media_file = self.client.files.get(name=media_file.name)
+
+        if media_file.state.name == "FAILED":
+            raise MediaProcessingFailed("Media processing failed in Gemini.")
+
+        print(f"✅ Media ready: {media_file.uri}")
+        return media_file
+
+    def generate_transcript(self, media_file, timestamped: bool = False) -> str:
+        """
+        Runs the transcription prompt with model fallback. Raises TranscriptGenerationError.
+        `timestamped` asks for a verbatim [HH:MM:SS] transcript (one window of a long recording).
+        """
+        if timestamped:
+            prompt = "Transcribe the speech in this audio verbatim, in its original language. Start every line with the time it begins, relative to the start of this audio, formatted as [HH:MM:SS]. Output only the transcript lines."
+        else:
+            prompt = "Transcribe the audio in this file. Provide a comprehensive summary of the key points, followed by a detailed transcript if possible. If it's a video, describe the visual content as well."
+        
+        # Model Fallback Strategy (current, available models)
+        models_to_try = [
+            "gemini-2.5-flash",      # Standard, fast
+            "gemini-2.5-pro",        # High quality fallback
+        ]
+        
+        last_error = None
+        for model_name in models_to_try:
+            try:
+                print(f"🤖 Trying Gemini Model: {model_name}...")
                 
-            if media_file.state.name == "FAILED":
-                raise ValueError("Media processing failed in Gemini.")
+                # contents accepts text and file objects/references
+                response = self.client.models.generate_content(
+                    model=model_name,
+                    contents=[prompt, media_file]
+                )
                 
-            print(f"✅ Media ready: {media_file.uri}")
-            
-            prompt = "Transcribe the audio in this file. Provide a comprehensive summary of the key points, followed by a detailed transcript if possible. If it's a video, describe the visual content as well."
-            
-            # Model Fallback Strategy (current, available models)
-            models_to_try = [
-                "gemini-2.5-flash",      # Standard, fast
-                "gemini-2.5-pro",        # High quality fallback
-            ]
-            
-            response = None
-            last_error = None
-            
-            for model_name in models_to_try:
-                try:
-                    print(f"🤖 Trying Gemini Model: {model_name}...")
-                    
-                    # Generate content with new SDK
-                    # contents accepts text and file objects/references
-                    response = self.client.models.generate_content(
-                        model=model_name,
-                        contents=[prompt, media_file]
-                    )
-                    
-                    if response and response.text:
-                        print(f"✅ Success with model: {model_name}")
-                        break
-                except Exception as e:
-                    print(f"⚠️ Model {model_name} failed: {e}")
-                    last_error = e
-                    continue
-            
-            if not response or not response.text:
-                 raise ValueError(f"All Gemini models failed. Last error: {last_error}")
-            
-            return response.text
-            
-        except Exception as e:
-            print(f"❌ Transcription error: {str(e)}")
-            return f"Error transcribing media: {str(e)}"
+                if response and response.text:
+                    print(f"✅ Success with model: {model_name}")
+                    return response.text
+            except Exception as e:
+                print(f"⚠️ Model {model_name} failed: {e}")
+                last_error = e
+                continue
         
-        finally:
-            # Clean up (delete from cloud to save space/privacy)
-            if 'media_file' in locals() and media_file:
-                try:
-                    print(f"🗑️ Deleting remote file: {media_file.name}")
-                    self.client.files.delete(name=media_file.name)
-                except Exception as cleanup_e:
-                    print(f"⚠️ Failed to delete processed file: {cleanup_e}")
+        raise TranscriptGenerationError(f"All Gemini models failed. Last error: {last_error}")
 
+    def delete_remote(self, media_file):
+        """Deletes an uploaded file from Gemini (space/privacy)."""
+        try:
+            print(f"🗑️ Deleting remote file: {media_file.name}")
+            self.client.files.delete(name=media_file.name)
+        except Exception as cleanup_e:
+            print(f"⚠️ Failed to delete processed file: {cleanup_e}")
@@ -0,0 +1,117 @@
+"""
+pdf_extractor.py - Shared PDF text extraction for every ingestion path.
+
+Library sync, research sessions, /brandfolder/ingest and /knowledge/upload
+all read PDFs through here instead of their own pypdf loops:
+
+  - `iter_pdf_pages` streams (page_number, text) in page order, so a
+    caller never holds more than a window of pages,
+  - PDFs with at least settings.pdf_parallel_min_pages pages are split into
+    page ranges extracted in a process pool (settings.pdf_extract_processes),
+    so a 600-page manual uses several cores instead of blocking one thread
+    for minutes; results are still yielded in order,
+  - `extract_pdf_text` joins the pages once (no quadratic `+=`).
+
+The pool uses the "spawn" start method: forking a threaded server process
+is unsafe.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional, Tuple
+
+import pypdf
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.pdf_extract_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _extract_range(file_path: str, start: int, end: int) -> List[str]:
+    """Worker-process entry point: text of pages [start, end)."""
+    reader = pypdf.PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _serial_pages(reader: pypdf.PdfReader, start: int = 0) -> Iterator[Tuple[int, str]]:
+    for i in range(start, len(reader.pages)):
+        yield i + 1, reader.pages[i].extract_text() or ""
+
+
+def iter_pdf_pages(file_path: str, parallel: Optional[bool] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (page_number, text) for every page, in order (1-based; empty text
+    for image-only pages). `parallel` forces/disables the process pool;
+    by default it is used for PDFs with >= settings.pdf_parallel_min_pages.
+    Raises pypdf errors for unreadable files.
+    """
+    reader = pypdf.PdfReader(file_path)
+    total = len(reader.pages)
+    if parallel is None:
+        parallel = settings.pdf_extract_processes > 1 and total >= settings.pdf_parallel_min_pages
+    if not parallel:
+        yield from _serial_pages(reader)
+        return
+
+    size = settings.pdf_pages_per_task
+    ranges = [(start, min(start + size, total)) for start in range(0, total, size)]
+    window = settings.pdf_extract_processes * 2
+    next_page = 0
+    pending = []
+    try:
+        pool = _get_pool()
+        pending = [pool.submit(_extract_range, file_path, s, e) for s, e in ranges[:window]]
+        submitted = len(pending)
+        while pending:
+            texts = pending.pop(0).result()
+            for text in texts:
+                next_page += 1
+                yield next_page, text
+            # Keep a bounded number of ranges in flight (and in memory)
+            if submitted < len(ranges):
+                s, e = ranges[submitted]
+                pending.append(pool.submit(_extract_range, file_path, s, e))
+                submitted += 1
+    except BrokenProcessPool as e:
+        logger.warning(f"PDF process pool failed ({e}); continuing {file_path} in-process")
+        _reset_pool()
+        yield from _serial_pages(reader, start=next_page)
+    finally:
+        # Consumer stopped early: drop ranges not started yet
+        for future in pending:
+            future.cancel()
+
+
+def extract_pdf_text(file_path: str) -> str:
+    """Whole-document text, pages separated by newlines (empty pages skipped)."""
+    return "\n".join(text for _, text in iter_pdf_pages(file_path) if text)
+
+
+def shutdown_pdf_pool():
+    """Stops the worker processes (app shutdown)."""
+    _reset_pool()
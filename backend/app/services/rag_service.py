@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from .vector_store import vector_store
 
@@ -18,13 +19,24 @@ class RAGManager:
             logger.error(f"Error checking doc existence: {e}")
             return False
 
-    def add_document(self, content, source_url, title="Unknown"):
-        """Ingests a document into the brain."""
-        return self.store.store_document(content, source_url, title)
+    def existing_sources(self, source_urls):
+        """Bulk variant of document_exists: returns the subset of source_urls already stored."""
+        return self.store.existing_sources(list(source_urls))
 
-    def search(self, query, n_results=3):
-        """Retrieves relevant context for a query."""
-        return self.store.search_similar(query, limit=n_results)
+    def add_document(self, content, source_url, title="Unknown", prepared=None, replace=False):
+        """
+        Ingests a document into the brain (`prepared`: pre-computed chunks/embeddings;
+        `replace`: swap out an existing document with the same source).
+        """
+        return self.store.store_document(content, source_url, title, prepared=prepared, replace=replace)
+
+    def search(self, query, n_results=3, mode=None):
+        """Retrieves relevant context for a query (mode: 'vector' | 'hybrid', default from settings)."""
+        return self.store.search_similar(query, limit=n_results, mode=mode)
+
+    async def asearch(self, query, n_results=3, mode=None):
+        """Non-blocking search for async handlers (embedding + RPC run in a worker thread)."""
+        return await asyncio.to_thread(self.search, query, n_results, mode)
 
     def get_stats(self):
         """Returns the number of documents in memory."""
@@ -0,0 +1,169 @@
+"""
+rate_limiter.py - Per-upstream request budgets.
+
+Each upstream (Brandfolder, Planning Center) gets one token bucket shared by
+every thread and coroutine in the process, so concurrent sync workers and
+page fetchers spend one budget instead of each guessing their own pace.
+
+The shared HTTP clients (http_client.py) consult it when a call names an
+upstream:
+  - a token is reserved before every request (sustained rate + burst),
+  - Retry-After / rate-limit headers pause the whole upstream, not just
+    the request that hit the limit,
+  - 429/5xx and transport errors are retried with jittered exponential backoff.
+"""
+
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Classic token bucket; `reserve` hands out future slots so callers can sleep outside the lock."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Takes one token; returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float):
+        """Blocks new reservations for `seconds` (server said slow down) and drains the burst."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = now
+
+    def set_rate(self, rate: float, burst: Optional[int] = None):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(rate, 0.001)
+            if burst:
+                self.capacity = max(1, burst)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Upstream:
+    """Budget + retry policy for one upstream API."""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        max_retries: int = None,
+        backoff_base: float = None,
+        backoff_max: float = None,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self._advertised_rate: Optional[float] = None  # last rate the server announced
+        self.max_retries = settings.http_max_retries if max_retries is None else max_retries
+        self.backoff_base = backoff_base or settings.http_backoff_base_seconds
+        self.backoff_max = backoff_max or settings.http_backoff_max_seconds
+
+    def reserve(self) -> float:
+        return self.bucket.reserve()
+
+    def backoff(self, attempt: int) -> float:
+        """Equal-jitter exponential backoff for retry `attempt` (1-based): uniform in [ceiling/2, ceiling]."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def observe(self, headers, status_code: int) -> Optional[float]:
+        """
+        Learns from response headers. Returns the server-requested delay
+        (and pauses the whole upstream) when the server asked us to slow down.
+        """
+        # Planning Center advertises its window: adopt the real rate
+        limit = headers.get("X-PCO-API-Request-Rate-Limit")
+        period = headers.get("X-PCO-API-Request-Rate-Period")
+        if limit and period:
+            try:
+                real_rate = float(limit) / float(period)
+                # Compared with what was announced, not the bucket (set 10% under it)
+                if self._advertised_rate is None or abs(real_rate - self._advertised_rate) > 0.01:
+                    self._advertised_rate = real_rate
+                    self.bucket.set_rate(real_rate * 0.9)
+            except (ValueError, ZeroDivisionError):
+                pass
+
+        delay = parse_retry_after(headers.get("Retry-After"))
+        if delay is None and headers.get("X-RateLimit-Remaining") == "0":
+            reset = headers.get("X-RateLimit-Reset")
+            try:
+                reset = float(reset)
+                # Either an epoch timestamp or seconds-until-reset
+                delay = reset - time.time() if reset > 1e9 else reset
+            except (TypeError, ValueError):
+                delay = None
+
+        if status_code == 429 and delay is None:
+            delay = self.backoff(1)
+        if delay is not None and delay > 0:
+            delay = min(delay, self.backoff_max)
+            logger.warning(f"{self.name} rate limit: pausing all requests for {delay:.1f}s")
+            self.bucket.pause(delay)
+            return delay
+        return None
+
+    def retry_delay(self, headers, status_code: int, attempt: int) -> float:
+        """Delay before retry `attempt`: what the server asked for, else jittered backoff."""
+        requested = self.observe(headers, status_code)
+        return max(requested or 0.0, self.backoff(attempt))
+
+
+_upstreams: Dict[str, Upstream] = {}
+_registry_lock = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """Shared Upstream for `name` ("brandfolder", "planning_center", or any other key)."""
+    with _registry_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            rate, burst = {
+                "brandfolder": (settings.brandfolder_rate_limit_per_second, settings.brandfolder_rate_limit_burst),
+                "planning_center": (settings.planning_center_rate_limit_per_second, settings.planning_center_rate_limit_burst),
+            }.get(name, (settings.http_default_rate_limit_per_second, settings.http_default_rate_limit_burst))
+            upstream = Upstream(name, rate, burst)
+            _upstreams[name] = upstream
+        return upstream
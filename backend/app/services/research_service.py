@@ -4,10 +4,15 @@ import os
 import json
 import uuid
 from datetime import datetime
+from typing import Callable, Optional
+from ..core.exceptions import TranscriptionError
 from .brandfolder_service import BrandfolderAPI
+from .media_preprocess import media_fingerprint
+from .pdf_extractor import extract_pdf_text
 from .chat_service import ChatService
 from .media_service import MediaService
 from .rag_service import RAGManager
+from .sync_service import reusable_content
 
 # DB Path (Same volume as auth DB)
 # In Railway with a Volume mounted at /app/brain_data
@@ -65,9 +70,16 @@ class ResearchService:
                 url TEXT,
                 status TEXT DEFAULT 'pending', -- pending, transcribed, indexed, error
                 content TEXT,
+                content_hash TEXT, -- media fingerprint (media_preprocess.media_fingerprint)
                 FOREIGN KEY (session_id) REFERENCES research_sessions (id)
             )
         ''')
+
+        # Fingerprint column for duplicate-media reuse (older DBs predate it)
+        c.execute("PRAGMA table_info(research_assets)")
+        if "content_hash" not in [row[1] for row in c.fetchall()]:
+            c.execute("ALTER TABLE research_assets ADD COLUMN content_hash TEXT")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_research_assets_content_hash ON research_assets (content_hash)")
         
         conn.commit()
         conn.close()
@@ -96,35 +108,35 @@ class ResearchService:
             print(f"✅ [Research] Using Brandfolder: {bfs[0].get('attributes', {}).get('name')} ({bf_id})")
             
             # 3. Search Assets (Tiered Approach)
+            # Results are streamed page by page and reduced to the few fields a
+            # session needs; once the cap is reached the remaining pages are never fetched.
+            max_assets = 1000 # Increased cap to 1000 for full coverage
+            merged_assets_map = {}
+
+            def collect(assets) -> int:
+                # Use a dict to remove duplicates by ID, preserving order
+                found = 0
+                for asset in assets:
+                    found += 1
+                    if asset['id'] not in merged_assets_map:
+                        merged_assets_map[asset['id']] = self._summarize_asset(asset)
+                    if len(merged_assets_map) >= max_assets:
+                        break
+                return found
             
             # Tier 1: Exact Match (High Precision)
             print(f"🔍 [Research] Tier 1: Exact search for '{query}'")
-            exact_assets = self.bf_api.search_assets(bf_id, f'"{query}"') # Quote for exact phrase if supported, or just raw
-            print(f"✅ [Research] Found {len(exact_assets)} exact matches")
+            exact_count = collect(self.bf_api.iter_search_assets(bf_id, f'"{query}"')) # Quote for exact phrase if supported, or just raw
+            print(f"✅ [Research] Found {exact_count} exact matches")
             
             # Tier 2: Conceptual/Optimized (High Recall)
-            optimized_assets = []
-            if query != optimized_query:
+            if query != optimized_query and len(merged_assets_map) < max_assets:
                 print(f"🔍 [Research] Tier 2: Conceptual search for '{optimized_query}'")
-                optimized_assets = self.bf_api.search_assets(bf_id, optimized_query)
-                print(f"✅ [Research] Found {len(optimized_assets)} conceptual matches")
-            
-            # Merge Results (Priority: Exact -> Conceptual)
-            # Use a dict to remove duplicates by ID, preserving order
-            merged_assets_map = {}
-            
-            for asset in exact_assets:
-                merged_assets_map[asset['id']] = asset
-                
-            for asset in optimized_assets:
-                 if asset['id'] not in merged_assets_map:
-                     merged_assets_map[asset['id']] = asset
-            
-            # Convert back to list
-            raw_assets = list(merged_assets_map.values())
+                optimized_count = collect(self.bf_api.iter_search_assets(bf_id, optimized_query))
+                print(f"✅ [Research] Found {optimized_count} conceptual matches")
             
             # Fallback Logic (if still empty)
-            if not raw_assets:
+            if not merged_assets_map:
                  # Try OR query as last resort
                  stop_words = {'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o', 'de', 'del', 'a', 'ante', 'bajo', 'con', 'contra', 'de', 'desde', 'en', 'entre', 'hacia', 'hasta', 'para', 'por', 'según', 'sin', 'so', 'sobre', 'tras'}
                  words = [w for w in query.split() if w.lower() not in stop_words and len(w) > 3]
@@ -132,10 +144,10 @@ class ResearchService:
                  if words:
                      or_query = " OR ".join(words)
                      print(f"⚠️ [Research] Retrying with OR keywords: '{or_query}'")
-                     raw_assets = self.bf_api.search_assets(bf_id, or_query)
-                     print(f"✅ [Research] Found {len(raw_assets)} assets with OR query")
+                     or_count = collect(self.bf_api.iter_search_assets(bf_id, or_query))
+                     print(f"✅ [Research] Found {or_count} assets with OR query")
             
-            print(f"✅ [Research] Total combined unique assets: {len(raw_assets)}")
+            print(f"✅ [Research] Total combined unique assets: {len(merged_assets_map)}")
             
             # 4. Save Session & Assets Draft
             print(f"💾 [Research] Saving session {session_id} to DB...")
@@ -147,33 +159,14 @@ class ResearchService:
             
             proposed_assets = []
             
-            print(f"Processing {len(raw_assets)} raw assets...")
-            for asset in raw_assets[:1000]: # Increased cap to 1000 for full coverage
-                info = self.bf_api.extract_asset_info(asset)
-                
-                # Determine type
-                asset_type = 'document'
-                url = f"https://brandfolder.com/workbench/{info['id']}" # Default source
-                
-                # Check for media url
-                for att in info['attachments']:
-                    mimetype = att.get('mimetype') or ''
-                    if 'video' in mimetype:
-                        asset_type = 'video'
-                        url = att.get('url') # Actual file for transcription later
-                        break
-                    if 'audio' in mimetype:
-                        asset_type = 'audio'
-                        url = att.get('url')
-                        break
-                
+            for summary in merged_assets_map.values():
                 c.execute("INSERT INTO research_assets (session_id, asset_id, name, type, url) VALUES (?, ?, ?, ?, ?)",
-                          (session_id, info['id'], info['name'], asset_type, url))
+                          (session_id, summary['id'], summary['name'], summary['type'], summary['url']))
                 
                 proposed_assets.append({
-                    "id": info['id'],
-                    "name": info['name'],
-                    "type": asset_type
+                    "id": summary['id'],
+                    "name": summary['name'],
+                    "type": summary['type']
                 })
                 
             conn.commit()
@@ -198,6 +191,28 @@ class ResearchService:
             traceback.print_exc()
             raise
 
+    def _summarize_asset(self, asset: dict) -> dict:
+        """Reduces a raw asset to what a research session stores (id, name, type, url)."""
+        info = self.bf_api.extract_asset_info(asset)
+        
+        # Determine type
+        asset_type = 'document'
+        url = f"https://brandfolder.com/workbench/{info['id']}" # Default source
+        
+        # Check for media url
+        for att in info['attachments']:
+            mimetype = att.get('mimetype') or ''
+            if 'video' in mimetype:
+                asset_type = 'video'
+                url = att.get('url') # Actual file for transcription later
+                break
+            if 'audio' in mimetype:
+                asset_type = 'audio'
+                url = att.get('url')
+                break
+        
+        return {"id": info['id'], "name": info['name'], "type": asset_type, "url": url}
+
     def get_history(self, user_id: str):
         conn = sqlite3.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
@@ -242,11 +257,23 @@ class ResearchService:
             print(f"⚠️ Cache lookup failed: {e}")
             return None
 
-    def execute_session(self, session_id: str):
+    def get_content_by_fingerprint(self, content_hash: str, asset_id: str):
+        """(content, asset_id) of another asset already indexed from identical media, if any."""
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            row = reusable_content(conn.cursor(), content_hash, asset_id)
+            conn.close()
+            return row
+        except Exception as e:
+            print(f"⚠️ Fingerprint lookup failed: {e}")
+            return None
+
+    def execute_session(self, session_id: str, progress: Optional[Callable[[float, str], None]] = None):
         """
         Step 2: Execute.
         Runs through the assets, transcribes media, and indexes logic.
-        NOTE: This should ideally be a background task (Celery/RQ), but we'll do sync generator or background thread for simplicity in this MVP.
+        Runs as a "research_execute" ingestion job (services/ingestion_queue.py);
+        `progress(fraction, message)` is called after each asset.
         """
         conn = sqlite3.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
@@ -276,6 +303,8 @@ class ResearchService:
             try:
                 # 0. Check Cache First!
                 content = self.get_cached_content(asset['asset_id'])
+                content_hash = None
+                prepared = None
                 
                 # BOMB-PROOF CACHE BYPASS: If cache is corrupted with old transcription errors, ignore it
                 if content and ("Error transcribing media" in content or "Extraction Failed" in content or "Transcription Failed" in content):
@@ -290,6 +319,7 @@ class ResearchService:
                     
                     if asset['type'] in ['video', 'audio', 'document']:
                         # REFRESH URL: Stored URL might be expired signed URL
+                        local_path = None
                         try:
                             fresh_details = self.bf_api.get_asset_details(asset['asset_id'])
                             fresh_info = self.bf_api.extract_asset_info(fresh_details)
@@ -313,19 +343,26 @@ class ResearchService:
                             
                             if fresh_url and fresh_url.startswith('http'):
                                 local_path = self.bf_api.download_attachment(fresh_url)
+                                duplicate = None
                                 if local_path:
+                                    # Same media already indexed under another asset? Reuse it.
+                                    content_hash = media_fingerprint(local_path)
+                                    duplicate = self.get_content_by_fingerprint(content_hash, asset['asset_id'])
+                                if duplicate:
+                                    dup_content, dup_asset_id = duplicate
+                                    print(f"♻️ DUPLICATE MEDIA: {asset['name']} matches {dup_asset_id}, reusing its content")
+                                    prepared = self.rag.store.stored_chunks(
+                                        f"https://brandfolder.com/workbench/{dup_asset_id}", header=content
+                                    )
+                                    content += "\n\n" + dup_content.partition("\n\n")[2]
+                                    os.remove(local_path)
+                                elif local_path:
                                     if asset['type'] in ['video', 'audio']:
                                         transcript = self.media_service.transcribe_media(local_path, mime_type='video/mp4' if asset['type']=='video' else 'audio/mp3')
                                         content += f"\n\n--- TRANSCRIPT ---\n{transcript}"
                                     elif asset['type'] == 'document':
-                                        import pypdf
                                         try:
-                                            reader = pypdf.PdfReader(local_path)
-                                            pdf_text = ""
-                                            for page in reader.pages:
-                                                extracted = page.extract_text()
-                                                if extracted:
-                                                    pdf_text += extracted + "\n"
+                                            pdf_text = extract_pdf_text(local_path)
                                             if pdf_text.strip():
                                                 content += f"\n\n--- DOCUMENT TEXT ---\n{pdf_text}"
                                             else:
@@ -335,6 +372,11 @@ class ResearchService:
                                             content += f"\n\n[PDF Extraction Failed: {e}]"
                                     
                                     os.remove(local_path)
+                        except TranscriptionError:
+                            # Typed failure: mark the asset 'error' rather than indexing error text
+                            if local_path and os.path.exists(local_path):
+                                os.remove(local_path)
+                            raise
                         except Exception as e:
                             print(f"⚠️ Failed to refresh/download media {asset['asset_id']}: {e}")
                             # Don't fail the whole asset logic, just skip transcript
@@ -343,10 +385,13 @@ class ResearchService:
                 # 2. Index to Chroma
                 # Source needs to be the clickable link
                 source_link = f"https://brandfolder.com/workbench/{asset['asset_id']}"
-                self.rag.add_document(content, source_link, title=asset['name'])
+                self.rag.add_document(content, source_link, title=asset['name'], prepared=prepared)
                 
                 # 3. Update Status and Content in DB
-                c.execute("UPDATE research_assets SET status='indexed', content=? WHERE id=?", (content, asset['id']))
+                c.execute(
+                    "UPDATE research_assets SET status='indexed', content=?, content_hash=COALESCE(?, content_hash) WHERE id=?",
+                    (content, content_hash, asset['id'])
+                )
                 conn.commit()
                 stats["indexed"] += 1
                 print(f"✅ [Research] Asset {asset['id']} ({asset['name']}) indexed & saved.")
@@ -356,6 +401,10 @@ class ResearchService:
                 c.execute("UPDATE research_assets SET status='error' WHERE id=?", (asset['id'],))
                 conn.commit()
                 stats["failed"] += 1
+
+            if progress:
+                done = stats["indexed"] + stats["failed"]
+                progress(done / len(assets), f"{done}/{len(assets)} assets")
                 
         c.execute("UPDATE research_sessions SET status='completed' WHERE id=?", (session_id,))
         conn.commit()
@@ -0,0 +1,96 @@
+"""
+sync_pipeline.py - Bounded multi-stage worker pool.
+
+Items flow through a fixed sequence of stages (e.g. metadata → download →
+extract → embed → write). Each stage has its own worker threads and a small
+bounded input queue, so a slow stage (transcription) applies backpressure
+upstream instead of letting downloads pile up on disk, while fast stages
+keep working on other items in parallel.
+
+A stage function receives an item and returns it (to pass it on) or None
+(to drop it, e.g. nothing left to do). Exceptions are reported through
+`on_error` and drop only that item.
+"""
+
+import queue
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Optional[Any]]
+    workers: int = 1
+
+
+class StagePipeline:
+    """Runs items through stages concurrently; `run` blocks until all are processed."""
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        on_error: Optional[Callable[[Any, str, Exception], None]] = None,
+        queue_factor: int = 2,
+    ):
+        if not stages:
+            raise ValueError("StagePipeline needs at least one stage")
+        self.stages = stages
+        self.on_error = on_error
+        self.queues = [queue.Queue(maxsize=max(1, s.workers) * queue_factor) for s in stages]
+        self._remaining = [max(1, s.workers) for s in stages]
+        self._lock = threading.Lock()
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                inbox.put(_DONE)  # let sibling workers see it too
+                with self._lock:
+                    self._remaining[index] -= 1
+                    last = self._remaining[index] == 0
+                if last and outbox is not None:
+                    outbox.put(_DONE)
+                return
+
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                logger.error(f"Pipeline stage '{stage.name}' failed: {e}")
+                if self.on_error:
+                    try:
+                        self.on_error(item, stage.name, e)
+                    except Exception as cb_err:
+                        logger.error(f"Pipeline error handler failed: {cb_err}")
+                continue
+
+            if result is not None and outbox is not None:
+                outbox.put(result)
+
+    def run(self, items: Iterable[Any]):
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(max(1, stage.workers)):
+                t = threading.Thread(
+                    target=self._worker, args=(index,), name=f"sync-{stage.name}-{n}", daemon=True
+                )
+                t.start()
+                threads.append(t)
+
+        try:
+            for item in items:
+                self.queues[0].put(item)
+        finally:
+            self.queues[0].put(_DONE)
+            for t in threads:
+                t.join()
@@ -4,16 +4,46 @@ Periodically scans the Brandfolder and indexes ALL content into the agent's memo
 
 Features:
   - Differential sync: Only ingests content NOT already in the vector database.
+  - Incremental crawl: each brandfolder's high-water mark of asset updated_at
+    is stored in sync_log; later runs only list assets changed since then and
+    re-index the modified ones (their old chunks are replaced). Each indexed
+    asset records the updated_at it was indexed at, so relisting an unchanged
+    asset never re-indexes it; assets that failed are kept in
+    sync_failed_assets and retried by id instead of holding the mark back.
   - No duplication: Checks both the local SQLite research_assets table and the
-    Supabase documents table before processing any asset.
+    Supabase documents table before processing any asset. Both checks run in
+    bulk before the crawl (one local query, batched `in_` queries against
+    Supabase), and sources confirmed in the vector DB are remembered in
+    sync_known_sources so later runs skip even the batched lookups.
+  - Duplicate media: downloads are fingerprinted (research_assets.content_hash);
+    media already indexed under another asset reuses that asset's transcript
+    and stored embeddings instead of being transcribed again.
+  - Worker pool: assets flow through bounded stages
+    (metadata → download → extract → embed → write), each with its own
+    concurrency (see the sync_*_workers settings).
+  - Resumable: extracted content is checkpointed per asset in sync_checkpoint,
+    so a crashed or redeployed container resumes without re-downloading or
+    re-transcribing finished work (see resume_interrupted_sync).
   - Lockout: Prevents two concurrent syncs from running at the same time.
   - Preserves existing memory: Never deletes or overwrites existing indexed content.
 """
 
 import sqlite3
 import os
+import json
 import uuid
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+from ..core.exceptions import TranscriptionError
+from .sync_pipeline import Stage, StagePipeline
+from .brandfolder_service import parse_timestamp
+from .media_preprocess import media_fingerprint
+from .pdf_extractor import extract_pdf_text
+from .http_client import http_metrics
 
 # DB Path (same as research_service.py)
 if os.path.exists("/app/brain_data"):
@@ -26,8 +56,25 @@ else:
 _sync_running = False
 
 
+def _connect() -> sqlite3.Connection:
+    # Pipeline stages write from several threads; wait on the DB lock instead of failing
+    return sqlite3.connect(DB_PATH, timeout=30)
+
+
+def _execute(sql: str, params: tuple = ()) -> int:
+    """Runs one write on a short-lived connection (safe from any worker thread)."""
+    conn = _connect()
+    try:
+        c = conn.cursor()
+        c.execute(sql, params)
+        conn.commit()
+        return c.lastrowid
+    finally:
+        conn.close()
+
+
 def _init_sync_log_table():
-    """Ensures the sync_log table exists for tracking sync history."""
+    """Ensures the sync_log and sync_checkpoint tables exist."""
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     c.execute('''
@@ -35,39 +82,442 @@ def _init_sync_log_table():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             completed_at TIMESTAMP,
-            status TEXT DEFAULT 'running',   -- running, completed, failed
+            status TEXT DEFAULT 'running',   -- running, completed, failed, interrupted
             total_found INTEGER DEFAULT 0,
             new_indexed INTEGER DEFAULT 0,
             skipped INTEGER DEFAULT 0,
             failed INTEGER DEFAULT 0,
-            notes TEXT
+            notes TEXT,
+            watermarks TEXT                  -- JSON {brandfolder_id: max asset updated_at}
+        )
+    ''')
+    # Older databases predate the watermarks column
+    c.execute("PRAGMA table_info(sync_log)")
+    if "watermarks" not in [row[1] for row in c.fetchall()]:
+        c.execute("ALTER TABLE sync_log ADD COLUMN watermarks TEXT")
+    # Per-asset progress that survives a crash: content that was already
+    # downloaded + extracted (the expensive part) is reused on the next run.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sync_checkpoint (
+            asset_id TEXT PRIMARY KEY,
+            log_id INTEGER,
+            stage TEXT,                      -- extracted
+            content TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Content fingerprints, so duplicate media is reused (research_assets is
+    # created by research_service; older tables predate the column)
+    c.execute("PRAGMA table_info(research_assets)")
+    columns = [row[1] for row in c.fetchall()]
+    if columns and "content_hash" not in columns:
+        c.execute("ALTER TABLE research_assets ADD COLUMN content_hash TEXT")
+    # ... and the Brandfolder updated_at each asset was indexed at
+    if columns and "source_updated_at" not in columns:
+        c.execute("ALTER TABLE research_assets ADD COLUMN source_updated_at TEXT")
+    if columns:
+        c.execute("CREATE INDEX IF NOT EXISTS idx_research_assets_content_hash ON research_assets (content_hash)")
+    # Assets whose last attempt failed, retried by id on the next run
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sync_failed_assets (
+            asset_id TEXT PRIMARY KEY,
+            brandfolder_id TEXT,
+            error TEXT,
+            failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Sources known to be in the vector DB (persisted between runs)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sync_known_sources (
+            source TEXT PRIMARY KEY
         )
     ''')
     conn.commit()
     conn.close()
 
 
-def _asset_already_indexed(c, asset_id: str) -> bool:
+def _indexed_assets(c) -> Dict[str, Optional[str]]:
     """
-    Checks if an asset has already been successfully processed.
-    Uses the local research_assets table as a fast first-level check.
+    {asset_id: updated_at it was indexed at} for every asset already
+    successfully processed, from the local research_assets table (fast
+    first-level check, one query per run). The stamp is None for rows
+    indexed before it was recorded.
     """
     c.execute(
-        "SELECT id FROM research_assets WHERE asset_id=? AND status='indexed' LIMIT 1",
+        "SELECT asset_id, MAX(source_updated_at) FROM research_assets "
+        "WHERE status='indexed' GROUP BY asset_id"
+    )
+    return {row[0]: row[1] for row in c.fetchall()}
+
+
+def _failed_assets(c) -> List[tuple]:
+    """(asset_id, brandfolder_id) of assets whose last sync attempt failed."""
+    c.execute("SELECT asset_id, brandfolder_id FROM sync_failed_assets ORDER BY failed_at")
+    return c.fetchall()
+
+
+def _known_sources(c) -> set:
+    c.execute("SELECT source FROM sync_known_sources")
+    return {row[0] for row in c.fetchall()}
+
+
+def remember_sources(sources):
+    """Records sources as present in the vector DB."""
+    rows = [(s,) for s in sources if s]
+    if not rows:
+        return
+    conn = _connect()
+    try:
+        conn.executemany("INSERT OR IGNORE INTO sync_known_sources (source) VALUES (?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def forget_sources(sources):
+    """Drops sources from the known-sources cache (call when their documents are deleted)."""
+    rows = [(s,) for s in sources if s]
+    if not rows:
+        return
+    _init_sync_log_table()
+    conn = _connect()
+    try:
+        conn.executemany("DELETE FROM sync_known_sources WHERE source=?", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _sources_in_vector_db(c, rag, sources: List[str], use_cache: bool = True, known: Optional[set] = None) -> set:
+    """
+    Bulk existence check: cached sources are trusted, the rest are looked up
+    in batches and the hits are added to the cache. Pass `known` (the cache
+    already loaded) when checking many batches in one run.
+    """
+    wanted = set(sources)
+    if known is None:
+        known = _known_sources(c) if use_cache else set()
+    cached = known & wanted
+    remote = rag.existing_sources(sorted(wanted - cached)) if wanted - cached else set()
+    remember_sources(remote)
+    return cached | remote
+
+
+def _batched(iterable, size: int):
+    """Groups an iterable into lists of up to `size` items (lazily)."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _newest(current: Optional[str], candidate: Optional[str]) -> Optional[str]:
+    """The later of two Brandfolder timestamps (either may be missing)."""
+    if parse_timestamp(candidate) is None:
+        return current
+    if parse_timestamp(current) is None or parse_timestamp(candidate) > parse_timestamp(current):
+        return candidate
+    return current
+
+
+def _last_watermarks(c) -> Dict[str, str]:
+    """Per-brandfolder updated_at high-water marks from the latest completed run."""
+    c.execute(
+        "SELECT watermarks FROM sync_log WHERE status='completed' AND watermarks IS NOT NULL "
+        "ORDER BY id DESC LIMIT 1"
+    )
+    row = c.fetchone()
+    if not row:
+        return {}
+    try:
+        return json.loads(row[0]) or {}
+    except ValueError:
+        return {}
+
+
+def _advance_watermarks(
+    previous: Dict[str, str],
+    listed: Dict[str, List[str]],
+    failed_brandfolders: set,
+) -> Dict[str, str]:
+    """
+    New high-water marks: the newest updated_at listed per brandfolder.
+    A brandfolder whose listing was incomplete keeps its old mark so the
+    unlisted pages are picked up again next run (failed assets do not hold
+    the mark back: they are retried from sync_failed_assets).
+    """
+    marks = dict(previous)
+    for bf_id, stamps in listed.items():
+        if bf_id in failed_brandfolders:
+            continue
+        parsed = [(parse_timestamp(ts), ts) for ts in stamps]
+        parsed = [p for p in parsed if p[0] is not None]
+        if not parsed:
+            continue
+        newest = max(parsed)[1]
+        current = parse_timestamp(marks.get(bf_id))
+        if current is None or parse_timestamp(newest) > current:
+            marks[bf_id] = newest
+    return marks
+
+
+def _load_checkpoint(c, asset_id: str) -> Optional[str]:
+    """Extracted content saved by a previous (interrupted) run, if any."""
+    c.execute(
+        "SELECT content FROM sync_checkpoint WHERE asset_id=? AND stage='extracted'",
         (asset_id,)
     )
-    return c.fetchone() is not None
+    row = c.fetchone()
+    return row[0] if row else None
 
 
-def full_sync():
+def _pending_asset_row(c, asset_id: str) -> Optional[int]:
+    """research_assets row left 'pending' by an interrupted run, reused instead of duplicated."""
+    c.execute(
+        "SELECT id FROM research_assets WHERE asset_id=? AND status='pending' ORDER BY id DESC LIMIT 1",
+        (asset_id,)
+    )
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+def reusable_content(c, content_hash: str, asset_id: str) -> Optional[tuple]:
+    """
+    (content, asset_id) of another asset already indexed from identical media,
+    if any. Shared with ResearchService.get_content_by_fingerprint.
+    """
+    c.execute(
+        "SELECT content, asset_id FROM research_assets WHERE content_hash=? AND asset_id!=? "
+        "AND status='indexed' AND length(content) > 50 AND content NOT LIKE '%Extraction Failed%' "
+        "ORDER BY id DESC LIMIT 1",
+        (content_hash, asset_id)
+    )
+    return c.fetchone()
+
+
+def asset_header(name: str, asset_type: str) -> str:
+    """First paragraph of every indexed asset's content (and so of its first chunk)."""
+    return f"Asset: {name}\nType: {asset_type}"
+
+
+def _with_header(content: str, name: str, asset_type: str) -> str:
+    """Swaps the 'Asset:/Type:' header of reused content for this asset's own."""
+    _, sep, body = content.partition("\n\n")
+    return asset_header(name, asset_type) + sep + body
+
+
+@dataclass
+class SyncItem:
+    """One asset moving through the sync pipeline."""
+    asset_id: str
+    name: str
+    asset_type: str
+    source_link: str
+    row_id: int
+    brandfolder_id: str = ""
+    replace: bool = False               # modified since last sync: swap out old chunks
+    content: Optional[str] = None       # set once extracted (or restored from checkpoint)
+    fresh_url: Optional[str] = None
+    fresh_mime: str = ""
+    local_path: Optional[str] = None
+    error: Optional[str] = None
+    content_hash: Optional[str] = None  # media fingerprint of the download
+    updated_at: Optional[str] = None    # Brandfolder updated_at when listed
+    reuse_source: Optional[str] = None  # indexed duplicate whose chunks/embeddings are reused
+    prepared: Optional[List[Any]] = field(default=None, repr=False)
+
+
+def _pick_attachment(attachments: List[Dict], asset_type: str):
+    """Chooses the attachment to process for an asset type. Returns (url, mimetype)."""
+    for att in attachments:
+        mimetype = att.get("mimetype") or ""
+        if asset_type == "video" and "video" in mimetype:
+            return att.get("url"), mimetype
+        if asset_type == "audio" and "audio" in mimetype:
+            return att.get("url"), mimetype
+        if asset_type == "image" and "image" in mimetype:
+            return att.get("url"), mimetype
+        if asset_type == "document" and any(x in mimetype for x in ["pdf", "document", "text"]):
+            return att.get("url"), mimetype
+
+    # Fallback to first attachment for documents/images
+    if asset_type in ("document", "image") and attachments:
+        return attachments[0].get("url"), attachments[0].get("mimetype") or ""
+    return None, ""
+
+
+class _SyncWorkers:
+    """Stage functions for one sync run (shared services + thread-safe stats)."""
+
+    def __init__(self, bf_api, media_service, rag, log_id: int, stats: Dict[str, int]):
+        self.bf_api = bf_api
+        self.media_service = media_service
+        self.rag = rag
+        self.log_id = log_id
+        self.stats = stats
+        self.failed_brandfolders = set()  # listing incomplete: watermark kept
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    # ── Stages ───────────────────────────────────────────────────
+
+    def metadata(self, item: SyncItem) -> SyncItem:
+        """Refreshes attachment URLs (stored signed URLs expire)."""
+        if item.content is not None:
+            return item
+        try:
+            fresh_details = self.bf_api.get_asset_details(item.asset_id)
+            fresh_info = self.bf_api.extract_asset_info(fresh_details)
+            item.fresh_url, item.fresh_mime = _pick_attachment(fresh_info["attachments"], item.asset_type)
+        except Exception as e:
+            print(f"⚠️  [AutoSync] Metadata refresh failed for {item.name}: {e}")
+            item.error = str(e)
+        return item
+
+    def download(self, item: SyncItem) -> SyncItem:
+        if item.content is not None or item.error:
+            return item
+        if item.fresh_url and item.fresh_url.startswith("http"):
+            try:
+                item.local_path = self.bf_api.download_attachment(item.fresh_url)
+            except Exception as e:
+                print(f"⚠️  [AutoSync] Download failed for {item.name}: {e}")
+                item.error = str(e)
+        if item.local_path:
+            self._reuse_duplicate(item)
+        return item
+
+    def _reuse_duplicate(self, item: SyncItem):
+        """Fingerprints the download; media already indexed under another asset is not processed again."""
+        try:
+            item.content_hash = media_fingerprint(item.local_path)
+        except OSError as e:
+            print(f"⚠️  [AutoSync] Fingerprint failed for {item.name}: {e}")
+            return
+        conn = _connect()
+        try:
+            duplicate = reusable_content(conn.cursor(), item.content_hash, item.asset_id)
+        finally:
+            conn.close()
+        if duplicate is None:
+            return
+
+        content, other_asset_id = duplicate
+        print(f"♻️  [AutoSync] Duplicate of {other_asset_id}, reusing its content: {item.name}")
+        item.content = _with_header(content, item.name, item.asset_type)
+        item.reuse_source = f"https://brandfolder.com/workbench/{other_asset_id}"
+        os.remove(item.local_path)
+        item.local_path = None
+
+    def extract(self, item: SyncItem) -> SyncItem:
+        """Transcribes / captions / parses the download, then checkpoints the content."""
+        if item.content is not None:
+            return item
+
+        content = asset_header(item.name, item.asset_type)
+        try:
+            if item.error:
+                raise RuntimeError(item.error)
+            if item.local_path:
+                if item.asset_type in ["video", "audio"]:
+                    mime = "video/mp4" if item.asset_type == "video" else "audio/mp3"
+                    transcript = self.media_service.transcribe_media(item.local_path, mime_type=mime)
+                    content += f"\n\n--- TRANSCRIPT ---\n{transcript}"
+                elif item.asset_type == "image":
+                    caption = self.media_service.describe_image(
+                        item.local_path, mime_type=(item.fresh_mime or "image/jpeg")
+                    )
+                    content += f"\n\n--- DESCRIPCIÓN DE LA IMAGEN (IA) ---\n{caption}"
+                elif item.asset_type == "document":
+                    try:
+                        pdf_text = extract_pdf_text(item.local_path)
+                        if pdf_text.strip():
+                            content += f"\n\n--- DOCUMENT TEXT ---\n{pdf_text}"
+                    except Exception as e:
+                        print(f"⚠️  PDF parse error for {item.name}: {e}")
+        except TranscriptionError:
+            # Typed failure: the item fails (and is retried next run) instead of indexing error text
+            raise
+        except Exception as e:
+            print(f"⚠️  [AutoSync] Media processing failed for {item.name}: {e}")
+            content += f"\n\n[Extraction Failed: {e}]"
+        finally:
+            if item.local_path and os.path.exists(item.local_path):
+                os.remove(item.local_path)
+            item.local_path = None
+
+        item.content = content
+        _execute(
+            "INSERT OR REPLACE INTO sync_checkpoint (asset_id, log_id, stage, content, updated_at) "
+            "VALUES (?, ?, 'extracted', ?, CURRENT_TIMESTAMP)",
+            (item.asset_id, self.log_id, content)
+        )
+        return item
+
+    def embed(self, item: SyncItem) -> SyncItem:
+        if item.reuse_source:
+            item.prepared = self.rag.store.stored_chunks(
+                item.reuse_source, header=asset_header(item.name, item.asset_type)
+            )
+        if item.prepared is None:
+            item.prepared = self.rag.store.prepare_chunks(item.content)
+        return item
+
+    def write(self, item: SyncItem) -> None:
+        # Index to Vector DB
+        stored = self.rag.add_document(
+            item.content, item.source_link, title=item.name,
+            prepared=item.prepared, replace=item.replace
+        )
+        if item.replace and not stored:
+            raise RuntimeError("re-index did not replace the stored document")
+
+        # Mark as indexed in DB and drop the checkpoint
+        _execute(
+            "UPDATE research_assets SET status='indexed', content=?, content_hash=?, source_updated_at=? WHERE id=?",
+            (item.content, item.content_hash, item.updated_at, item.row_id)
+        )
+        _execute("DELETE FROM sync_checkpoint WHERE asset_id=?", (item.asset_id,))
+        _execute("DELETE FROM sync_failed_assets WHERE asset_id=?", (item.asset_id,))
+        remember_sources([item.source_link])
+        self._count("new_indexed")
+        print(f"✅ [AutoSync] {'Re-indexed' if item.replace else 'Indexed'}: {item.name}")
+        return None
+
+    def on_error(self, item: SyncItem, stage: str, error: Exception):
+        print(f"❌ [AutoSync] Failed to process {item.name} at {stage}: {error}")
+        if item.local_path and os.path.exists(item.local_path):
+            os.remove(item.local_path)
+        # Retried by id next run, so the brandfolder's watermark can still advance
+        _execute(
+            "INSERT OR REPLACE INTO sync_failed_assets (asset_id, brandfolder_id, error, failed_at) "
+            "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+            (item.asset_id, item.brandfolder_id, f"{stage}: {error}")
+        )
+        self._count("failed")
+
+
+def full_sync(full: bool = None):
     """
     Main sync function. Scans ALL assets in Brandfolder and indexes any
     content not already present in the vector database.
 
+    Unless `full` is True (default: not settings.sync_incremental), only
+    assets updated since the last completed run are listed, and those that
+    were indexed before are re-indexed.
+
     This function is safe to call multiple times:
-    - It will skip assets already indexed.
+    - It will skip unchanged assets already indexed.
     - It will not delete or modify existing indexed content.
     - It will not run if a sync is already in progress.
+    - It resumes work checkpointed by an interrupted run.
     """
     global _sync_running
 
@@ -78,9 +528,14 @@ def full_sync():
     _sync_running = True
     _init_sync_log_table()
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
     c = conn.cursor()
 
+    # Any run still marked 'running' died with its container
+    c.execute(
+        "UPDATE sync_log SET status='interrupted', completed_at=CURRENT_TIMESTAMP WHERE status='running'"
+    )
+
     # Create a log entry for this sync run
     c.execute(
         "INSERT INTO sync_log (status) VALUES ('running')"
@@ -90,6 +545,9 @@ def full_sync():
     started_at = datetime.utcnow()
 
     stats = {"total_found": 0, "new_indexed": 0, "skipped": 0, "failed": 0}
+    if full is None:
+        full = not settings.sync_incremental
+    previous_marks = {} if full else _last_watermarks(c)
 
     try:
         from .brandfolder_service import BrandfolderAPI
@@ -107,32 +565,7 @@ def full_sync():
             raise ValueError("No Brandfolders accessible.")
         print(f"📚 [AutoSync] {len(brandfolders)} Brandfolder(s) accessible.")
 
-        # 2. Get ALL assets from EVERY brandfolder (paginated, no search filter)
-        raw_assets = []
-        seen_asset_ids = set()
-        for bf in brandfolders:
-            bf_id = bf["id"]
-            bf_name = bf.get("attributes", {}).get("name", bf_id)
-            print(f"🔍 [AutoSync] Fetching assets from '{bf_name}' ({bf_id})...")
-            bf_assets = bf_api.get_assets(brandfolder_id=bf_id, per_page=100)
-            # Dedupe across brandfolders (an asset can appear via collections)
-            unique = [a for a in bf_assets if a.get("id") and a["id"] not in seen_asset_ids]
-            for a in unique:
-                seen_asset_ids.add(a["id"])
-            raw_assets.extend(unique)
-            print(f"   → {len(bf_assets)} found in '{bf_name}' ({len(unique)} new across library)")
-
-        stats["total_found"] = len(raw_assets)
-        print(f"✅ [AutoSync] Found {len(raw_assets)} unique assets across all Brandfolders.")
-
-        # Update log with total count
-        c.execute(
-            "UPDATE sync_log SET total_found=? WHERE id=?",
-            (stats["total_found"], log_id)
-        )
-        conn.commit()
-
-        # 3. Create a special auto-sync session in research_sessions
+        # 2. Create a special auto-sync session in research_sessions
         session_id = str(uuid.uuid4())
         c.execute(
             "INSERT INTO research_sessions (id, user_id, query, status) VALUES (?, ?, ?, ?)",
@@ -140,19 +573,107 @@ def full_sync():
         )
         conn.commit()
 
-        media_service = MediaService()
+        workers = _SyncWorkers(bf_api, MediaService(), rag, log_id, stats)
 
-        # 4. Process each asset — skip ones already indexed
-        for asset in raw_assets:
+        # Only ids / sources are held for the whole run, never the assets themselves
+        indexed = _indexed_assets(c)
+        retry_assets = _failed_assets(c)
+        retry_ids = {asset_id for asset_id, _ in retry_assets}
+        known_sources = set() if full else _known_sources(c)
+        seen_asset_ids = set()
+        newest_stamp: Dict[str, str] = {}
+
+        def listed_assets():
+            """
+            3. Streams assets from EVERY brandfolder page by page (only changed
+            ones when the brandfolder has a watermark from a previous run).
+            Yields (asset, brandfolder_id, modified_since_last_run).
+            """
+            for bf in brandfolders:
+                bf_id = bf["id"]
+                bf_name = bf.get("attributes", {}).get("name", bf_id)
+                since = previous_marks.get(bf_id)
+                if since:
+                    print(f"🔍 [AutoSync] Fetching assets changed since {since} from '{bf_name}' ({bf_id})...")
+                else:
+                    print(f"🔍 [AutoSync] Fetching assets from '{bf_name}' ({bf_id})...")
+                found = unique = 0
+                # A partial listing must not advance the watermark: with updated_at DESC
+                # the missing pages hold the older changes, never listed again
+                partial = lambda bf_id=bf_id: workers.failed_brandfolders.add(bf_id)
+                for asset in bf_api.iter_assets(brandfolder_id=bf_id, per_page=100, updated_since=since,
+                                                on_incomplete=partial):
+                    found += 1
+                    stamp = (asset.get("attributes") or {}).get("updated_at")
+                    newest_stamp[bf_id] = _newest(newest_stamp.get(bf_id), stamp)
+                    # Dedupe across brandfolders (an asset can appear via collections)
+                    if not asset.get("id") or asset["id"] in seen_asset_ids:
+                        continue
+                    seen_asset_ids.add(asset["id"])
+                    unique += 1
+                    stats["total_found"] += 1
+                    # Assets listed against a watermark changed since the last run
+                    yield asset, bf_id, bool(since)
+                print(f"   → {found} found in '{bf_name}' ({unique} new across library)")
+
+            # Assets that failed last time, unless already listed above
+            retries = [(a, b) for a, b in retry_assets if a not in seen_asset_ids]
+            if retries:
+                print(f"🔁 [AutoSync] Retrying {len(retries)} asset(s) that failed before...")
+            for asset_id, bf_id in retries:
+                try:
+                    asset = bf_api.get_asset_details(asset_id)
+                except Exception as e:
+                    print(f"⚠️  [AutoSync] Could not fetch failed asset {asset_id}: {e}")
+                    continue
+                if not asset.get("id"):
+                    # Deleted from Brandfolder since: nothing left to retry
+                    c.execute("DELETE FROM sync_failed_assets WHERE asset_id=?", (asset_id,))
+                    conn.commit()
+                    continue
+                seen_asset_ids.add(asset_id)
+                stats["total_found"] += 1
+                yield asset, bf_id, True
+
+        def pending_items():
+            """Yields only assets that still need work (dedup checks run here)."""
+            for batch in _batched(listed_assets(), 100):
+                # Bulk dedup per page-sized batch: one vector-DB lookup for the
+                # batch instead of one round-trip per asset
+                candidate_sources = [
+                    f"https://brandfolder.com/workbench/{asset['id']}"
+                    for asset, _, _ in batch if asset["id"] not in indexed
+                ]
+                in_vector_db = _sources_in_vector_db(c, rag, candidate_sources, known=known_sources)
+                known_sources.update(in_vector_db)
+
+                for asset, bf_id, modified in batch:
+                    item = _queue_asset(asset, bf_id, modified, in_vector_db)
+                    if item is not None:
+                        yield item
+
+        def _queue_asset(asset, bf_id, modified, in_vector_db) -> Optional[SyncItem]:
+            """Dedup checks for one asset; returns the SyncItem to process, or None to skip."""
             info = bf_api.extract_asset_info(asset)
             asset_id = info["id"]
             name = info["name"]
 
             # --- DEDUPLICATION CHECK 1: Local SQLite ---
-            if _asset_already_indexed(c, asset_id):
+            # (an asset modified since it was indexed is re-indexed instead)
+            already_indexed = asset_id in indexed
+            indexed_stamp = indexed.get(asset_id)
+            if already_indexed and parse_timestamp(indexed_stamp) is not None:
+                # Listed again (watermark kept, or a retry) but unchanged since indexed: skip
+                modified = _newest(indexed_stamp, info["updated_at"]) != indexed_stamp
+            replace = modified and already_indexed
+            if asset_id in retry_ids and not modified and already_indexed:
+                # Indexed since it failed (e.g. by a research session): stop retrying it
+                c.execute("DELETE FROM sync_failed_assets WHERE asset_id=?", (asset_id,))
+                conn.commit()
+            if not modified and already_indexed:
                 print(f"⏭️  [AutoSync] Skipping (already indexed): {name}")
-                stats["skipped"] += 1
-                continue
+                workers._count("skipped")
+                return None
 
             # Determine asset type & URL
             asset_type = "document"
@@ -176,116 +697,81 @@ def full_sync():
             source_link = f"https://brandfolder.com/workbench/{asset_id}"
 
             # --- DEDUPLICATION CHECK 2: Supabase Vector DB ---
-            if rag.document_exists(source_link):
+            if modified and not replace:
+                replace = source_link in in_vector_db
+            elif not modified and source_link in in_vector_db:
                 print(f"⏭️  [AutoSync] Skipping (already in vector DB): {name}")
                 # Mark as indexed in SQLite so future syncs are faster
                 c.execute(
-                    "INSERT OR IGNORE INTO research_assets (session_id, asset_id, name, type, url, status) VALUES (?,?,?,?,?,?)",
-                    (session_id, asset_id, name, asset_type, url, "indexed")
+                    "INSERT OR IGNORE INTO research_assets (session_id, asset_id, name, type, url, status, source_updated_at) "
+                    "VALUES (?,?,?,?,?,?,?)",
+                    (session_id, asset_id, name, asset_type, url, "indexed", info["updated_at"])
                 )
                 conn.commit()
-                stats["skipped"] += 1
-                continue
+                workers._count("skipped")
+                return None
 
-            # --- PROCESS NEW ASSET ---
-            try:
+            # --- QUEUE NEW (OR RESUMED) ASSET ---
+            row_id = _pending_asset_row(c, asset_id)
+            if row_id is None:
                 # Insert into DB with 'pending' status first
                 c.execute(
                     "INSERT INTO research_assets (session_id, asset_id, name, type, url, status) VALUES (?,?,?,?,?,?)",
                     (session_id, asset_id, name, asset_type, url, "pending")
                 )
                 conn.commit()
-                asset_row_id = c.lastrowid
-
-                content = f"Asset: {name}\nType: {asset_type}"
-
-                if asset_type in ["video", "audio", "document", "image"]:
-                    try:
-                        fresh_details = bf_api.get_asset_details(asset_id)
-                        fresh_info = bf_api.extract_asset_info(fresh_details)
-
-                        fresh_url = None
-                        fresh_mime = ""
-                        for att in fresh_info["attachments"]:
-                            mimetype = att.get("mimetype") or ""
-                            if asset_type == "video" and "video" in mimetype:
-                                fresh_url = att.get("url"); fresh_mime = mimetype
-                                break
-                            if asset_type == "audio" and "audio" in mimetype:
-                                fresh_url = att.get("url"); fresh_mime = mimetype
-                                break
-                            if asset_type == "image" and "image" in mimetype:
-                                fresh_url = att.get("url"); fresh_mime = mimetype
-                                break
-                            if asset_type == "document" and any(x in mimetype for x in ["pdf", "document", "text"]):
-                                fresh_url = att.get("url"); fresh_mime = mimetype
-                                break
-
-                        # Fallback to first attachment for documents/images
-                        if not fresh_url and asset_type in ("document", "image") and fresh_info["attachments"]:
-                            fresh_url = fresh_info["attachments"][0].get("url")
-                            fresh_mime = fresh_info["attachments"][0].get("mimetype") or ""
-
-                        if fresh_url and fresh_url.startswith("http"):
-                            local_path = bf_api.download_attachment(fresh_url)
-                            if local_path:
-                                if asset_type in ["video", "audio"]:
-                                    mime = "video/mp4" if asset_type == "video" else "audio/mp3"
-                                    transcript = media_service.transcribe_media(local_path, mime_type=mime)
-                                    content += f"\n\n--- TRANSCRIPT ---\n{transcript}"
-                                elif asset_type == "image":
-                                    caption = media_service.describe_image(
-                                        local_path, mime_type=(fresh_mime or "image/jpeg")
-                                    )
-                                    content += f"\n\n--- DESCRIPCIÓN DE LA IMAGEN (IA) ---\n{caption}"
-                                elif asset_type == "document":
-                                    import pypdf
-                                    try:
-                                        reader = pypdf.PdfReader(local_path)
-                                        pdf_text = ""
-                                        for page in reader.pages:
-                                            extracted = page.extract_text()
-                                            if extracted:
-                                                pdf_text += extracted + "\n"
-                                        if pdf_text.strip():
-                                            content += f"\n\n--- DOCUMENT TEXT ---\n{pdf_text}"
-                                    except Exception as e:
-                                        print(f"⚠️  PDF parse error for {name}: {e}")
-                                os.remove(local_path)
-                    except Exception as e:
-                        print(f"⚠️  [AutoSync] Media processing failed for {name}: {e}")
-                        content += f"\n\n[Extraction Failed: {e}]"
-
-                # Index to Vector DB
-                rag.add_document(content, source_link, title=name)
-
-                # Mark as indexed in DB
-                c.execute(
-                    "UPDATE research_assets SET status='indexed', content=? WHERE id=?",
-                    (content, asset_row_id)
-                )
-                conn.commit()
-                stats["new_indexed"] += 1
-                print(f"✅ [AutoSync] Indexed: {name}")
-
-            except Exception as e:
-                print(f"❌ [AutoSync] Failed to process {name}: {e}")
-                stats["failed"] += 1
-
-        # 5. Mark session and log as completed
+                row_id = c.lastrowid
+
+            item = SyncItem(
+                asset_id=asset_id,
+                name=name,
+                asset_type=asset_type,
+                source_link=source_link,
+                row_id=row_id,
+                brandfolder_id=bf_id,
+                replace=replace,
+                content=_load_checkpoint(c, asset_id),
+                updated_at=info["updated_at"],
+            )
+            if item.content is not None:
+                print(f"♻️  [AutoSync] Resuming from checkpoint: {name}")
+            return item
+
+        # 4. Process assets through the bounded worker pool
+        pipeline = StagePipeline(
+            [
+                Stage("metadata", workers.metadata, settings.sync_metadata_workers),
+                Stage("download", workers.download, settings.sync_download_workers),
+                Stage("extract", workers.extract, settings.sync_extract_workers),
+                Stage("embed", workers.embed, settings.sync_embed_workers),
+                Stage("write", workers.write, settings.sync_write_workers),
+            ],
+            on_error=workers.on_error,
+        )
+        pipeline.run(pending_items())
+        print(f"✅ [AutoSync] Found {stats['total_found']} unique assets across all Brandfolders.")
+
+        # 5. Mark session and log as completed (with the advanced watermarks)
+        watermarks = _advance_watermarks(
+            previous_marks,
+            {bf_id: [stamp] for bf_id, stamp in newest_stamp.items()},
+            workers.failed_brandfolders,
+        )
         c.execute("UPDATE research_sessions SET status='completed' WHERE id=?", (session_id,))
         c.execute(
             """UPDATE sync_log 
                SET status='completed', completed_at=CURRENT_TIMESTAMP,
-                   new_indexed=?, skipped=?, failed=?
+                   total_found=?, new_indexed=?, skipped=?, failed=?, watermarks=?
                WHERE id=?""",
-            (stats["new_indexed"], stats["skipped"], stats["failed"], log_id)
+            (stats["total_found"], stats["new_indexed"], stats["skipped"], stats["failed"],
+             json.dumps(watermarks), log_id)
         )
         conn.commit()
         print(
             f"🎉 [AutoSync] Sync complete! New: {stats['new_indexed']} | "
             f"Skipped: {stats['skipped']} | Failed: {stats['failed']}"
         )
+        print(f"🌐 [AutoSync] Outbound HTTP: {http_metrics.snapshot()}")
 
     except Exception as e:
         print(f"💥 [AutoSync] CRITICAL ERROR: {e}")
@@ -300,6 +786,22 @@ def full_sync():
         _sync_running = False
 
 
+def resume_interrupted_sync() -> bool:
+    """
+    Restarts a sync whose container died mid-run (its sync_log row is still
+    'running'). Checkpointed assets skip straight to embedding. Returns True
+    if a resume was started.
+    """
+    if _sync_running:
+        return False
+    status = get_last_sync_status()
+    if status.get("status") != "running":
+        return False
+    print(f"♻️  [AutoSync] Found interrupted sync #{status.get('id')}. Resuming...")
+    full_sync()
+    return True
+
+
 def get_last_sync_status() -> dict:
     """Returns the status of the last completed or running sync."""
     _init_sync_log_table()
@@ -0,0 +1,320 @@
+"""
+transcription_queue.py - Durable transcription jobs for MediaService.
+
+Transcribing a sermon means: upload to Gemini, wait for server-side
+processing, then generate. Instead of each caller doing that inline, jobs
+go into a SQLite-backed queue (next to irresistible_app.db) and a shared
+worker pool runs them, so uploads, processing waits and generation of
+different files overlap.
+
+  - States: queued → preprocessing → uploading → processing → generating
+    → completed | failed. Long recordings are split into windows
+    (media_preprocess.py) and sit in `transcribing` while those run in
+    parallel; if only some windows fail the job completes with a partial,
+    uncached transcript and the gap noted in `error`.
+  - Results are cached by content fingerprint (media_preprocess.media_fingerprint):
+    the same media is never transcribed twice, whichever asset or upload it
+    arrives through.
+  - Failures are typed (core.exceptions.TranscriptionError subclasses) and
+    recorded with the job; they are raised to the caller, never returned as
+    text that could end up indexed in RAG.
+  - Jobs interrupted by a restart are picked up again by `recover()` when
+    their file still exists.
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.exceptions import (
+    MediaProcessingFailed,
+    MediaProcessingTimeout,
+    MediaUploadError,
+    TranscriptGenerationError,
+    TranscriptionError,
+)
+from .media_preprocess import (
+    Segment, cleanup_segments, format_timestamp, media_fingerprint, prepare_segments, stitch_windows,
+)
+
+logger = logging.getLogger(__name__)
+
+# Same volume as the app DB (see research_service.py / sync_service.py)
+if os.path.exists("/app/brain_data"):
+    TRANSCRIPTION_DB_PATH = "/app/brain_data/transcription_jobs.db"
+else:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    TRANSCRIPTION_DB_PATH = os.path.abspath(os.path.join(current_dir, "../../..", "transcription_jobs.db"))
+
+ACTIVE_STATES = ("queued", "preprocessing", "uploading", "processing", "generating", "transcribing")
+
+_ERROR_TYPES = {
+    cls.__name__: cls
+    for cls in (
+        TranscriptionError, MediaUploadError, MediaProcessingTimeout,
+        MediaProcessingFailed, TranscriptGenerationError,
+    )
+}
+
+
+class TranscriptionQueue:
+    """SQLite-backed job table + worker pool."""
+
+    def __init__(self, path: str = TRANSCRIPTION_DB_PATH, workers: int = None):
+        self.path = path
+        self.workers = workers or settings.transcription_workers
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._inflight_by_hash: Dict[str, str] = {}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transcription_jobs (
+                    id TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    file_path TEXT,
+                    mime_type TEXT,
+                    state TEXT DEFAULT 'queued',  -- queued, preprocessing, uploading, processing, generating, transcribing, completed, failed
+                    attempts INTEGER DEFAULT 0,
+                    error_type TEXT,
+                    error TEXT,
+                    result TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_transcription_jobs_state ON transcription_jobs (state)")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transcript_cache (
+                    content_hash TEXT PRIMARY KEY,
+                    transcript TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transcribe")
+        return self._executor
+
+    def _set_state(self, job_id: str, state: str, **fields):
+        columns = ", ".join(f"{k}=?" for k in fields)
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                f"UPDATE transcription_jobs SET state=?, updated_at=CURRENT_TIMESTAMP"
+                f"{', ' + columns if columns else ''} WHERE id=?",
+                (state, *fields.values(), job_id)
+            )
+            conn.commit()
+
+    @staticmethod
+    def _trim_cache(conn: sqlite3.Connection):
+        """Keeps the newest settings.transcript_cache_max_entries transcripts (caller holds the lock)."""
+        conn.execute(
+            "DELETE FROM transcript_cache WHERE content_hash NOT IN "
+            "(SELECT content_hash FROM transcript_cache ORDER BY created_at DESC, rowid DESC LIMIT ?)",
+            (settings.transcript_cache_max_entries,)
+        )
+
+    # ── Public API ───────────────────────────────────────────────
+
+    def cached_transcript(self, content_hash: str) -> Optional[str]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT transcript FROM transcript_cache WHERE content_hash=?", (content_hash,)
+            ).fetchone()
+        return row["transcript"] if row else None
+
+    def submit(self, file_path: str, mime_type: str, media_service=None, content_hash: str = None) -> str:
+        """Queues a file for transcription; returns the job id (cached/in-flight content is shared)."""
+        content_hash = content_hash or media_fingerprint(file_path)
+        cached = self.cached_transcript(content_hash)
+
+        with self._lock:
+            if cached is None and content_hash in self._inflight_by_hash:
+                # Same bytes already being transcribed: wait on that job
+                return self._inflight_by_hash[content_hash]
+
+            job_id = str(uuid.uuid4())
+            conn = self._db()
+            conn.execute(
+                "INSERT INTO transcription_jobs (id, content_hash, file_path, mime_type, state, result) "
+                "VALUES (?,?,?,?,?,?)",
+                (job_id, content_hash, file_path, mime_type,
+                 "completed" if cached is not None else "queued", cached)
+            )
+            conn.commit()
+            if cached is None:
+                self._inflight_by_hash[content_hash] = job_id
+                self._futures[job_id] = self._pool().submit(self._run, job_id, media_service)
+
+        if cached is not None:
+            print(f"♻️ Transcript cache hit for {os.path.basename(file_path)}")
+        return job_id
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM transcription_jobs WHERE id=?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def wait(self, job_id: str, timeout: float = None) -> str:
+        """Blocks until the job finishes; returns the transcript or raises its typed failure."""
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        else:
+            deadline = time.monotonic() + timeout if timeout else None
+            while (self.status(job_id) or {}).get("state") in ACTIVE_STATES:
+                if deadline and time.monotonic() > deadline:
+                    raise TimeoutError(f"Transcription job {job_id} still running")
+                time.sleep(1)
+
+        job = self.status(job_id)
+        if job is None:
+            raise TranscriptionError(f"Unknown transcription job {job_id}")
+        if job["state"] != "completed":
+            raise _ERROR_TYPES.get(job["error_type"], TranscriptionError)(job["error"] or "Transcription failed")
+        return job["result"]
+
+    def transcribe(self, file_path: str, mime_type: str, media_service=None) -> str:
+        """submit + wait."""
+        return self.wait(self.submit(file_path, mime_type, media_service=media_service))
+
+    def recover(self) -> int:
+        """Re-queues jobs interrupted by a restart (if their file is still on disk)."""
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT id, file_path FROM transcription_jobs WHERE state IN ({','.join('?' * len(ACTIVE_STATES))})",
+                ACTIVE_STATES
+            ).fetchall()
+        resumed = 0
+        for row in rows:
+            if row["id"] in self._futures:
+                continue
+            if row["file_path"] and os.path.exists(row["file_path"]):
+                self._set_state(row["id"], "queued")
+                self._futures[row["id"]] = self._pool().submit(self._run, row["id"], None)
+                resumed += 1
+            else:
+                self._set_state(row["id"], "failed", error_type="TranscriptionError",
+                                error="Interrupted by restart; media file no longer available")
+        if rows:
+            logger.info(f"Transcription queue recovered {resumed}/{len(rows)} interrupted jobs")
+        return resumed
+
+    # ── Worker ───────────────────────────────────────────────────
+
+    def _run(self, job_id: str, media_service=None):
+        job = self.status(job_id)
+        if job is None:
+            # Row gone (database reset under a queued job): nothing to run
+            logger.warning(f"Transcription job {job_id} not found; skipping")
+            with self._lock:
+                self._futures.pop(job_id, None)
+            return
+        segments = []
+        try:
+            if media_service is None:
+                from .media_service import MediaService
+                media_service = MediaService()
+
+            with self._lock:
+                self._db().execute("UPDATE transcription_jobs SET attempts=attempts+1 WHERE id=?", (job_id,))
+                self._db().commit()
+
+            self._set_state(job_id, "preprocessing")
+            segments = prepare_segments(job["file_path"], job["mime_type"])
+
+            note = None
+            if len(segments) == 1:
+                transcript = self._transcribe_segment(media_service, segments[0], job_id=job_id)
+            else:
+                self._set_state(job_id, "transcribing")
+                transcript, failures = self._transcribe_windows(media_service, segments)
+                if failures:
+                    note = f"{failures} of {len(segments)} windows failed"
+
+            if note is None:
+                with self._lock:
+                    conn = self._db()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO transcript_cache (content_hash, transcript) VALUES (?, ?)",
+                        (job["content_hash"], transcript)
+                    )
+                    self._trim_cache(conn)
+                    conn.commit()
+            else:
+                # Partial transcripts are returned but not cached, so the next run retries the gaps
+                print(f"⚠️ Partial transcript for {os.path.basename(job['file_path'])}: {note}")
+            self._set_state(job_id, "completed", result=transcript, error=note)
+        except TranscriptionError as e:
+            print(f"❌ Transcription error: {e}")
+            self._set_state(job_id, "failed", error_type=type(e).__name__, error=str(e))
+        except Exception as e:
+            print(f"❌ Transcription error: {e}")
+            self._set_state(job_id, "failed", error_type="TranscriptionError", error=str(e))
+        finally:
+            cleanup_segments(segments)
+            with self._lock:
+                if self._inflight_by_hash.get(job["content_hash"]) == job_id:
+                    del self._inflight_by_hash[job["content_hash"]]
+                self._futures.pop(job_id, None)
+
+    def _transcribe_segment(self, media_service, segment: Segment, job_id: str = None, timestamped: bool = False) -> str:
+        """upload → wait for processing → generate for one file (job state tracked when `job_id` is given)."""
+        media_file = None
+        try:
+            if job_id:
+                self._set_state(job_id, "uploading")
+            media_file = media_service.upload_media(segment.path, segment.mime_type)
+
+            if job_id:
+                self._set_state(job_id, "processing")
+            media_file = media_service.wait_until_active(media_file)
+
+            if job_id:
+                self._set_state(job_id, "generating")
+            return media_service.generate_transcript(media_file, timestamped=timestamped)
+        finally:
+            if media_file is not None:
+                media_service.delete_remote(media_file)
+
+    def _transcribe_windows(self, media_service, segments: List[Segment]) -> Tuple[str, int]:
+        """Transcribes windows in parallel (one retry each) and stitches them; returns (transcript, failures)."""
+        def transcribe(segment: Segment):
+            error = None
+            for _ in range(2):
+                try:
+                    return self._transcribe_segment(media_service, segment, timestamped=True), None
+                except Exception as e:
+                    error = e
+            print(f"⚠️ Window {format_timestamp(segment.start)} failed: {error}")
+            return None, error
+
+        with ThreadPoolExecutor(max_workers=settings.transcription_window_workers,
+                                thread_name_prefix="transcribe-window") as pool:
+            results = list(pool.map(transcribe, segments))
+
+        errors = [error for _, error in results if error is not None]
+        if len(errors) == len(segments):
+            first = errors[0]
+            raise first if isinstance(first, TranscriptionError) else TranscriptionError(str(first))
+        return stitch_windows([(segment, text) for segment, (text, _) in zip(segments, results)]), len(errors)
+
+transcription_queue = TranscriptionQueue()
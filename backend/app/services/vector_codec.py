@@ -0,0 +1,51 @@
+"""
+vector_codec.py - Compact wire encoding for embedding vectors.
+
+PostgREST only speaks JSON, so a 3072-dim vector sent as a list of floats is
+~60 KB of text. With settings.embedding_wire_format set to "float32" or
+"float16", chunk embeddings travel as base64 of big-endian IEEE floats
+(~16 KB / ~8 KB) and are decoded server-side by public.decode_embedding
+(supabase_migrations/005_compact_vectors.sql). "json" keeps plain lists.
+
+Big-endian matches Postgres' float4send, which document_chunk_vectors uses to
+return stored vectors in the same float32 encoding.
+"""
+
+import base64
+import math
+import struct
+from typing import List, Sequence, Union
+
+WIRE_FORMATS = {"json": None, "float32": "f", "float16": "e"}
+
+# Approximate JSON bytes per dimension, for sizing insert batches
+BYTES_PER_DIMENSION = {"json": 20, "float32": 6, "float16": 3}
+
+
+def check_format(wire_format: str) -> str:
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Unknown embedding wire format {wire_format!r} (expected one of {', '.join(WIRE_FORMATS)})")
+    return wire_format
+
+
+def encode_vector(vector: Sequence[float], wire_format: str) -> Union[List[float], str]:
+    """The vector as it is sent to Supabase: a list for "json", base64 otherwise."""
+    code = WIRE_FORMATS[check_format(wire_format)]
+    if code is None:
+        return list(vector)
+    return base64.b64encode(struct.pack(f">{len(vector)}{code}", *vector)).decode("ascii")
+
+
+def decode_vector(value: Union[str, bytes], wire_format: str) -> List[float]:
+    """Inverse of encode_vector for the base64 formats."""
+    code = WIRE_FORMATS[check_format(wire_format)]
+    if code is None:
+        raise ValueError("decode_vector only handles binary formats")
+    raw = base64.b64decode(value)  # ignores the newlines Postgres' encode() inserts
+    return list(struct.unpack(f">{len(raw) // struct.calcsize(code)}{code}", raw))
+
+
+def l2_normalize(vector: Sequence[float]) -> List[float]:
+    """Unit-length copy. Gemini only normalizes full-size embeddings; truncated ones need this."""
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else list(vector)
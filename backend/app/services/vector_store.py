@@ -1,155 +1,334 @@
 import os
+import json
+import time
+import base64
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
+from google.genai import types
 from .supabase_service import supabase_service
-from typing import List, Dict, Optional
+from .embedding_cache import embedding_cache, normalize_text
+from .local_index import local_index
+from .chunker import TokenChunker
+from .document_writer import STAGING_PREFIX, SupabaseDocumentWriter, _is_missing_function
+from .vector_codec import l2_normalize
+from .lexical_index import lexical_index
+from typing import Dict, Iterable, List, Optional, Tuple
 import uuid
 
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Shared pool for embedding batches so concurrent ingests don't each spawn threads.
+_embed_executor = ThreadPoolExecutor(max_workers=max(1, settings.embedding_max_concurrency))
+
+
+class SearchResultCache:
+    """
+    TTL + LRU cache of formatted search_similar results, keyed on the
+    normalized query, limit and threshold. Cleared whenever the knowledge
+    base changes (ingest or delete) so stale context is never served.
+    Per-process: each uvicorn worker keeps its own copy.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a search that started before an
+        # ingest can't write its (now stale) result back into the cache.
+        self.generation = 0
+
+    @staticmethod
+    def make_key(query: str, limit: int, threshold: float, mode: str = "vector") -> tuple:
+        return (normalize_text(query).lower(), limit, round(threshold, 4), mode)
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value: str, generation: int):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+
+search_cache = SearchResultCache(
+    ttl=settings.search_cache_ttl_seconds,
+    max_entries=settings.search_cache_max_entries,
+)
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], limit: int, k: int = 60) -> List[Dict]:
+    """
+    Fuses ranked result lists: score(chunk) = sum(1 / (k + rank)) over every
+    list it appears in. Chunks are identified by (document_id, content).
+    """
+    scores: Dict[tuple, float] = {}
+    items: Dict[tuple, Dict] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            key = (item["document_id"], item["content"])
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(key, item)
+    best = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [items[key] for key in best]
+
+
+# /knowledge/documents filters ("all" lists every published document)
+SOURCE_TYPES = ("direct", "brandfolder", "web")
+_LIST_COLUMNS = "id, title, source, doc_type, created_at, updated_at"
+
+
+def _is_missing_column(error: Exception) -> bool:
+    """Postgres undefined_column (supabase_migrations/006 not applied)."""
+    return getattr(error, "code", None) == "42703" or "does not exist" in str(error)
+
+
+def encode_cursor(row: Dict) -> str:
+    """Opaque keyset cursor for the row a page ended on."""
+    raw = json.dumps([row["created_at"], str(row["id"])]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(created_at, id) from encode_cursor. Raises ValueError for anything else."""
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(created_at), str(doc_id)
+
+
 class VectorStoreService:
+    # Whether documents has the chunk_count / source_type columns (None = not checked yet)
+    _listing_columns: Optional[bool] = None
+    # Whether match_published_documents (migration 007) exists (None = not checked yet)
+    _published_match: Optional[bool] = None
+
     def __init__(self):
         self.supabase = supabase_service.get_client()
+        self.local_index = local_index if settings.vector_backend == "local" else None
         if settings.google_api_key:
             self.client = genai.Client(api_key=settings.google_api_key)
             self.embedding_model = settings.gemini_embedding_model
         else:
             self.client = None
 
-    def embed_text(self, text: str) -> List[float]:
-        """Generate embedding vector for text using Gemini."""
-        if not self.client:
-            logger.warning("GOOGLE_API_KEY not found for embeddings")
-            return []
+    @property
+    def writer(self) -> SupabaseDocumentWriter:
+        """Batched/atomic writer for documents + document_chunks (created on first write)."""
+        if getattr(self, "_writer", None) is None or self._writer.client is not self.supabase:
+            self._writer = SupabaseDocumentWriter(self.supabase)
+        return self._writer
+
+    @property
+    def cache_namespace(self) -> str:
+        """Embedding-cache model key; vectors of different sizes never mix."""
+        dims = settings.embedding_output_dimensionality
+        return f"{self.embedding_model}@{dims}" if dims else self.embedding_model
+
+    @staticmethod
+    def _embed_options() -> Dict:
+        """embed_content kwargs for settings.embedding_output_dimensionality (none at the model default)."""
+        if not settings.embedding_output_dimensionality:
+            return {}
+        return {"config": types.EmbedContentConfig(output_dimensionality=settings.embedding_output_dimensionality)}
 
+    @staticmethod
+    def _finish_vector(values) -> List[float]:
+        # Reduced-size Gemini embeddings come back unnormalized
+        if values and settings.embedding_output_dimensionality:
+            return l2_normalize(values)
+        return values
+
+    def _embed_single(self, text: str, log_label: str = "text") -> List[float]:
+        """One uncached embed_content call. Returns [] on failure."""
         try:
             response = self.client.models.embed_content(
                 model=self.embedding_model,
-                contents=text
+                contents=text,
+                **self._embed_options()
             )
             if not response or not response.embeddings:
-                logger.warning("No embeddings returned for text")
+                logger.warning(f"No embeddings returned for {log_label}")
                 return []
-            return response.embeddings[0].values
+            return self._finish_vector(response.embeddings[0].values)
         except Exception as e:
-            logger.error(f"Error embedding text: {e}")
+            logger.error(f"Error embedding {log_label}: {e}")
             return []
 
+    def _cached_embed(self, text: str, log_label: str) -> List[float]:
+        """Embed a single text, consulting the persistent embedding cache first."""
+        if settings.embedding_cache_enabled:
+            cached = embedding_cache.get(self.cache_namespace, text)
+            if cached:
+                return cached
+
+        vector = self._embed_single(text, log_label)
+        if vector and settings.embedding_cache_enabled:
+            embedding_cache.put(self.cache_namespace, text, vector)
+        return vector
+
+    def embed_text(self, text: str) -> List[float]:
+        """Generate embedding vector for text using Gemini."""
+        if not self.client:
+            logger.warning("GOOGLE_API_KEY not found for embeddings")
+            return []
+        return self._cached_embed(text, "text")
+
     def embed_query(self, text: str) -> List[float]:
         """Generate embedding vector for query using Gemini."""
         if not self.client:
             return []
+        return self._cached_embed(text, "query")
 
-        try:
-            response = self.client.models.embed_content(
-                model=self.embedding_model,
-                contents=text
-            )
-            if not response or not response.embeddings:
-                 return []
-            return response.embeddings[0].values
-        except Exception as e:
-            logger.error(f"Error embedding query: {e}")
-            return []
+    def _embed_batch_once(self, texts: List[str]) -> List[List[float]]:
+        """Single embed_content call for a list of texts. Raises on failure."""
+        response = self.client.models.embed_content(
+            model=self.embedding_model,
+            contents=texts,
+            **self._embed_options()
+        )
+        if not response or not response.embeddings or len(response.embeddings) != len(texts):
+            raise ValueError("Embedding batch returned a mismatched number of vectors")
+        return [self._finish_vector(e.values) for e in response.embeddings]
 
-    @staticmethod
-    def _chunk_text(content: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
+    def _embed_batch_with_retry(self, texts: List[str]) -> List[List[float]]:
         """
-        Split text into overlapping chunks on natural boundaries (paragraphs,
-        then sentences) so chunks don't cut sentences mid-word. Falls back to
-        a hard character split only for oversized paragraphs.
+        Embed one batch, retrying with backoff. If the batch keeps failing
+        (e.g. one malformed chunk poisons the request) fall back to embedding
+        each text on its own so only the bad chunk is lost.
         """
-        import re
+        attempts = max(1, settings.embedding_max_retries)
+        for attempt in range(1, attempts + 1):
+            try:
+                return self._embed_batch_once(texts)
+            except Exception as e:
+                logger.warning(f"Embedding batch of {len(texts)} failed (attempt {attempt}/{attempts}): {e}")
+                if attempt < attempts:
+                    time.sleep(1.5 * attempt)
+
+        if len(texts) == 1:
+            return [[]]
+        logger.warning(f"Falling back to per-chunk embedding for batch of {len(texts)}")
+        return [self._embed_single(t) for t in texts]
 
-        content = (content or "").strip()
-        if not content:
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for many texts using batched embed_content calls.
+        Batches run concurrently (bounded by settings.embedding_max_concurrency).
+        Returns one vector per input, in order; failed inputs get an empty list.
+        """
+        if not texts:
             return []
+        if not self.client:
+            logger.warning("GOOGLE_API_KEY not found for embeddings")
+            return [[] for _ in texts]
 
-        # Break into paragraphs first, then sentences for oversized ones.
-        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", content) if p.strip()]
-        units: List[str] = []
-        for para in paragraphs:
-            if len(para) <= chunk_size:
-                units.append(para)
-            else:
-                # Split big paragraphs by sentence boundaries
-                sentences = re.split(r"(?<=[.!?])\s+", para)
-                buf = ""
-                for s in sentences:
-                    if len(buf) + len(s) + 1 <= chunk_size:
-                        buf = f"{buf} {s}".strip()
-                    else:
-                        if buf:
-                            units.append(buf)
-                        # A single sentence longer than chunk_size: hard split
-                        while len(s) > chunk_size:
-                            units.append(s[:chunk_size])
-                            s = s[chunk_size:]
-                        buf = s
-                if buf:
-                    units.append(buf)
-
-        # Greedily pack units into chunks with overlap carried between them.
-        chunks: List[str] = []
-        current = ""
-        for unit in units:
-            if len(current) + len(unit) + 2 <= chunk_size:
-                current = f"{current}\n\n{unit}".strip()
-            else:
-                if current:
-                    chunks.append(current)
-                    # Carry the tail of the previous chunk as overlap for continuity
-                    tail = current[-overlap:] if overlap else ""
-                    current = f"{tail}\n\n{unit}".strip() if tail else unit
-                else:
-                    current = unit
-        if current:
-            chunks.append(current)
+        vectors: List[List[float]] = [[] for _ in texts]
+        pending = list(range(len(texts)))
+        if settings.embedding_cache_enabled:
+            hits = embedding_cache.get_many(self.cache_namespace, texts)
+            for i, vector in hits.items():
+                vectors[i] = vector
+            pending = [i for i in pending if i not in hits]
+            if hits:
+                logger.info(f"Embedding cache: {len(hits)}/{len(texts)} chunks reused")
+        if not pending:
+            return vectors
+
+        misses = [texts[i] for i in pending]
+        size = max(1, settings.embedding_batch_size)
+        batches = [misses[i:i + size] for i in range(0, len(misses), size)]
+        if len(batches) == 1:
+            fresh = self._embed_batch_with_retry(batches[0])
+        else:
+            fresh = []
+            for result in _embed_executor.map(self._embed_batch_with_retry, batches):
+                fresh.extend(result)
 
-        return chunks
+        for i, vector in zip(pending, fresh):
+            vectors[i] = vector
+        if settings.embedding_cache_enabled:
+            embedding_cache.put_many(self.cache_namespace, misses, fresh)
+        return vectors
 
-    def store_document(self, content: str, source: str, title: str = None, metadata: Dict = None) -> bool:
+    def prepare_chunks(self, content: str = None, pages: Iterable[str] = None) -> List[Tuple[str, List[float]]]:
         """
-        Stores a document and its vectors in Supabase.
+        Chunks and embeds content without writing anything. Lets pipelined
+        callers (sync) run embedding as its own stage and hand the result to
+        store_document(prepared=...). `pages` (e.g. a PDF page stream) is
+        chunked as it is read instead of being joined into one string first.
         """
-        if not self.supabase:
+        chunker = TokenChunker()
+        chunks = list(chunker.chunk_pages(pages)) if pages is not None else chunker.chunk(content)
+        return list(zip(chunks, self.embed_batch(chunks)))
+
+    def store_document(
+        self,
+        content: str,
+        source: str,
+        title: str = None,
+        metadata: Dict = None,
+        prepared: Optional[List[Tuple[str, List[float]]]] = None,
+        replace: bool = False,
+    ) -> bool:
+        """
+        Stores a document and its vectors in Supabase (and in the local ANN
+        index when VECTOR_BACKEND=local; without Supabase only locally).
+        `prepared` is the output of prepare_chunks, if already computed.
+        With replace=True an existing document for `source` is swapped out
+        (old chunks are deleted only after the new ones are stored). The
+        Supabase write is all-or-nothing, see services/document_writer.py.
+        """
+        if not self.supabase and not self.local_index:
             logger.error("Supabase client not initialized")
             return False
 
         # 1. Check if exists
         try:
-            existing = self.supabase.table("documents").select("id").eq("source", source).execute()
-            if existing.data and len(existing.data) > 0:
+            if self.supabase:
+                existing = self.supabase.table("documents").select("id").eq("source", source).execute()
+                existing_ids = [row["id"] for row in (existing.data or [])]
+            else:
+                local_id = self.local_index.get_document_id(source)
+                existing_ids = [local_id] if local_id else []
+            if existing_ids and not replace:
                 logger.info(f"Document {source} already exists. Skipping.")
                 return False
         except Exception as e:
             logger.error(f"Error checking document existence: {e}")
             return False
 
-        # 2. Insert Document
+        # 2-3. Chunk (sentence-aware) and embed (batched calls), unless the caller
+        # already did. Nothing is written until every vector is in hand.
+        if prepared is None:
+            prepared = self.prepare_chunks(content)
         doc_id = str(uuid.uuid4())
-        try:
-            doc_data = {
-                "id": doc_id,
-                "source": source,
-                "title": title or "Untitled",
-                "doc_type": "text",
-                "metadata": metadata or {}
-            }
-            self.supabase.table("documents").insert(doc_data).execute()
-        except Exception as e:
-            logger.error(f"Error inserting document: {e}")
-            return False
-
-        # 3. Chunking (paragraph-aware: avoid cutting sentences mid-word)
-        chunks = self._chunk_text(content, chunk_size=1000, overlap=100)
-
-        # 4. Process Chunks
         vectors_data = []
-        for i, chunk_text in enumerate(chunks):
-            embedding = self.embed_text(chunk_text)
+        for i, (chunk_text, embedding) in enumerate(prepared):
             if embedding:
                 vectors_data.append({
                     "document_id": doc_id,
@@ -158,41 +337,285 @@ class VectorStoreService:
                     "chunk_index": i,
                     "metadata": metadata or {}
                 })
+        if not vectors_data:
+            # A document row without chunks would count as indexed forever
+            logger.warning(f"No embeddings produced for {source}; nothing stored")
+            return False
+
+        # 4-5. Document row + chunks in one transaction (batched for large documents)
+        if self.supabase:
+            doc_data = {
+                "id": doc_id,
+                "source": source,
+                "title": title or "Untitled",
+                "doc_type": "text",
+                "metadata": metadata or {}
+            }
+            if not self.writer.write(doc_data, vectors_data, replace=replace):
+                return False
 
-        # 5. Insert Vectors
+        # 6. Keep the BM25 index in step with document_chunks
         if vectors_data:
             try:
-                self.supabase.table("document_chunks").insert(vectors_data).execute()
-                logger.info(f"Stored {len(vectors_data)} chunks for {source}")
-                return True
+                lexical_index.add_document(doc_id, [(v["chunk_index"], v["content"]) for v in vectors_data])
             except Exception as e:
-                logger.error(f"Error inserting chunks for {source}: {e}")
-                return False
+                logger.error(f"Error adding {source} to lexical index: {e}")
+
+        # 7. Mirror into the local index (incremental add)
+        if self.local_index:
+            try:
+                self.local_index.add_document(
+                    doc_id, source, title or "Untitled",
+                    [(v["chunk_index"], v["content"], v["embedding"]) for v in vectors_data]
+                )
+            except Exception as e:
+                logger.error(f"Error adding {source} to local index: {e}")
+                if not self.supabase:
+                    return False
+
+        # 8. Drop the previous version of a replaced document
+        for old_id in existing_ids:
+            self.delete_document(old_id)
 
+        if vectors_data:
+            self.invalidate_search_cache()
         return True
 
-    def search_similar(self, query: str, limit: int = 5) -> str:
+    def stored_chunks(self, source: str, header: str = None) -> Optional[List[Tuple[str, List[float]]]]:
+        """
+        (content, embedding) pairs already stored for `source`, in chunk order -
+        the same shape as prepare_chunks, so identical content can be stored
+        under another source without embedding it again. None if not stored.
+
+        `header` replaces the first paragraph of the first chunk (the
+        "Asset:/Type:" lines naming the original asset); only that chunk is
+        embedded again.
+        """
+        chunks = None
+        try:
+            if self.supabase:
+                doc = self.supabase.table("documents").select("id").eq("source", source).limit(1).execute()
+                if not doc.data:
+                    return None
+                chunks = self.writer.read_chunks(doc.data[0]["id"])
+            elif self.local_index:
+                chunks = self.local_index.get_chunks(source)
+        except Exception as e:
+            logger.error(f"Error reading stored chunks for {source}: {e}")
+        if not chunks:
+            return None
+        if header is None:
+            return chunks
+
+        old_header, sep, body = chunks[0][0].partition("\n\n")
+        if not sep or not old_header.startswith("Asset:") or old_header == header:
+            return chunks
+        first = header + sep + body
+        embedding = self.embed_batch([first])[0]
+        if not embedding:
+            return None
+        return [(first, embedding)] + list(chunks[1:])
+
+    def list_documents(
+        self,
+        source_type: str = "all",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One page of documents (newest first) with their chunk_count, filtered
+        by source type in the database. Keyset pagination: pass the returned
+        cursor back for the next page (None after the last one). Staged
+        documents (see document_writer.py) are never listed.
+
+        Uses the chunk_count / source_type columns of migration 006; without
+        it, chunks are counted by an embedded count in the same request.
+        """
+        if not self.supabase:
+            return [], None
+        position = decode_cursor(cursor) if cursor else None
+
+        rows = None
+        if self._listing_columns is not False:
+            try:
+                rows = self._documents_page(True, source_type, limit, position)
+                self._listing_columns = True
+            except Exception as e:
+                if self._listing_columns or not _is_missing_column(e):
+                    raise
+                logger.warning("documents.chunk_count not found; apply supabase_migrations/006. Counting per request.")
+                self._listing_columns = False
+        if rows is None:
+            rows = self._documents_page(False, source_type, limit, position)
+            for row in rows:
+                counts = row.pop("document_chunks", None) or [{}]
+                row["chunk_count"] = counts[0].get("count", 0)
+
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    def _documents_page(self, denormalized: bool, source_type: str, limit: int, position) -> List[Dict]:
+        extra = "chunk_count" if denormalized else "document_chunks(count)"
+        query = self.supabase.table("documents").select(f"{_LIST_COLUMNS}, {extra}")
+
+        if denormalized:
+            if source_type in SOURCE_TYPES:
+                query = query.eq("source_type", source_type)
+            else:
+                query = query.neq("source_type", "staging")
+        else:
+            query = query.not_.like("source", "staging://%")
+            if source_type == "direct":
+                query = query.like("source", "file://%")
+            elif source_type == "brandfolder":
+                query = query.like("source", "%brandfolder.com%")
+            elif source_type == "web":
+                query = query.like("source", "http%").not_.like("source", "%brandfolder.com%")
+
+        if position:
+            created_at, doc_id = position
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{doc_id}")'
+            )
+        # One extra row tells whether another page exists
+        res = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+        return res.data or []
+
+    def existing_sources(self, sources: List[str], batch_size: int = 100) -> set:
+        """
+        Which of `sources` already have a document. One `in_` query per
+        batch instead of a round-trip per source (batches keep the URL short).
+        """
+        found = set()
+        unique = list(dict.fromkeys(s for s in sources if s))
+        if self.supabase:
+            for i in range(0, len(unique), batch_size):
+                part = unique[i:i + batch_size]
+                res = self.supabase.table("documents").select("source").in_("source", part).execute()
+                found.update(row["source"] for row in (res.data or []))
+        elif self.local_index:
+            found.update(s for s in unique if self.local_index.get_document_id(s))
+        return found
+
+    def delete_document(self, document_id: str) -> bool:
+        """Deletes a document and its chunks everywhere (Supabase, lexical, local index)."""
+        ok = True
+        if self.supabase:
+            try:
+                self.supabase.table("document_chunks").delete().eq("document_id", document_id).execute()
+                self.supabase.table("documents").delete().eq("id", document_id).execute()
+            except Exception as e:
+                logger.error(f"Error deleting document {document_id}: {e}")
+                ok = False
+        self.notify_document_deleted(document_id)
+        return ok
+
+    def invalidate_search_cache(self):
+        """Drops cached search results; call whenever documents are added or removed."""
+        search_cache.clear()
+
+    def notify_document_deleted(self, document_id: str):
+        """Hook for callers that delete a document in Supabase directly."""
+        try:
+            lexical_index.delete_document(document_id)
+        except Exception as e:
+            logger.error(f"Error removing {document_id} from lexical index: {e}")
+        if self.local_index:
+            try:
+                self.local_index.delete_document(document_id)
+            except Exception as e:
+                logger.error(f"Error removing {document_id} from local index: {e}")
+        self.invalidate_search_cache()
+
+    def _match(self, query_vector: List[float], limit: int, threshold: float) -> List[Dict]:
+        """Nearest chunks from the configured backend, shaped like match_documents rows."""
+        if self.local_index:
+            return self.local_index.search(query_vector, limit=limit, threshold=threshold)
+        params = {
+            "query_embedding": query_vector,
+            "match_threshold": threshold,
+            "match_count": limit
+        }
+        if self._published_match is not False:
+            try:
+                rows = self.supabase.rpc("match_published_documents", params).execute().data
+                self._published_match = True
+                return rows or []
+            except Exception as e:
+                if self._published_match or not _is_missing_function(e):
+                    raise
+                logger.warning("match_published_documents not found; apply supabase_migrations/007. Filtering staged documents per query.")
+                self._published_match = False
+        response = self.supabase.rpc("match_documents", params).execute()
+        return self._without_staged(response.data or [])
+
+    def _without_staged(self, rows: List[Dict]) -> List[Dict]:
+        """Drops chunks of documents still staged by the writer (not yet published)."""
+        ids = list({row["document_id"] for row in rows})
+        if not ids:
+            return rows
+        staged = self.supabase.table("documents").select("id").in_("id", ids) \
+            .like("source", f"{STAGING_PREFIX}%").execute().data or []
+        staged_ids = {row["id"] for row in staged}
+        return [row for row in rows if row["document_id"] not in staged_ids]
+
+    def search_similar(self, query: str, limit: int = 5, threshold: float = None, mode: str = None) -> str:
         """
         Searches for context relevant to the query.
         Returns formatted context string.
+
+        mode: "vector" (embedding similarity only) or "hybrid" (vector and
+        BM25 lexical rankings fused with reciprocal-rank fusion).
+        Defaults to settings.rag_search_mode. Hybrid falls back to vector
+        until the lexical index has been backfilled, so documents stored
+        before it existed are not outranked by the few it covers.
         """
-        if not self.supabase: return ""
+        if not self.supabase and not self.local_index: return ""
+
+        if threshold is None:
+            threshold = settings.rag_match_threshold
+        mode = mode or settings.rag_search_mode
+        if mode == "hybrid":
+            try:
+                if not lexical_index.is_backfilled():
+                    mode = "vector"
+            except Exception as e:
+                logger.warning(f"Lexical index unavailable, using vector search: {e}")
+                mode = "vector"
+
+        key = search_cache.make_key(query, limit, threshold, mode)
+        if settings.search_cache_enabled:
+            cached = search_cache.get(key)
+            if cached is not None:
+                return cached
+        generation = search_cache.generation
 
         query_vector = self.embed_query(query)
-        if not query_vector: return ""
+        if not query_vector and mode != "hybrid": return ""
 
         try:
-            response = self.supabase.rpc("match_documents", {
-                "query_embedding": query_vector,
-                "match_threshold": 0.5,
-                "match_count": limit
-            }).execute()
+            if mode == "hybrid":
+                pool = max(limit, settings.rag_hybrid_candidates)
+                vector_rows = self._match(query_vector, pool, threshold) if query_vector else []
+                try:
+                    lexical_rows = lexical_index.search(query, limit=pool)
+                except Exception as e:
+                    logger.warning(f"Lexical search failed, using vector results only: {e}")
+                    lexical_rows = []
+                matches = reciprocal_rank_fusion([vector_rows, lexical_rows], limit, k=settings.rag_rrf_k)
+            else:
+                matches = self._match(query_vector, limit, threshold)
 
-            if response.data:
+            result = ""
+            if matches:
                 context = []
-                for item in response.data:
+                for item in matches:
                     context.append(f"[Source: {item['document_id']}]\n{item['content']}")
-                return "\n\n".join(context)
+                result = "\n\n".join(context)
+
+            if settings.search_cache_enabled:
+                search_cache.put(key, result, generation)
+            return result
 
         except Exception as e:
             logger.error(f"Error searching vectors: {e}")
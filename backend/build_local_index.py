@@ -0,0 +1,39 @@
+"""
+Builds the local retrieval indexes from Supabase document_chunks:
+  - vector:  the local ANN index (VECTOR_BACKEND=local). Run once before
+             switching backends, or again to compact away tombstones.
+  - lexical: the BM25 index used by hybrid search (RAG_SEARCH_MODE=hybrid).
+
+    python build_local_index.py [vector|lexical|all]   (default: all)
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.supabase_service import supabase_service
+from app.services.local_index import local_index, LOCAL_INDEX_DIR
+from app.services.lexical_index import lexical_index, LEXICAL_DB_PATH
+
+
+def build(target: str = "all"):
+    client = supabase_service.get_client()
+    if not client:
+        print("❌ Supabase credentials missing; cannot read document_chunks.")
+        return
+    if target in ("vector", "all"):
+        print(f"📂 Building local index at: {LOCAL_INDEX_DIR}")
+        total = local_index.rebuild_from_supabase(client)
+        print(f"✅ Indexed {total} chunks ({local_index.count()} live).")
+    if target in ("lexical", "all"):
+        print(f"📂 Building lexical index at: {LEXICAL_DB_PATH}")
+        total = lexical_index.rebuild_from_supabase(client)
+        print(f"✅ Indexed {total} chunks for BM25.")
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else "all")
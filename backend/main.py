@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
+import threading
 import logging
 from dotenv import load_dotenv
 
@@ -41,7 +43,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Session-Id", "X-Session-Title"],
+    expose_headers=["X-Session-Id", "X-Session-Title", "Server-Timing"],
 )
 
 # --- Rate Limiting ---
@@ -67,7 +69,7 @@ def health_check():
     return {"status": "healthy"}
 
 # Include Routers
-from app.routers import auth, chat, brandfolder, magic, dojo, knowledge, sync, subscription, mcp, oauth_integration, church
+from app.routers import auth, chat, brandfolder, magic, dojo, knowledge, sync, subscription, mcp, oauth_integration, church, jobs
 
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
@@ -80,6 +82,7 @@ app.include_router(subscription.router, prefix="/subscription", tags=["Subscript
 app.include_router(mcp.router, prefix="/mcp", tags=["MCP Integrations"])
 app.include_router(oauth_integration.router, prefix="/oauth", tags=["OAuth Integrations"])
 app.include_router(church.router, prefix="/church", tags=["Church Profile"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Ingestion Jobs"])
 
 # ---------- MCP Registry Startup ----------
 @app.on_event("startup")
@@ -117,7 +120,7 @@ async def start_auto_sync_scheduler():
 
     try:
         from apscheduler.schedulers.background import BackgroundScheduler
-        from app.services.sync_service import full_sync
+        from app.services.sync_service import full_sync, resume_interrupted_sync
 
         scheduler = BackgroundScheduler(
             job_defaults={"misfire_grace_time": 3600}
@@ -130,7 +133,102 @@ async def start_auto_sync_scheduler():
             name="Brandfolder Full Library Sync",
             replace_existing=True
         )
+        # A sync killed by a crash/redeploy picks up from its checkpoints right away
+        scheduler.add_job(
+            func=resume_interrupted_sync,
+            id="resume_interrupted_sync",
+            name="Resume Interrupted Library Sync",
+            replace_existing=True
+        )
         scheduler.start()
         logger.info("Auto-sync scheduler started. Next run in 7 days.")
     except Exception as e:
         logger.error(f"Failed to start scheduler: {e}")
+
+
+# ---------- Transcription queue ----------
+@app.on_event("startup")
+async def recover_transcription_jobs():
+    """Re-queues transcription jobs a restart interrupted (their files permitting)."""
+    try:
+        from app.services.transcription_queue import transcription_queue
+        await asyncio.to_thread(transcription_queue.recover)
+    except Exception as e:
+        logger.warning(f"Transcription queue recovery failed (non-fatal): {e}")
+
+
+# ---------- Document writer ----------
+@app.on_event("startup")
+async def purge_staged_documents():
+    """Deletes staged documents a crashed writer left behind (see document_writer.py)."""
+    try:
+        from app.services.vector_store import vector_store
+
+        if vector_store.supabase:
+            await asyncio.to_thread(vector_store.writer.purge_staged)
+    except Exception as e:
+        logger.warning(f"Staged document purge failed (non-fatal): {e}")
+
+
+# ---------- Lexical index ----------
+@app.on_event("startup")
+async def backfill_lexical_index():
+    """
+    Builds the BM25 index from Supabase once, in the background. Hybrid
+    search stays vector-only until it completes (see lexical_index.py).
+    """
+    if settings.rag_search_mode != "hybrid":
+        return
+    try:
+        from app.services.lexical_index import lexical_index
+        from app.services.supabase_service import supabase_service
+
+        client = supabase_service.get_client()
+        if not client or await asyncio.to_thread(lexical_index.is_backfilled):
+            return
+        threading.Thread(
+            target=lexical_index.rebuild_from_supabase, args=(client,),
+            name="lexical-backfill", daemon=True,
+        ).start()
+        logger.info("Lexical index backfill started.")
+    except Exception as e:
+        logger.warning(f"Lexical index backfill failed to start (non-fatal): {e}")
+
+
+# ---------- Ingestion queue ----------
+@app.on_event("startup")
+async def start_ingestion_workers():
+    """Resumes ingestion jobs a restart interrupted and starts the worker pool."""
+    try:
+        from app.services.ingestion_queue import ingestion_queue
+        await asyncio.to_thread(ingestion_queue.recover)
+        ingestion_queue.start()
+    except Exception as e:
+        logger.warning(f"Ingestion queue startup failed (non-fatal): {e}")
+
+
+@app.on_event("shutdown")
+async def stop_ingestion_workers():
+    """Stops taking new jobs; running ones finish within the grace period or resume on restart."""
+    from app.services.ingestion_queue import ingestion_queue
+
+    await asyncio.to_thread(ingestion_queue.stop, 10)
+
+
+# ---------- Shared HTTP clients ----------
+@app.on_event("shutdown")
+async def close_shared_http_clients():
+    """Logs connection reuse per upstream and closes the pooled HTTP clients."""
+    from app.services.http_client import close_http_clients, http_metrics
+
+    logger.info(f"Outbound HTTP stats: {http_metrics.snapshot()}")
+    await close_http_clients()
+
+
+# ---------- PDF extraction pool ----------
+@app.on_event("shutdown")
+async def stop_pdf_workers():
+    """Stops the PDF extraction worker processes."""
+    from app.services.pdf_extractor import shutdown_pdf_pool
+
+    shutdown_pdf_pool()
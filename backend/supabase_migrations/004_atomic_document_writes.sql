@@ -0,0 +1,114 @@
+-- 004_atomic_document_writes.sql
+-- Atomic document + chunk writes for the vector store
+-- (backend/app/services/document_writer.py).
+--
+-- Small documents are written in one call by store_document_atomic. Large
+-- ones are staged under the source 'staging://<id>', their chunks inserted in
+-- size-bounded batches, and published by commit_document. Either way the real
+-- source never points at a document with missing chunks, and a replaced
+-- document is swapped out in the same transaction.
+-- Run in: Supabase Dashboard → SQL Editor → New Query
+
+-- Lookups by source (existence checks, replace) and by document (chunk deletes)
+create index if not exists documents_source_idx on public.documents (source);
+create index if not exists document_chunks_document_id_idx on public.document_chunks (document_id);
+
+-- Lets a retried batch upsert instead of duplicating chunks
+create unique index if not exists document_chunks_document_chunk_idx
+    on public.document_chunks (document_id, chunk_index);
+
+
+create or replace function public.store_document_atomic(
+    p_document jsonb,
+    p_chunks   jsonb,
+    p_replace  boolean default false
+) returns boolean
+language plpgsql
+as $$
+declare
+    v_id     public.documents.id%type := p_document->>'id';
+    v_source text := p_document->>'source';
+begin
+    -- A document without chunks would count as indexed forever
+    if coalesce(jsonb_array_length(p_chunks), 0) = 0 then
+        return false;
+    end if;
+
+    -- Concurrent writers of the same source queue up here
+    perform pg_advisory_xact_lock(hashtext(v_source));
+
+    if exists (select 1 from public.documents where source = v_source) then
+        if not p_replace then
+            return false;
+        end if;
+        delete from public.document_chunks
+         where document_id in (select id from public.documents where source = v_source);
+        delete from public.documents where source = v_source;
+    end if;
+
+    insert into public.documents (id, source, title, doc_type, metadata)
+    values (
+        v_id,
+        v_source,
+        coalesce(p_document->>'title', 'Untitled'),
+        coalesce(p_document->>'doc_type', 'text'),
+        coalesce(p_document->'metadata', '{}'::jsonb)
+    );
+
+    insert into public.document_chunks (document_id, content, embedding, chunk_index, metadata)
+    select v_id,
+           c->>'content',
+           (c->>'embedding')::vector,
+           (c->>'chunk_index')::int,
+           coalesce(c->'metadata', '{}'::jsonb)
+      from jsonb_array_elements(p_chunks) as c;
+
+    return true;
+end;
+$$;
+
+
+create or replace function public.commit_document(
+    p_document_id text,
+    p_source      text,
+    p_replace     boolean default false
+) returns boolean
+language plpgsql
+as $$
+declare
+    v_id public.documents.id%type := p_document_id;
+begin
+    perform pg_advisory_xact_lock(hashtext(p_source));
+
+    if exists (select 1 from public.documents where source = p_source and id <> v_id) then
+        if not p_replace then
+            -- Someone else published this source first: drop the staged copy
+            delete from public.document_chunks where document_id = v_id;
+            delete from public.documents where id = v_id;
+            return false;
+        end if;
+        delete from public.document_chunks
+         where document_id in (select id from public.documents where source = p_source and id <> v_id);
+        delete from public.documents where source = p_source and id <> v_id;
+    end if;
+
+    update public.documents set source = p_source where id = v_id;
+
+    -- Staged documents abandoned by a crashed writer
+    delete from public.document_chunks
+     where document_id in (
+        select id from public.documents
+         where source like 'staging://%' and created_at < now() - interval '1 day'
+     );
+    delete from public.documents
+     where source like 'staging://%' and created_at < now() - interval '1 day';
+
+    return true;
+end;
+$$;
+
+-- Backend only (service role), like the table policies in 002
+revoke all on function public.store_document_atomic(jsonb, jsonb, boolean) from public, anon, authenticated;
+revoke all on function public.commit_document(text, text, boolean) from public, anon, authenticated;
+grant execute on function public.store_document_atomic(jsonb, jsonb, boolean) to service_role;
+grant execute on function public.commit_document(text, text, boolean) to service_role;
@@ -0,0 +1,177 @@
+-- 005_compact_vectors.sql
+-- Compact wire encoding for document_chunks embeddings
+-- (backend/app/services/vector_codec.py, EMBEDDING_WIRE_FORMAT).
+--
+-- With EMBEDDING_WIRE_FORMAT=float32|float16 the backend sends each vector as
+-- base64 of big-endian IEEE floats instead of a JSON list (~4x / ~8x smaller
+-- payloads) and decodes it here. Stored vectors are read back as base64
+-- float32 through document_chunk_vectors.
+-- Requires 004_atomic_document_writes.sql.
+-- Run in: Supabase Dashboard → SQL Editor → New Query
+
+
+-- base64 big-endian float32/float16 → vector
+create or replace function public.decode_embedding(p_data text, p_encoding text)
+returns vector
+language sql
+immutable strict parallel safe
+as $$
+    with raw as (
+        select decode(p_data, 'base64') as b,
+               case p_encoding when 'float16' then 2 else 4 end as w
+    ), words as (
+        select i, w,
+               case w
+                   when 4 then (get_byte(b, i * 4)::bigint << 24) | (get_byte(b, i * 4 + 1) << 16)
+                             | (get_byte(b, i * 4 + 2) << 8) | get_byte(b, i * 4 + 3)
+                   else (get_byte(b, i * 2)::bigint << 8) | get_byte(b, i * 2 + 1)
+               end as bits
+          from raw, generate_series(0, length(b) / w - 1) as i
+    )
+    select array_agg(
+               (case when bits >> (w * 8 - 1) = 1 then -1 else 1 end) *
+               case w
+                   when 4 then
+                       case when (bits >> 23) & 255 = 0 then (bits & 8388607) * 2.0 ^ (-149)
+                            else (1 + (bits & 8388607) / 8388608.0) * 2.0 ^ (((bits >> 23) & 255) - 127) end
+                   else
+                       case when (bits >> 10) & 31 = 0 then (bits & 1023) * 2.0 ^ (-24)
+                            else (1 + (bits & 1023) / 1024.0) * 2.0 ^ (((bits >> 10) & 31) - 15) end
+               end
+               order by i
+           )::real[]::vector
+      from words
+$$;
+
+
+-- Embedding of a chunk object as sent by the backend (JSON list or base64)
+create or replace function public.chunk_embedding(p_chunk jsonb, p_encoding text)
+returns vector
+language sql
+immutable parallel safe
+as $$
+    select case when coalesce(p_encoding, 'json') = 'json'
+                then (p_chunk->>'embedding')::vector
+                else public.decode_embedding(p_chunk->>'embedding', p_encoding)
+           end
+$$;
+
+
+-- Batched chunk upsert for large (staged) documents
+create or replace function public.insert_document_chunks(p_chunks jsonb, p_encoding text default 'json')
+returns integer
+language plpgsql
+as $$
+declare
+    v_count integer;
+begin
+    insert into public.document_chunks (document_id, content, embedding, chunk_index, metadata)
+    select r.document_id, r.content, public.chunk_embedding(c, p_encoding), r.chunk_index,
+           coalesce(r.metadata, '{}'::jsonb)
+      from jsonb_array_elements(p_chunks) as c,
+           jsonb_populate_record(null::public.document_chunks, c - 'embedding') as r
+    on conflict (document_id, chunk_index) do update
+       set content = excluded.content,
+           embedding = excluded.embedding,
+           metadata = excluded.metadata;
+    get diagnostics v_count = row_count;
+    return v_count;
+end;
+$$;
+
+
+-- store_document_atomic gains p_encoding (004's 3-argument version is replaced)
+drop function if exists public.store_document_atomic(jsonb, jsonb, boolean);
+
+create or replace function public.store_document_atomic(
+    p_document jsonb,
+    p_chunks   jsonb,
+    p_replace  boolean default false,
+    p_encoding text default 'json'
+) returns boolean
+language plpgsql
+as $$
+declare
+    v_id     public.documents.id%type := p_document->>'id';
+    v_source text := p_document->>'source';
+begin
+    -- A document without chunks would count as indexed forever
+    if coalesce(jsonb_array_length(p_chunks), 0) = 0 then
+        return false;
+    end if;
+
+    -- Concurrent writers of the same source queue up here
+    perform pg_advisory_xact_lock(hashtext(v_source));
+
+    if exists (select 1 from public.documents where source = v_source) then
+        if not p_replace then
+            return false;
+        end if;
+        delete from public.document_chunks
+         where document_id in (select id from public.documents where source = v_source);
+        delete from public.documents where source = v_source;
+    end if;
+
+    insert into public.documents (id, source, title, doc_type, metadata)
+    values (
+        v_id,
+        v_source,
+        coalesce(p_document->>'title', 'Untitled'),
+        coalesce(p_document->>'doc_type', 'text'),
+        coalesce(p_document->'metadata', '{}'::jsonb)
+    );
+
+    insert into public.document_chunks (document_id, content, embedding, chunk_index, metadata)
+    select v_id,
+           c->>'content',
+           public.chunk_embedding(c, p_encoding),
+           (c->>'chunk_index')::int,
+           coalesce(c->'metadata', '{}'::jsonb)
+      from jsonb_array_elements(p_chunks) as c;
+
+    return true;
+end;
+$$;
+
+
+-- Stored vectors as base64 big-endian float32 (float4send), for chunk reuse
+create or replace function public.document_chunk_vectors(p_document_id text)
+returns table (chunk_index integer, content text, embedding text)
+language sql
+stable
+as $$
+    select c.chunk_index,
+           c.content,
+           encode((
+               select string_agg(float4send(u.x), ''::bytea order by u.n)
+                 from unnest(c.embedding::real[]) with ordinality as u(x, n)
+           ), 'base64')
+      from public.document_chunks c
+     where c.document_id::text = p_document_id
+     order by c.chunk_index
+$$;
+
+
+-- Backend only (service role)
+revoke all on function public.decode_embedding(text, text) from public, anon, authenticated;
+revoke all on function public.chunk_embedding(jsonb, text) from public, anon, authenticated;
+revoke all on function public.insert_document_chunks(jsonb, text) from public, anon, authenticated;
+revoke all on function public.store_document_atomic(jsonb, jsonb, boolean, text) from public, anon, authenticated;
+revoke all on function public.document_chunk_vectors(text) from public, anon, authenticated;
+grant execute on function public.decode_embedding(text, text) to service_role;
+grant execute on function public.chunk_embedding(jsonb, text) to service_role;
+grant execute on function public.insert_document_chunks(jsonb, text) to service_role;
+grant execute on function public.store_document_atomic(jsonb, jsonb, boolean, text) to service_role;
+grant execute on function public.document_chunk_vectors(text) to service_role;
+
+
+-- ── Optional: smaller vectors at rest ─────────────────────────────────────
+-- EMBEDDING_OUTPUT_DIMENSIONALITY (e.g. 768) shrinks every vector, and
+-- pgvector >= 0.7 can store half precision. Both change the column type, so
+-- every document must be re-ingested and match_documents' query_embedding
+-- parameter must use the same type/dimension. Run once, after choosing:
+--
+--   truncate public.document_chunks;
+--   delete from public.documents;
+--   alter table public.document_chunks alter column embedding type halfvec(768);
+--   create index on public.document_chunks using hnsw (embedding halfvec_cosine_ops);
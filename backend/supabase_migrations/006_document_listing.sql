@@ -0,0 +1,76 @@
+-- 006_document_listing.sql
+-- Cheap /knowledge/documents listing
+-- (VectorStoreService.list_documents in backend/app/services/vector_store.py).
+--
+--   - documents.chunk_count is kept up to date by statement-level triggers on
+--     document_chunks, so the list no longer counts chunks per document,
+--   - documents.source_type is derived from source (same rules the endpoint
+--     used to apply with LIKE filters), so filtering is an index lookup,
+--   - (source_type, created_at, id) backs keyset pagination.
+-- Run in: Supabase Dashboard → SQL Editor → New Query
+
+alter table public.documents add column if not exists chunk_count integer not null default 0;
+
+alter table public.documents add column if not exists source_type text
+    generated always as (
+        case
+            when source like 'staging://%' then 'staging'
+            when source like 'file://%' then 'direct'
+            when source like '%brandfolder.com%' then 'brandfolder'
+            when source like 'http%' then 'web'
+            else 'other'
+        end
+    ) stored;
+
+create index if not exists documents_created_at_id_idx
+    on public.documents (created_at desc, id desc);
+create index if not exists documents_source_type_created_at_id_idx
+    on public.documents (source_type, created_at desc, id desc);
+
+
+-- One update per statement, however many chunks it inserted or deleted
+create or replace function public.documents_count_inserted_chunks()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.documents d
+       set chunk_count = d.chunk_count + n.added
+      from (select document_id, count(*) as added from inserted_chunks group by document_id) n
+     where d.id = n.document_id;
+    return null;
+end;
+$$;
+
+create or replace function public.documents_count_deleted_chunks()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.documents d
+       set chunk_count = greatest(d.chunk_count - n.removed, 0)
+      from (select document_id, count(*) as removed from deleted_chunks group by document_id) n
+     where d.id = n.document_id;
+    return null;
+end;
+$$;
+
+-- Upserts that hit an existing (document_id, chunk_index) fire UPDATE, not INSERT, so they are not counted twice
+drop trigger if exists document_chunks_count_insert on public.document_chunks;
+create trigger document_chunks_count_insert
+    after insert on public.document_chunks
+    referencing new table as inserted_chunks
+    for each statement execute function public.documents_count_inserted_chunks();
+
+drop trigger if exists document_chunks_count_delete on public.document_chunks;
+create trigger document_chunks_count_delete
+    after delete on public.document_chunks
+    referencing old table as deleted_chunks
+    for each statement execute function public.documents_count_deleted_chunks();
+
+
+-- Backfill existing documents
+update public.documents d
+   set chunk_count = c.total
+  from (select document_id, count(*) as total from public.document_chunks group by document_id) c
+ where d.id = c.document_id;
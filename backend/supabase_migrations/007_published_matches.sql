@@ -0,0 +1,48 @@
+-- 007_published_matches.sql
+-- Vector search that never returns staged documents
+-- (VectorStoreService._match in backend/app/services/vector_store.py).
+--
+-- Large documents are written under the source 'staging://<id>' and only
+-- published by commit_document (004), but match_documents sees their chunks
+-- as soon as they are inserted: mid-ingest results included half-written
+-- documents, and during a replace both versions. match_published_documents
+-- asks match_documents for as many extra rows as there are staged chunks and
+-- drops those, returning the rest as a JSON array in similarity order.
+-- If match_documents' query_embedding type was changed (see 005), use the
+-- same type here.
+-- Run in: Supabase Dashboard → SQL Editor → New Query
+
+-- Staged documents are few and short-lived; keep finding them cheap
+create index if not exists documents_staging_idx
+    on public.documents (created_at) where source like 'staging://%';
+
+
+create or replace function public.match_published_documents(
+    query_embedding vector,
+    match_threshold float,
+    match_count     int
+) returns jsonb
+language sql
+stable
+as $$
+    with staged as (
+        select id from public.documents where source like 'staging://%'
+    ), matches as (
+        select m.*
+          from public.match_documents(
+                   query_embedding,
+                   match_threshold,
+                   match_count + (select count(*)::int from public.document_chunks
+                                   where document_id in (select id from staged))
+               ) m
+         where m.document_id not in (select id from staged)
+         order by m.similarity desc
+         limit match_count
+    )
+    select coalesce(jsonb_agg(to_jsonb(matches) order by matches.similarity desc), '[]'::jsonb)
+      from matches;
+$$;
+
+-- Backend only (service role), like the table policies in 002
+revoke all on function public.match_published_documents(vector, float, int) from public, anon, authenticated;
+grant execute on function public.match_published_documents(vector, float, int) to service_role;
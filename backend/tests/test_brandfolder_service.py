@@ -0,0 +1,112 @@
+"""
+Tests for Brandfolder asset pagination.
+"""
+
+import threading
+
+import pytest
+
+from app.services.brandfolder_service import BrandfolderAPI
+
+
+def _page(page, total_pages=None, next_page=None):
+    meta = {"current_page": page, "next_page": next_page}
+    if total_pages:
+        meta["total_pages"] = total_pages
+    return {
+        "data": [{
+            "id": f"a{page}",
+            "relationships": {"attachments": {"data": [{"id": f"att{page}"}]}},
+        }],
+        "included": [{"id": f"att{page}", "type": "attachments", "attributes": {"url": f"u{page}"}}],
+        "meta": meta,
+    }
+
+
+@pytest.fixture
+def api():
+    return BrandfolderAPI(api_key="test")
+
+
+def test_pages_after_first_are_fetched_concurrently_in_order(api):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_request(method, endpoint, params=None):
+        page = (params or {}).get("page", 1)
+        with lock:
+            calls.append(page)
+        return _page(page, total_pages=6)
+
+    api._request = fake_request
+    assets = api.get_assets(brandfolder_id="bf")
+    assert [a["id"] for a in assets] == [f"a{i}" for i in range(1, 7)]
+    assert assets[2]["included"][0]["attributes"]["url"] == "u3"
+    assert sorted(calls) == [1, 2, 3, 4, 5, 6]
+
+
+def test_failed_page_is_skipped_not_truncating(api):
+    """A page that still fails after the client's retries is dropped; later pages survive."""
+    def fake_request(method, endpoint, params=None):
+        page = (params or {}).get("page", 1)
+        if page == 3:
+            return {"error": "429 Too Many Requests", "status_code": 429, "retry_after": "1", "data": []}
+        return _page(page, total_pages=4)
+
+    api._request = fake_request
+    assets = api.search_assets("bf", "easter")
+    assert [a["id"] for a in assets] == ["a1", "a2", "a4"]
+
+
+def test_failed_page_reports_incomplete_listing(api):
+    """Serial and concurrent paths both flag a partial list (sync must not advance its watermark)."""
+    def concurrent(method, endpoint, params=None):
+        page = (params or {}).get("page", 1)
+        if page == 2:
+            return {"error": "503", "data": []}
+        return _page(page, total_pages=3)
+
+    def serial(method, endpoint, params=None):
+        page = (params or {}).get("page", 1)
+        if page == 2:
+            return {"error": "503", "data": []}
+        return _page(page, next_page=page + 1)
+
+    for fake_request, expected in ((concurrent, ["a1", "a3"]), (serial, ["a1"])):
+        flagged = []
+        api._request = fake_request
+        assets = list(api.iter_assets(brandfolder_id="bf", on_incomplete=lambda: flagged.append(True)))
+        assert [a["id"] for a in assets] == expected
+        assert flagged == [True]
+
+    flagged = []
+    api._request = lambda method, endpoint, params=None: _page((params or {}).get("page", 1), total_pages=2)
+    list(api.iter_assets(brandfolder_id="bf", on_incomplete=lambda: flagged.append(True)))
+    assert flagged == []
+
+
+def test_falls_back_to_next_page_walk_without_total_pages(api):
+    def fake_request(method, endpoint, params=None):
+        page = (params or {}).get("page", 1)
+        return _page(page, next_page=page + 1 if page < 3 else None)
+
+    api._request = fake_request
+    assert [a["id"] for a in api.get_assets(brandfolder_id="bf")] == ["a1", "a2", "a3"]
+
+
+def test_iter_assets_stops_fetching_when_consumer_stops(api, monkeypatch):
+    """Only the pages needed (plus the bounded prefetch window) are requested."""
+    monkeypatch.setattr("app.services.brandfolder_service.settings.brandfolder_page_concurrency", 2)
+    calls = []
+
+    def fake_request(method, endpoint, params=None):
+        page = (params or {}).get("page", 1)
+        calls.append(page)
+        return _page(page, total_pages=50)
+
+    api._request = fake_request
+    stream = api.iter_assets(brandfolder_id="bf")
+    assert next(stream)["id"] == "a1"
+    assert next(stream)["id"] == "a2"
+    stream.close()
+    assert len(calls) <= 4
@@ -0,0 +1,163 @@
+"""
+Tests for the concurrent pre-generation stages of /chat/message and /chat/stream.
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import Response
+
+from app.routers import chat
+from app.routers.chat import ChatRequest
+
+
+@pytest.fixture(autouse=True)
+def short_deadline(monkeypatch):
+    monkeypatch.setattr(chat.settings, "chat_prefetch_timeout_seconds", 0.2)
+
+
+async def _value(value, delay=0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def _fail():
+    raise RuntimeError("db down")
+
+
+class FakeHistory:
+    """ChatHistoryService stand-in; `save_delay` makes the user-message write miss the deadline."""
+
+    def __init__(self, messages=(), save_delay=0.0, history_delay=0.0):
+        self.messages = list(messages)
+        self.save_delay = save_delay
+        self.history_delay = history_delay
+        self.saved = []
+
+    async def acreate_session(self, user_id, director, title):
+        return "new-session"
+
+    async def aadd_message(self, session_id, role, content):
+        await asyncio.sleep(self.save_delay if role == "user" else 0)
+        self.saved.append((role, content))
+
+    async def aget_session_messages(self, session_id):
+        await asyncio.sleep(self.history_delay)
+        return self.messages
+
+
+class FakeChat:
+    def __init__(self):
+        self.history = None
+
+    async def agenerate_response(self, user_input, history, director, rag_context):
+        self.history = history
+        return "respuesta"
+
+
+def test_stages_run_concurrently_under_one_deadline():
+    timings = {}
+    begin = time.perf_counter()
+    results = asyncio.run(chat._run_stages(
+        {"a": _value(1, 0.1), "b": _value(2, 0.1), "c": _fail()}, timings
+    ))
+    elapsed = time.perf_counter() - begin
+
+    assert results == {"a": 1, "b": 2, "c": None}
+    assert elapsed < 0.19
+    assert set(timings) == {"a", "b", "c"}
+
+
+def test_late_stage_is_cancelled_at_the_deadline():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        results = await chat._run_stages({"rag": slow(), "history": _value(["m"])}, {})
+        await asyncio.sleep(0)
+        return results
+
+    assert asyncio.run(run()) == {"rag": None, "history": ["m"]}
+    assert cancelled == [True]
+
+
+def test_detached_write_finishes_after_the_deadline():
+    history = FakeHistory(save_delay=0.4)
+
+    async def run():
+        results = await chat._run_stages(
+            {"save_user": history.aadd_message("s", "user", "hola")}, {}, detach=("save_user",)
+        )
+        assert results == {"save_user": None}
+        assert history.saved == []
+        await asyncio.sleep(0.4)
+
+    asyncio.run(run())
+    assert history.saved == [("user", "hola")]
+    assert not chat._detached
+
+
+def test_prepare_turn_drops_the_current_message_from_history():
+    history = FakeHistory(messages=[
+        {"role": "assistant", "content": "Bienvenido"},
+        {"role": "user", "content": "hola"},
+    ])
+    history_dicts, rag = asyncio.run(chat._prepare_turn(history, "s", False, "hola", False, {}))
+    assert history_dicts == [{"role": "assistant", "content": "Bienvenido"}]
+    assert rag is None
+
+
+def test_send_message_emits_server_timing_header():
+    response = Response()
+    chat_service = FakeChat()
+    history = FakeHistory(messages=[{"role": "assistant", "content": "Hola"}])
+
+    result = asyncio.run(chat.send_message(
+        ChatRequest(message="¿Qué es Waumba Land?", session_id="s"),
+        response, chat_service, history, {"id": "u"},
+    ))
+
+    assert result["message"] == "respuesta"
+    assert chat_service.history == [{"role": "assistant", "content": "Hola"}]
+    parts = response.headers["Server-Timing"].split(", ")
+    assert {part.split(";")[0] for part in parts} == {"save_user", "history", "generate"}
+    assert all(";dur=" in part for part in parts)
+
+
+def test_slow_history_does_not_block_the_reply():
+    response = Response()
+    chat_service = FakeChat()
+    history = FakeHistory(messages=[{"role": "assistant", "content": "Hola"}], history_delay=5)
+
+    result = asyncio.run(chat.send_message(
+        ChatRequest(message="hola", session_id="s"), response, chat_service, history, {"id": "u"},
+    ))
+    assert result["message"] == "respuesta"
+    assert chat_service.history == []
+    # The cancelled stage still reports how long it was waited for
+    timing = dict(part.split(";dur=") for part in response.headers["Server-Timing"].split(", "))
+    assert float(timing["history"]) < 1000
+    assert "generate" in timing
+
+
+def test_stream_exposes_server_timing_header():
+    class StreamingChat(FakeChat):
+        async def agenerate_response_stream(self, user_input, history, director, rag_context):
+            yield "respuesta"
+
+    history = FakeHistory()
+    response = asyncio.run(chat.stream_message(
+        ChatRequest(message="hola"), StreamingChat(), history, {"id": "u"},
+    ))
+
+    assert response.headers["X-Session-Id"] == "new-session"
+    assert "Server-Timing" in response.headers["Access-Control-Expose-Headers"]
+    stages = {part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")}
+    assert stages == {"session", "save_user"}
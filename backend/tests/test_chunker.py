@@ -0,0 +1,48 @@
+"""
+Tests for the token-aware chunker.
+"""
+
+from app.services.chunker import TokenChunker, estimate_tokens
+
+
+def words(text):
+    return len(text.split())
+
+
+def chunker(max_tokens, overlap_tokens):
+    # One token per word keeps the arithmetic readable
+    return TokenChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens, count_tokens=words)
+
+
+def test_chunks_respect_token_budget_and_overlap_whole_sentences():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(20))
+    chunks = chunker(20, 5).chunk(text)
+
+    assert len(chunks) > 1
+    assert all(words(c) <= 20 for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        # Overlap is the previous chunk's last full sentence, not a cut word
+        last_sentence = "Sentence" + previous.rsplit("Sentence", 1)[1]
+        assert current.startswith(last_sentence)
+
+
+def test_paragraph_breaks_are_kept_inside_chunks():
+    chunks = chunker(50, 0).chunk("First paragraph.\n\nSecond paragraph. Still second.")
+    assert chunks == ["First paragraph.\n\nSecond paragraph. Still second."]
+
+
+def test_page_stream_matches_whole_text_and_joins_split_sentences():
+    pages = ["Uno dos tres. Cuatro cinco", "seis siete. Ocho nueve diez."]
+    streamed = list(chunker(5, 0).chunk_pages(pages))
+    assert streamed == ["Uno dos tres.", "Cuatro cinco\nseis siete.", "Ocho nueve diez."]
+
+
+def test_oversized_sentence_is_split_on_words():
+    chunks = chunker(4, 0).chunk("a b c d e f g h i j")
+    assert chunks == ["a b c d", "e f g h", "i j"]
+
+
+def test_estimate_tokens_counts_long_words_and_punctuation():
+    assert estimate_tokens("hola") == 1
+    assert estimate_tokens("congregación, ¡bienvenidos!") == 3 + 1 + 1 + 3 + 1
+    assert TokenChunker().chunk("   ") == []
@@ -0,0 +1,199 @@
+"""
+Tests for batched / atomic document writes.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.document_writer import STAGING_PREFIX, SupabaseDocumentWriter
+from app.services.vector_codec import decode_vector, encode_vector
+
+
+class MissingFunction(Exception):
+    code = "PGRST202"
+
+
+def _rows(n, text="chunk"):
+    return [
+        {"document_id": "doc", "content": f"{text} {i}", "embedding": [0.1] * 4, "chunk_index": i, "metadata": {}}
+        for i in range(n)
+    ]
+
+
+def _document():
+    return {"id": "doc", "source": "src", "title": "T", "doc_type": "text", "metadata": {}}
+
+
+def test_batches_respect_row_and_byte_limits():
+    writer = SupabaseDocumentWriter(MagicMock(), batch_bytes=10_000, batch_rows=3, concurrency=1)
+    assert [len(b) for b in writer.batches(_rows(7))] == [3, 3, 1]
+
+    writer = SupabaseDocumentWriter(MagicMock(), batch_bytes=700, batch_rows=100, concurrency=1)
+    batches = list(writer.batches(_rows(5, text="x" * 300)))
+    assert [len(b) for b in batches] == [1, 1, 1, 1, 1]
+    assert [r["chunk_index"] for b in batches for r in b] == list(range(5))
+
+
+def test_small_document_uses_single_atomic_call():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value = SimpleNamespace(data=True)
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=10, concurrency=1)
+
+    assert writer.write(_document(), _rows(3), replace=True) is True
+    name, params = client.rpc.call_args.args
+    assert name == "store_document_atomic"
+    assert params["p_replace"] is True and len(params["p_chunks"]) == 3
+    client.table.assert_not_called()
+
+
+def test_large_document_is_staged_then_committed():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value = SimpleNamespace(data=True)
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=2, concurrency=2)
+    writer._rpc_available = True
+
+    assert writer.write(_document(), _rows(5)) is True
+    staged = client.table.return_value.insert.call_args.args[0]
+    assert staged["source"] == f"{STAGING_PREFIX}doc"
+    assert client.table.return_value.upsert.call_count == 3
+    name, params = client.rpc.call_args.args
+    assert name == "commit_document"
+    assert params == {"p_document_id": "doc", "p_source": "src", "p_replace": False}
+
+
+def test_failed_chunk_batch_discards_staged_document():
+    client = MagicMock()
+    client.table.return_value.upsert.return_value.execute.side_effect = RuntimeError("timeout")
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=2, concurrency=1)
+    writer._rpc_available = True
+
+    assert writer.write(_document(), _rows(4)) is False
+    deleted = [c.args for c in client.table.return_value.delete.return_value.eq.call_args_list]
+    assert ("document_id", "doc") in deleted and ("id", "doc") in deleted
+    client.rpc.assert_not_called()
+
+
+def test_missing_functions_fall_back_to_direct_inserts():
+    client = MagicMock()
+    client.rpc.return_value.execute.side_effect = MissingFunction("Could not find the function")
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=10, concurrency=1)
+
+    assert writer.write(_document(), _rows(3)) is True
+    assert writer._rpc_available is False
+    inserted = client.table.return_value.insert.call_args_list
+    assert inserted[0].args[0]["source"] == "src"
+    assert len(inserted[1].args[0]) == 3
+
+    client.rpc.reset_mock()
+    assert writer.write(_document(), _rows(3)) is True
+    client.rpc.assert_not_called()
+
+
+def test_compact_format_sends_base64_vectors():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value = SimpleNamespace(data=True)
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=10, concurrency=1, wire_format="float32")
+
+    assert writer.write(_document(), _rows(2)) is True
+    name, params = client.rpc.call_args.args
+    assert name == "store_document_atomic" and params["p_encoding"] == "float32"
+    assert decode_vector(params["p_chunks"][0]["embedding"], "float32") == pytest.approx([0.1] * 4)
+
+
+def test_compact_batches_use_insert_function():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value = SimpleNamespace(data=True)
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=2, concurrency=1, wire_format="float16")
+    writer._rpc_available = True
+
+    assert writer.write(_document(), _rows(3)) is True
+    names = [c.args[0] for c in client.rpc.call_args_list]
+    assert names == ["insert_document_chunks", "insert_document_chunks", "commit_document"]
+    client.table.return_value.upsert.assert_not_called()
+
+
+def test_compact_format_falls_back_to_json_without_migration():
+    client = MagicMock()
+
+    def rpc(name, params):
+        call = MagicMock()
+        if "p_encoding" in params:
+            call.execute.side_effect = MissingFunction("Could not find the function")
+        else:
+            call.execute.return_value = SimpleNamespace(data=True)
+        return call
+
+    client.rpc.side_effect = rpc
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=10, concurrency=1, wire_format="float32")
+
+    assert writer.write(_document(), _rows(2)) is True
+    assert writer._compact_available is False and writer._rpc_available is True
+    assert client.rpc.call_args.args[1]["p_chunks"][0]["embedding"] == [0.1] * 4
+
+
+def test_read_chunks_decodes_compact_rows():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value = SimpleNamespace(
+        data=[{"chunk_index": 0, "content": "a", "embedding": encode_vector([0.5, 0.25], "float32")}]
+    )
+    writer = SupabaseDocumentWriter(client, wire_format="float32")
+    assert writer.read_chunks("doc") == [("a", [0.5, 0.25])]
+
+
+def test_document_without_chunks_is_never_written():
+    client = MagicMock()
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=10, concurrency=1)
+
+    assert writer.write(_document(), []) is False
+    client.rpc.assert_not_called()
+    client.table.assert_not_called()
+
+
+def _staged_writer_without_commit_function(client):
+    def rpc(name, params):
+        call = MagicMock()
+        if name == "commit_document":
+            call.execute.side_effect = MissingFunction("Could not find the function")
+        return call
+
+    client.rpc.side_effect = rpc
+    writer = SupabaseDocumentWriter(client, batch_bytes=10_000, batch_rows=2, concurrency=1)
+    writer._rpc_available = True
+    return writer
+
+
+def test_publish_fallback_replaces_previous_version():
+    client = MagicMock()
+    client.table.return_value.select.return_value.eq.return_value.execute.return_value = \
+        SimpleNamespace(data=[{"id": "old"}, {"id": "doc"}])
+    writer = _staged_writer_without_commit_function(client)
+
+    assert writer.write(_document(), _rows(3), replace=True) is True
+    client.table.return_value.update.assert_called_once_with({"source": "src"})
+    deleted = [c.args for c in client.table.return_value.delete.return_value.eq.call_args_list]
+    assert ("id", "old") in deleted and ("id", "doc") not in deleted
+
+
+def test_publish_fallback_failure_discards_staged_rows():
+    client = MagicMock()
+    client.table.return_value.select.return_value.eq.return_value.execute.return_value = SimpleNamespace(data=[])
+    client.table.return_value.update.return_value.eq.return_value.execute.side_effect = RuntimeError("down")
+    writer = _staged_writer_without_commit_function(client)
+
+    assert writer.write(_document(), _rows(3)) is False
+    deleted = [c.args for c in client.table.return_value.delete.return_value.eq.call_args_list]
+    assert ("id", "doc") in deleted
+
+
+def test_purge_staged_discards_abandoned_documents():
+    client = MagicMock()
+    listing = client.table.return_value.select.return_value.like.return_value.lt
+    listing.return_value.execute.return_value = SimpleNamespace(data=[{"id": "s1"}, {"id": "s2"}])
+    writer = SupabaseDocumentWriter(client)
+
+    assert writer.purge_staged() == 2
+    client.table.return_value.select.return_value.like.assert_called_once_with("source", f"{STAGING_PREFIX}%")
+    deleted = [c.args for c in client.table.return_value.delete.return_value.eq.call_args_list]
+    assert ("id", "s1") in deleted and ("id", "s2") in deleted
@@ -0,0 +1,130 @@
+"""
+Tests for the shared attachment downloader.
+"""
+
+import os
+
+import pytest
+import requests
+
+from app.services.downloader import AttachmentDownloader, DownloadError
+
+PAYLOAD = bytes(range(256)) * 400  # 100 KB
+
+
+class FakeResponse:
+    def __init__(self, body, status=200, drop_after=None):
+        self.body = body
+        self.status_code = status
+        self.headers = {
+            "Content-Length": str(len(body)),
+            "Accept-Ranges": "bytes",
+            "Content-Type": "video/mp4",
+        }
+        self.drop_after = drop_after
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        sent = 0
+        for i in range(0, len(self.body), chunk_size):
+            if self.drop_after is not None and sent >= self.drop_after:
+                raise requests.exceptions.ChunkedEncodingError("connection reset")
+            chunk = self.body[i:i + chunk_size]
+            sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Serves PAYLOAD, honouring Range headers; the first full GET drops mid-stream."""
+
+    def __init__(self, drop_first=False):
+        self.drop_first = drop_first
+        self.ranges = []
+
+    def get(self, url, headers=None, **kwargs):
+        byte_range = (headers or {}).get("Range")
+        self.ranges.append(byte_range)
+        if byte_range:
+            start, end = byte_range[len("bytes="):].split("-")
+            end = int(end) if end else len(PAYLOAD) - 1
+            return FakeResponse(PAYLOAD[int(start):end + 1], status=206)
+        if self.drop_first:
+            self.drop_first = False
+            return FakeResponse(PAYLOAD, drop_after=10_000)
+        return FakeResponse(PAYLOAD)
+
+
+def _downloader(session, **kwargs):
+    options = dict(max_concurrency=2, chunk_bytes=4096, parallel_threshold_bytes=10**9, segments=4, max_retries=2)
+    options.update(kwargs)
+    return AttachmentDownloader(session=session, **options)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr("app.services.downloader.time.sleep", lambda s: None)
+
+
+def _read_and_remove(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
+def test_dropped_stream_resumes_with_range():
+    """A connection reset mid-file should resume from the bytes already written."""
+    session = FakeSession(drop_first=True)
+    path = _downloader(session).download("https://cdn/x.mp4", suffix_for=lambda ct: ".mp4")
+    assert path.endswith(".mp4")
+    assert _read_and_remove(path) == PAYLOAD
+    assert session.ranges[1].startswith("bytes=1") and session.ranges[1].endswith("-")
+
+
+def test_failed_resume_request_is_retried():
+    """A reconnect that fails counts as an attempt instead of escaping download()."""
+    class ResumeFailsOnce(FakeSession):
+        def get(self, url, headers=None, **kwargs):
+            if (headers or {}).get("Range") and not self.ranges[1:]:
+                self.ranges.append(headers["Range"])
+                raise requests.exceptions.ConnectionError("connection refused")
+            return super().get(url, headers=headers, **kwargs)
+
+    session = ResumeFailsOnce(drop_first=True)
+    path = _downloader(session).download("https://cdn/x.mp4")
+    assert _read_and_remove(path) == PAYLOAD
+    assert len([r for r in session.ranges if r]) == 2
+
+
+def test_large_file_downloads_in_parallel_segments():
+    session = FakeSession()
+    path = _downloader(session, parallel_threshold_bytes=1024).download("https://cdn/x.mp4")
+    assert _read_and_remove(path) == PAYLOAD
+    assert len([r for r in session.ranges if r]) == 4
+
+
+def test_download_gives_up_after_retries():
+    class AlwaysDrops(FakeSession):
+        def get(self, url, headers=None, **kwargs):
+            self.ranges.append((headers or {}).get("Range"))
+            return FakeResponse(PAYLOAD, status=206, drop_after=0)
+
+    with pytest.raises(DownloadError):
+        _downloader(AlwaysDrops()).download("https://cdn/x.mp4")
+
+
+def test_download_ahead_preserves_order_and_skips_missing_urls():
+    downloader = _downloader(FakeSession())
+    items = ["a", None, "b"]
+    results = list(downloader.download_ahead(items, lambda i: f"https://cdn/{i}" if i else None, window=2))
+    assert [item for item, _, _ in results] == items
+    assert results[1][1] is None
+    for _, path, error in results:
+        assert error is None
+        if path:
+            assert _read_and_remove(path) == PAYLOAD
@@ -0,0 +1,63 @@
+"""
+Tests for the shared HTTP client.
+"""
+
+import asyncio
+
+import httpx
+
+from app.services import brandfolder_service
+from app.services.brandfolder_service import BrandfolderAPI
+from app.services.http_client import AsyncHttpClient, HttpClient, get_http_client, http_metrics
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/limited"):
+        return httpx.Response(429, headers={"Retry-After": "7"}, request=request)
+    if request.url.path.endswith("/broken"):
+        return httpx.Response(503, request=request)
+    return httpx.Response(200, json={"data": [{"id": "x"}]}, request=request)
+
+
+def test_shared_client_is_a_singleton():
+    assert get_http_client() is get_http_client()
+
+
+def test_metrics_count_requests_and_errors_per_host():
+    http_metrics.reset()
+    client = HttpClient(transport=httpx.MockTransport(_handler))
+    client.get("https://api.example.com/ok")
+    client.get("https://api.example.com/broken")
+    client.get("https://other.example.com/ok")
+
+    snapshot = http_metrics.snapshot()
+    assert snapshot["api.example.com"]["requests"] == 2
+    assert snapshot["api.example.com"]["errors"] == 1
+    assert snapshot["other.example.com"]["requests"] == 1
+
+
+def test_async_client_records_metrics():
+    http_metrics.reset()
+
+    async def run():
+        client = AsyncHttpClient(transport=httpx.MockTransport(_handler))
+        response = await client.get("https://api.example.com/ok")
+        await client.aclose()
+        return response
+
+    assert asyncio.run(run()).json() == {"data": [{"id": "x"}]}
+    assert http_metrics.snapshot()["api.example.com"]["requests"] == 1
+
+
+def test_brandfolder_request_reports_status_and_retry_after(monkeypatch):
+    """Once the shared client's retries are exhausted, _request surfaces the 429 details."""
+    monkeypatch.setattr("app.services.http_client.time.sleep", lambda s: None)
+    client = HttpClient(transport=httpx.MockTransport(_handler))
+    monkeypatch.setattr(brandfolder_service, "get_http_client", lambda: client)
+    api = BrandfolderAPI(api_key="test")
+
+    assert api._request("GET", "/ok") == {"data": [{"id": "x"}]}
+    error = api._request("GET", "/limited")
+    assert error["status_code"] == 429
+    assert error["retry_after"] == "7"
+    assert error["data"] == []
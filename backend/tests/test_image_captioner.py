@@ -0,0 +1,61 @@
+"""
+Tests for batched, cached image captioning.
+"""
+
+import pytest
+
+from app.services.image_captioner import ImageCaptioner
+
+
+class FakeMediaService:
+    def __init__(self, skip=()):
+        self.calls = []
+        self.skip = set(skip)
+
+    def caption_images(self, images):
+        self.calls.append([data for data, _ in images])
+        return [
+            None if data in self.skip and len(images) > 1 else f"caption:{data.decode()}"
+            for data, _ in images
+        ]
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.png"
+        path.write_bytes(name.encode())
+        paths.append((str(path), "image/png"))
+    return paths
+
+
+@pytest.fixture
+def captioner(tmp_path):
+    return ImageCaptioner(path=str(tmp_path / "captions.db"), batch_size=3, batch_wait=60, concurrency=2)
+
+
+def test_images_are_packed_into_one_request_and_cached(captioner, images):
+    service = FakeMediaService()
+    assert captioner.caption_many(images, media_service=service) == ["caption:a", "caption:b", "caption:c"]
+    assert service.calls == [[b"a", b"b", b"c"]]
+
+    # Same bytes again: served from the cache, no request
+    assert captioner.caption(images[1][0], media_service=service) == "caption:b"
+    assert len(service.calls) == 1
+
+
+def test_image_missing_from_batch_answer_is_retried_alone(captioner, images):
+    service = FakeMediaService(skip={b"b"})
+    assert captioner.caption_many(images, media_service=service) == ["caption:a", "caption:b", "caption:c"]
+    assert service.calls == [[b"a", b"b", b"c"], [b"b"]]
+
+
+def test_failed_batch_returns_error_text_and_is_not_cached(captioner, images):
+    class Broken(FakeMediaService):
+        def caption_images(self, images):
+            raise RuntimeError("quota")
+
+    captions = captioner.caption_many(images[:1], media_service=Broken())
+    assert captions == ["[Image caption failed: quota]"]
+    assert captioner.caption_many(images[:1], media_service=FakeMediaService()) == ["caption:a"]
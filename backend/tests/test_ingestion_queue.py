@@ -0,0 +1,149 @@
+"""
+Tests for the persistent ingestion job queue.
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.core.exceptions import IngestionQueueFull
+from app.services.ingestion_queue import PRIORITY_HIGH, PRIORITY_LOW, IngestionQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.ingestion_queue.settings.ingestion_retry_delay_seconds", 0.01)
+    q = IngestionQueue(path=str(tmp_path / "jobs.db"), workers=1, max_queued=3)
+    yield q
+    q.stop(timeout=2)
+
+
+def test_job_runs_reports_progress_and_cleans_up_files(queue, tmp_path):
+    upload = tmp_path / "upload.pdf"
+    upload.write_bytes(b"%PDF")
+
+    def handler(payload, job):
+        job.progress(0.5, "halfway")
+        assert upload.exists()
+        return {"indexed": payload["name"]}
+
+    queue.register("upload", handler)
+    job_id = queue.submit("upload", {"name": "doc"}, files=[str(upload)], created_by="u1")
+    job = queue.wait(job_id, timeout=5)
+
+    assert job["state"] == "completed" and job["progress"] == 1.0
+    assert job["message"] == "halfway"
+    assert job["result"] == {"indexed": "doc"}
+    assert not upload.exists()
+    assert [j["id"] for j in queue.list_jobs(created_by="u1")] == [job_id]
+    assert queue.list_jobs(created_by="someone-else") == []
+
+
+def test_failures_are_retried_then_marked_failed(queue, tmp_path):
+    upload = tmp_path / "upload.mp3"
+    upload.write_bytes(b"audio")
+    calls = []
+
+    def flaky(payload, job):
+        calls.append(job.attempt)
+        assert upload.exists()  # kept between attempts
+        raise RuntimeError("Gemini unavailable")
+
+    queue.register("flaky", flaky)
+    job = queue.wait(queue.submit("flaky", {}, files=[str(upload)], max_attempts=2), timeout=5)
+
+    assert calls == [1, 2]
+    assert job["state"] == "failed" and job["error"] == "Gemini unavailable"
+    assert upload.exists()  # kept so the job can be retried
+
+    assert queue.retry(job["id"]) is True
+    assert queue.wait(job["id"], timeout=5)["state"] == "failed"
+    assert calls == [1, 2, 1, 2]
+    queue.register("ok", lambda payload, job: None)
+    done = queue.wait(queue.submit("ok", {}), timeout=5)
+    assert queue.retry(done["id"]) is False
+
+
+def test_higher_priority_runs_first_and_queue_is_bounded(queue):
+    gate = threading.Event()
+    order = []
+    queue.register("blocker", lambda payload, job: gate.wait(5))
+    queue.register("work", lambda payload, job: order.append(payload["n"]))
+
+    blocker = queue.submit("blocker", {})
+    while queue.status(blocker)["state"] != "running":
+        time.sleep(0.01)
+    low = queue.submit("work", {"n": "low"}, priority=PRIORITY_LOW)
+    normal = queue.submit("work", {"n": "normal"})
+    high = queue.submit("work", {"n": "high"}, priority=PRIORITY_HIGH)
+    with pytest.raises(IngestionQueueFull):
+        queue.submit("work", {"n": "overflow"})
+
+    gate.set()
+    for job_id in (low, normal, high):
+        queue.wait(job_id, timeout=5)
+    assert order == ["high", "normal", "low"]
+
+
+def test_recover_requeues_interrupted_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    present = tmp_path / "present.txt"
+    present.write_text("x")
+
+    first = IngestionQueue(path=path, workers=1)
+    first.register("work", lambda payload, job: None)
+    conn = first._db()
+    conn.execute("INSERT INTO ingestion_jobs (id, kind, state, attempts, max_attempts, files) VALUES "
+                 "('a', 'work', 'running', 1, 3, ?), ('b', 'work', 'running', 1, 3, ?)",
+                 (f'["{present}"]', f'["{tmp_path / "gone.txt"}"]'))
+    conn.commit()
+
+    second = IngestionQueue(path=path, workers=1)
+    ran = []
+    second.register("work", lambda payload, job: ran.append(job.id))
+    try:
+        assert second.recover() == 1
+        assert second.wait("a", timeout=5)["state"] == "completed"
+        assert second.status("b")["state"] == "failed"
+        assert ran == ["a"]
+    finally:
+        second.stop(timeout=2)
+
+
+def test_unknown_kind_is_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit("nope", {})
+
+
+def test_failed_upload_can_be_retried_until_its_file_expires(queue, tmp_path, monkeypatch):
+    upload = tmp_path / "sermon.mp3"
+    upload.write_bytes(b"audio")
+    outcomes = iter([RuntimeError("quota"), None])
+
+    def handler(payload, job):
+        with open(payload["file_path"], "rb") as f:
+            f.read()
+        error = next(outcomes)
+        if error:
+            raise error
+        return {"indexed": True}
+
+    queue.register("knowledge_upload", handler)
+    job_id = queue.submit("knowledge_upload", {"file_path": str(upload)}, files=[str(upload)], max_attempts=1)
+    assert queue.wait(job_id, timeout=5)["state"] == "failed"
+
+    assert queue.retry(job_id) is True
+    job = queue.wait(job_id, timeout=5)
+    assert job["state"] == "completed" and job["result"] == {"indexed": True}
+    assert not upload.exists()
+
+    # A failed job whose file has expired cannot be retried
+    expired = tmp_path / "old.mp3"
+    expired.write_bytes(b"audio")
+    queue.register("broken", lambda payload, job: 1 / 0)
+    old_id = queue.wait(queue.submit("broken", {}, files=[str(expired)], max_attempts=1), timeout=5)["id"]
+    monkeypatch.setattr("app.services.ingestion_queue.settings.ingestion_failed_retention_hours", -1)
+    assert queue.purge_expired() == 1
+    assert not expired.exists()
+    assert queue.retry(old_id) is False
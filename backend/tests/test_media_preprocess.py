@@ -0,0 +1,53 @@
+"""
+Tests for long-media windowing and transcript stitching.
+"""
+
+from app.services.media_preprocess import Segment, plan_windows, prepare_segments, stitch_windows
+
+
+def test_plan_windows_covers_recording_with_overlap():
+    windows = plan_windows(1300, window=600, overlap=20)
+    assert windows == [(0.0, 600.0), (580.0, 1180.0), (1160.0, 1300)]
+    assert plan_windows(300, window=600, overlap=20) == [(0.0, 300)]
+
+
+def test_stitch_shifts_timestamps_and_drops_overlap_duplicates():
+    first = Segment("a.mp3", "audio/mp3", 0.0, 600.0)
+    second = Segment("b.mp3", "audio/mp3", 580.0, 1000.0)
+    text_a = "[00:00:05] Bienvenidos\n[00:09:45] Abran su Biblia\ncontinuación sin hora\n"
+    text_b = "[00:00:05] Abran su Biblia\n[00:00:30] en Juan 3"
+
+    stitched = stitch_windows([(first, text_a), (second, text_b)]).splitlines()
+    assert stitched == [
+        "[00:00:05] Bienvenidos",
+        "[00:09:45] Abran su Biblia",
+        "continuación sin hora",
+        "[00:10:10] en Juan 3",
+    ]
+
+
+def test_failed_window_leaves_gap_marker():
+    windows = [
+        (Segment("a", "audio/mp3", 0.0, 60.0), "[00:00:01] hola"),
+        (Segment("b", "audio/mp3", 50.0, 110.0), None),
+    ]
+    stitched = stitch_windows(windows)
+    assert stitched.startswith("[00:00:01] hola")
+    assert "[00:00:55–00:01:50]" in stitched
+
+
+def test_without_ffmpeg_original_file_is_used(monkeypatch):
+    monkeypatch.setattr("app.services.media_preprocess.ffmpeg_available", lambda: False)
+    assert prepare_segments("talk.mp4", "video/mp4") == [Segment("talk.mp4", "video/mp4")]
+
+
+def test_fingerprint_samples_head_and_tail_of_large_files(tmp_path):
+    from app.services.media_preprocess import media_fingerprint
+
+    a, b, c = tmp_path / "a", tmp_path / "b", tmp_path / "c"
+    a.write_bytes(b"x" * 100 + b"middle-1" + b"y" * 100)
+    b.write_bytes(b"x" * 100 + b"middle-2" + b"y" * 100)
+    c.write_bytes(b"x" * 100 + b"middle-1" + b"y" * 101)
+    assert media_fingerprint(str(a), sample_bytes=50) == media_fingerprint(str(b), sample_bytes=50)
+    assert media_fingerprint(str(a), sample_bytes=50) != media_fingerprint(str(c), sample_bytes=50)
+    assert media_fingerprint(str(a), sample_bytes=200) != media_fingerprint(str(b), sample_bytes=200)
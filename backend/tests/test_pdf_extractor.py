@@ -0,0 +1,62 @@
+"""
+Tests for shared PDF text extraction.
+"""
+
+import pytest
+
+from app.services import pdf_extractor
+
+
+def _write_pdf(path, pages):
+    """Minimal text PDF: one Helvetica line per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+    return str(path)
+
+
+@pytest.fixture
+def manual(tmp_path):
+    return _write_pdf(tmp_path / "manual.pdf", [f"Pagina {i}" for i in range(1, 8)])
+
+
+def test_pages_stream_in_order(manual):
+    pages = list(pdf_extractor.iter_pdf_pages(manual, parallel=False))
+    assert [n for n, _ in pages] == list(range(1, 8))
+    assert pages[2][1].strip() == "Pagina 3"
+
+
+def test_parallel_extraction_matches_serial(manual, monkeypatch):
+    monkeypatch.setattr(pdf_extractor.settings, "pdf_pages_per_task", 3)
+    monkeypatch.setattr(pdf_extractor.settings, "pdf_extract_processes", 2)
+    try:
+        parallel = list(pdf_extractor.iter_pdf_pages(manual, parallel=True))
+    finally:
+        pdf_extractor.shutdown_pdf_pool()
+    assert parallel == list(pdf_extractor.iter_pdf_pages(manual, parallel=False))
+
+
+def test_extract_pdf_text_joins_pages(manual):
+    text = pdf_extractor.extract_pdf_text(manual)
+    assert text.splitlines()[0].strip() == "Pagina 1"
+    assert "Pagina 7" in text
@@ -0,0 +1,84 @@
+"""
+Tests for per-upstream rate budgets and retries.
+"""
+
+import httpx
+import pytest
+
+from app.services import http_client, rate_limiter
+from app.services.rate_limiter import TokenBucket, Upstream, parse_retry_after
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records sleeps instead of waiting."""
+    recorded = []
+    monkeypatch.setattr(http_client.time, "sleep", recorded.append)
+    return recorded
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=10, burst=3)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.1, abs=0.02)
+    assert waits[4] == pytest.approx(0.2, abs=0.02)
+
+
+def test_pause_delays_every_caller():
+    bucket = TokenBucket(rate=100, burst=10)
+    bucket.pause(5)
+    assert bucket.reserve() == pytest.approx(5, abs=0.05)
+    assert bucket.reserve() == pytest.approx(5, abs=0.05)
+
+
+def test_parse_retry_after_seconds_and_garbage():
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_backoff_is_jittered_and_capped():
+    upstream = Upstream("x", rate=1, burst=1, backoff_base=1, backoff_max=8)
+    for attempt, ceiling in [(1, 1), (3, 4), (10, 8)]:
+        delay = upstream.backoff(attempt)
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_planning_center_headers_adopt_real_rate():
+    upstream = Upstream("planning_center", rate=1, burst=5)
+    headers = {"X-PCO-API-Request-Rate-Limit": "100", "X-PCO-API-Request-Rate-Period": "20"}
+    upstream.observe(headers, 200)
+    assert upstream.bucket.rate == pytest.approx(4.5)
+
+    # The same window on later responses leaves the bucket alone
+    upstream.bucket.set_rate = lambda *args, **kwargs: pytest.fail("rate re-applied")
+    upstream.observe(headers, 200)
+
+
+def test_client_retries_429_honouring_retry_after(sleeps, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_upstreams", {})
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(429, headers={"Retry-After": "3"}, request=request)
+        return httpx.Response(200, json={"ok": True}, request=request)
+
+    client = http_client.HttpClient(transport=httpx.MockTransport(handler))
+    response = client.get("https://api.example.com/x", upstream="brandfolder")
+    assert response.json() == {"ok": True}
+    assert len(calls) == 3
+    assert max(sleeps) >= 3
+
+
+def test_client_gives_up_after_max_retries(sleeps, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_upstreams", {})
+    monkeypatch.setattr(rate_limiter.settings, "http_max_retries", 2)
+
+    client = http_client.HttpClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(503, request=request))
+    )
+    response = client.get("https://api.example.com/x", upstream="planning_center")
+    assert response.status_code == 503
@@ -0,0 +1,271 @@
+"""
+Tests for the library sync worker pool and checkpointing.
+"""
+
+import sqlite3
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services import sync_service
+from app.services.brandfolder_service import BrandfolderAPI
+from app.services.sync_pipeline import Stage, StagePipeline
+
+
+@pytest.fixture
+def sync_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "app.db")
+    monkeypatch.setattr(sync_service, "DB_PATH", path)
+    sync_service._init_sync_log_table()
+    return path
+
+
+def test_pipeline_processes_every_item_through_all_stages():
+    """Every item should reach the last stage exactly once."""
+    seen = []
+    lock = threading.Lock()
+
+    def collect(x):
+        with lock:
+            seen.append(x)
+
+    pipeline = StagePipeline([
+        Stage("double", lambda x: x * 2, workers=3),
+        Stage("inc", lambda x: x + 1, workers=2),
+        Stage("collect", collect, workers=1),
+    ])
+    pipeline.run(range(50))
+    assert sorted(seen) == [x * 2 + 1 for x in range(50)]
+
+
+def test_pipeline_failure_drops_only_that_item():
+    """A stage exception should be reported and not stop other items."""
+    errors = []
+    done = []
+
+    def flaky(x):
+        if x == 3:
+            raise RuntimeError("boom")
+        return x
+
+    pipeline = StagePipeline(
+        [Stage("flaky", flaky, workers=2), Stage("done", done.append)],
+        on_error=lambda item, stage, e: errors.append((item, stage)),
+    )
+    pipeline.run(range(6))
+    assert errors == [(3, "flaky")]
+    assert sorted(done) == [0, 1, 2, 4, 5]
+
+
+def test_extract_checkpoints_content_and_resume_skips_download(sync_db):
+    """Extracted content is checkpointed; a resumed item skips metadata/download/extract."""
+    bf_api = MagicMock()
+    workers = sync_service._SyncWorkers(bf_api, MagicMock(), MagicMock(), log_id=1, stats={})
+
+    item = sync_service.SyncItem("a1", "Guide", "document", "https://x/a1", row_id=1)
+    workers.extract(item)
+    assert "Asset: Guide" in item.content
+
+    conn = sqlite3.connect(sync_db)
+    c = conn.cursor()
+    restored = sync_service._load_checkpoint(c, "a1")
+    conn.close()
+    assert restored == item.content
+
+    resumed = sync_service.SyncItem("a1", "Guide", "document", "https://x/a1", row_id=1, content=restored)
+    workers.metadata(resumed)
+    workers.download(resumed)
+    bf_api.get_asset_details.assert_not_called()
+    bf_api.download_attachment.assert_not_called()
+
+
+def test_duplicate_media_reuses_indexed_transcript_and_embeddings(sync_db, tmp_path, monkeypatch):
+    from app.services import research_service
+
+    monkeypatch.setattr(research_service, "DB_PATH", sync_db)
+    research_service.ResearchService._init_db(None)
+    original = tmp_path / "original.mp4"
+    original.write_bytes(b"sermon bytes")
+    fingerprint = sync_service.media_fingerprint(str(original))
+    conn = sqlite3.connect(sync_db)
+    conn.execute(
+        "INSERT INTO research_assets (session_id, asset_id, name, status, content, content_hash) VALUES (?,?,?,?,?,?)",
+        ("s", "a1", "Sermon (EN)", "indexed",
+         "Asset: Sermon (EN)\nType: video\n\n--- TRANSCRIPT ---\n" + "palabra " * 20, fingerprint)
+    )
+    conn.commit()
+    conn.close()
+
+    copy = tmp_path / "copy.mp4"
+    copy.write_bytes(b"sermon bytes")
+    bf_api = MagicMock()
+    bf_api.download_attachment.return_value = str(copy)
+    media = MagicMock()
+    rag = MagicMock()
+    rag.store.stored_chunks.return_value = [("chunk", [0.5])]
+    workers = sync_service._SyncWorkers(bf_api, media, rag, log_id=1, stats={})
+
+    item = sync_service.SyncItem("a2", "Sermon (crop)", "video", "https://x/a2", row_id=2, fresh_url="https://cdn/a2")
+    for stage in (workers.download, workers.extract, workers.embed):
+        item = stage(item)
+
+    media.transcribe_media.assert_not_called()
+    assert not copy.exists()
+    assert item.content.startswith("Asset: Sermon (crop)\nType: video\n\n--- TRANSCRIPT ---")
+    assert item.content_hash == fingerprint
+    rag.store.stored_chunks.assert_called_once_with(
+        "https://brandfolder.com/workbench/a1", header="Asset: Sermon (crop)\nType: video"
+    )
+    rag.store.prepare_chunks.assert_not_called()
+    assert item.prepared == [("chunk", [0.5])]
+
+
+def test_watermarks_advance_except_for_failed_brandfolders():
+    """The newest updated_at becomes the mark unless the brandfolder had a failure."""
+    previous = {"bf1": "2024-01-01T00:00:00Z", "bf2": "2024-01-01T00:00:00Z"}
+    listed = {
+        "bf1": ["2024-03-01T10:00:00.000Z", "2024-02-01T00:00:00Z", None],
+        "bf2": ["2024-05-01T00:00:00Z"],
+        "bf3": [],
+    }
+    marks = sync_service._advance_watermarks(previous, listed, failed_brandfolders={"bf2"})
+    assert marks == {"bf1": "2024-03-01T10:00:00.000Z", "bf2": "2024-01-01T00:00:00Z"}
+
+
+def test_is_updated_after_compares_timestamps():
+    from app.services.brandfolder_service import is_updated_after
+
+    asset = {"attributes": {"updated_at": "2024-03-01T10:00:00.000Z"}}
+    assert is_updated_after(asset, "2024-03-01T09:59:59Z")
+    assert not is_updated_after(asset, "2024-03-01T10:00:00Z")
+    assert is_updated_after(asset, None)
+
+
+def test_bulk_existence_check_uses_cache_then_batches(sync_db):
+    """Cached sources skip the vector-DB lookup; hits are remembered for next run."""
+    sync_service.remember_sources(["s1"])
+    rag = MagicMock()
+    rag.existing_sources.return_value = {"s2"}
+
+    conn = sqlite3.connect(sync_db)
+    c = conn.cursor()
+    found = sync_service._sources_in_vector_db(c, rag, ["s1", "s2", "s3"])
+    assert found == {"s1", "s2"}
+    rag.existing_sources.assert_called_once_with(["s2", "s3"])
+    assert sync_service._known_sources(c) == {"s1", "s2"}
+
+    sync_service.forget_sources(["s1"])
+    assert sync_service._known_sources(c) == {"s2"}
+    conn.close()
+
+
+def test_existing_sources_batches_in_queries():
+    from app.services.vector_store import VectorStoreService
+
+    service = VectorStoreService.__new__(VectorStoreService)
+    service.supabase = MagicMock()
+    service.local_index = None
+    query = service.supabase.table.return_value.select.return_value.in_
+    query.return_value.execute.return_value = MagicMock(data=[{"source": "a"}])
+
+    found = service.existing_sources(["a", "b", "c", "a"], batch_size=2)
+    assert found == {"a"}
+    assert [call.args[1] for call in query.call_args_list] == [["a", "b"], ["c"]]
+
+
+def _run_fake_sync(sync_db, monkeypatch, partial_listing=False, failing=(), stamps=None, seed=True):
+    """full_sync against fakes: a1 indexed locally, a2 in the vector DB, a3 new."""
+    from app.services import brandfolder_service, media_service, rag_service, research_service
+
+    stamps = stamps or {f"a{i}": f"2024-0{i}-01T00:00:00Z" for i in (1, 2, 3)}
+    if seed:
+        monkeypatch.setattr(research_service, "DB_PATH", sync_db)
+        research_service.ResearchService._init_db(None)
+        conn = sqlite3.connect(sync_db)
+        conn.execute("INSERT INTO research_assets (session_id, asset_id, name, status) VALUES ('s', 'a1', 'Old', 'indexed')")
+        conn.commit()
+        conn.close()
+
+    def asset(asset_id):
+        return {"id": asset_id, "attributes": {"name": f"Asset {asset_id[1:]}", "updated_at": stamps[asset_id]}}
+
+    class FakeAPI(BrandfolderAPI):
+        def __init__(self):
+            super().__init__(api_key="test")
+
+        def get_brandfolders(self):
+            return [{"id": "bf", "attributes": {"name": "Main"}}]
+
+        def iter_assets(self, on_incomplete=None, updated_since=None, **kwargs):
+            for asset_id in sorted(stamps, key=stamps.get, reverse=True):
+                if brandfolder_service.is_updated_after(asset(asset_id), updated_since):
+                    yield asset(asset_id)
+            if partial_listing:
+                on_incomplete()
+
+        def get_asset_details(self, asset_id):
+            return asset(asset_id)
+
+    def add_document(content, source, **kwargs):
+        if source.rsplit("/", 1)[-1] in failing:
+            raise RuntimeError("write failed")
+        return True
+
+    rag = MagicMock()
+    rag.existing_sources.return_value = {"https://brandfolder.com/workbench/a2"}
+    rag.store.prepare_chunks.return_value = [("chunk", [1.0])]
+    rag.add_document.side_effect = add_document
+
+    monkeypatch.setattr(brandfolder_service, "BrandfolderAPI", FakeAPI)
+    monkeypatch.setattr(media_service, "MediaService", MagicMock)
+    monkeypatch.setattr(rag_service, "RAGManager", lambda: rag)
+
+    sync_service.full_sync(full=False)
+    return rag, sync_service.get_last_sync_status()
+
+
+def test_full_sync_streams_assets_and_skips_known_ones(sync_db, monkeypatch):
+    """End-to-end run with fakes: one asset indexed locally, one in the vector DB, one new."""
+    rag, status = _run_fake_sync(sync_db, monkeypatch)
+    assert status["status"] == "completed"
+    assert (status["total_found"], status["new_indexed"], status["skipped"], status["failed"]) == (3, 1, 2, 0)
+    rag.add_document.assert_called_once()
+    assert rag.add_document.call_args.args[1] == "https://brandfolder.com/workbench/a3"
+    assert '"bf": "2024-03-01T00:00:00Z"' in status["watermarks"]
+
+
+def test_partial_listing_keeps_previous_watermark(sync_db, monkeypatch):
+    """A page lost after retries must not let the watermark skip the older changes it held."""
+    rag, status = _run_fake_sync(sync_db, monkeypatch, partial_listing=True)
+    assert status["status"] == "completed"
+    assert '"bf"' not in status["watermarks"]
+
+
+def test_failed_asset_is_retried_without_holding_the_watermark(sync_db, monkeypatch):
+    """One failing asset is retried by id; the brandfolder's other changes are not re-processed."""
+    rag, status = _run_fake_sync(sync_db, monkeypatch, failing={"a3"})
+    assert status["failed"] == 1
+    assert '"bf": "2024-03-01T00:00:00Z"' in status["watermarks"]
+
+    rag, status = _run_fake_sync(sync_db, monkeypatch, seed=False)
+    assert (status["total_found"], status["new_indexed"], status["failed"]) == (1, 1, 0)
+    assert [c.args[1] for c in rag.add_document.call_args_list] == ["https://brandfolder.com/workbench/a3"]
+
+    conn = sqlite3.connect(sync_db)
+    assert sync_service._failed_assets(conn.cursor()) == []
+    conn.close()
+
+
+def test_relisted_unchanged_asset_is_not_reindexed(sync_db, monkeypatch):
+    """With the watermark kept (partial listing), assets indexed at their current updated_at are skipped."""
+    _run_fake_sync(sync_db, monkeypatch)
+    stamps = {"a1": "2024-01-01T00:00:00Z", "a2": "2024-02-01T00:00:00Z", "a3": "2024-04-01T00:00:00Z"}
+    rag, status = _run_fake_sync(sync_db, monkeypatch, partial_listing=True, stamps=stamps, seed=False)
+    assert rag.add_document.call_args.kwargs["replace"] is True
+    assert '"bf": "2024-03-01T00:00:00Z"' in status["watermarks"]
+
+    rag, status = _run_fake_sync(sync_db, monkeypatch, stamps=stamps, seed=False)
+    rag.add_document.assert_not_called()
+    assert (status["total_found"], status["skipped"]) == (1, 1)
+    assert '"bf": "2024-04-01T00:00:00Z"' in status["watermarks"]
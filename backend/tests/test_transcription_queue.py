@@ -0,0 +1,151 @@
+"""
+Tests for the durable transcription queue.
+"""
+
+import threading
+
+import pytest
+
+from app.core.exceptions import MediaProcessingTimeout
+from app.services.media_preprocess import Segment
+from app.services.transcription_queue import TranscriptionQueue
+
+
+class FakeMediaService:
+    def __init__(self, fail_with=None, gate=None):
+        self.fail_with = fail_with
+        self.gate = gate
+        self.uploads = 0
+        self.deleted = []
+
+    def upload_media(self, file_path, mime_type):
+        self.uploads += 1
+        return f"files/{self.uploads}"
+
+    def wait_until_active(self, media_file):
+        if self.gate:
+            self.gate.wait(5)
+        if self.fail_with:
+            raise self.fail_with
+        return media_file
+
+    def generate_transcript(self, media_file, timestamped=False):
+        return f"transcript of {media_file}"
+
+    def delete_remote(self, media_file):
+        self.deleted.append(media_file)
+
+
+@pytest.fixture(autouse=True)
+def no_ffmpeg(monkeypatch):
+    monkeypatch.setattr("app.services.media_preprocess.ffmpeg_available", lambda: False)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return TranscriptionQueue(path=str(tmp_path / "jobs.db"), workers=2)
+
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "sermon.mp3"
+    path.write_bytes(b"same bytes")
+    return str(path)
+
+
+def test_same_content_is_transcribed_once(queue, media, tmp_path):
+    service = FakeMediaService()
+    first = queue.transcribe(media, "audio/mp3", media_service=service)
+
+    copy = tmp_path / "copy.mp3"
+    copy.write_bytes(b"same bytes")
+    second_id = queue.submit(str(copy), "audio/mp3", media_service=service)
+
+    assert queue.wait(second_id) == first == "transcript of files/1"
+    assert queue.status(second_id)["state"] == "completed"
+    assert service.uploads == 1
+    assert service.deleted == ["files/1"]
+
+
+def test_failure_is_raised_as_its_type_and_recorded(queue, media):
+    service = FakeMediaService(fail_with=MediaProcessingTimeout("slow"))
+    job_id = queue.submit(media, "audio/mp3", media_service=service)
+
+    with pytest.raises(MediaProcessingTimeout):
+        queue.wait(job_id)
+    job = queue.status(job_id)
+    assert job["state"] == "failed"
+    assert job["error_type"] == "MediaProcessingTimeout"
+    assert service.deleted == ["files/1"]  # remote copy cleaned up either way
+    assert queue.cached_transcript(job["content_hash"]) is None
+
+
+def test_concurrent_submits_of_same_bytes_share_a_job(queue, media):
+    gate = threading.Event()
+    service = FakeMediaService(gate=gate)
+    first = queue.submit(media, "audio/mp3", media_service=service)
+    second = queue.submit(media, "audio/mp3", media_service=service)
+    gate.set()
+
+    assert first == second
+    assert queue.wait(first) == "transcript of files/1"
+    assert service.uploads == 1
+
+
+def test_recover_fails_jobs_whose_file_is_gone(tmp_path, media):
+    path = str(tmp_path / "jobs.db")
+    queue = TranscriptionQueue(path=path, workers=1)
+    queue._db().execute(
+        "INSERT INTO transcription_jobs (id, content_hash, file_path, mime_type, state) VALUES "
+        "('lost', 'h1', '/nope.mp3', 'audio/mp3', 'processing')"
+    )
+    queue._db().commit()
+
+    assert TranscriptionQueue(path=path, workers=1).recover() == 0
+    assert queue.status("lost")["state"] == "failed"
+
+
+def test_long_media_windows_are_stitched_and_partial_results_not_cached(queue, media, monkeypatch):
+    segments = [Segment(f"w{i}.mp3", "audio/mp3", i * 50.0, i * 50.0 + 60.0) for i in range(3)]
+    monkeypatch.setattr("app.services.transcription_queue.prepare_segments", lambda path, mime: segments)
+
+    class WindowService(FakeMediaService):
+        def upload_media(self, file_path, mime_type):
+            if file_path == "w1.mp3":
+                raise MediaProcessingTimeout("window lost")
+            return file_path
+
+        def generate_transcript(self, media_file, timestamped=False):
+            assert timestamped
+            return f"[00:00:10] start of {media_file}\n[00:00:58] end of {media_file}"
+
+    job_id = queue.submit(media, "audio/mp3", media_service=WindowService())
+    transcript = queue.wait(job_id)
+
+    assert "[00:00:10] start of w0.mp3" in transcript
+    assert "[00:01:50] start of w2.mp3" in transcript
+    assert "Sin transcripción" in transcript
+    job = queue.status(job_id)
+    assert job["state"] == "completed" and "1 of 3" in job["error"]
+    assert queue.cached_transcript(job["content_hash"]) is None
+
+
+def test_transcript_cache_keeps_newest_entries(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.transcription_queue.settings.transcript_cache_max_entries", 2)
+    service = FakeMediaService()
+    hashes = []
+    for i in range(3):
+        path = tmp_path / f"talk{i}.mp3"
+        path.write_bytes(f"talk {i}".encode())
+        job_id = queue.submit(str(path), "audio/mp3", media_service=service)
+        queue.wait(job_id, timeout=5)
+        hashes.append(queue.status(job_id)["content_hash"])
+
+    assert queue.cached_transcript(hashes[0]) is None
+    assert queue.cached_transcript(hashes[1]) is not None
+    assert queue.cached_transcript(hashes[2]) is not None
+
+
+def test_missing_job_row_is_skipped(queue):
+    queue._run("no-such-job", media_service=FakeMediaService())
+    assert queue.status("no-such-job") is None
@@ -0,0 +1,43 @@
+"""
+Tests for the compact embedding wire encoding.
+"""
+
+import base64
+import struct
+
+import pytest
+
+from app.services.vector_codec import decode_vector, encode_vector, l2_normalize
+
+
+def test_json_format_keeps_plain_lists():
+    assert encode_vector((0.5, -1.0), "json") == [0.5, -1.0]
+
+
+def test_float32_round_trip_is_big_endian_and_smaller():
+    vector = [((i * 7919) % 1000 - 500) / 12345.678 for i in range(3072)]  # embedding-like magnitudes
+    encoded = encode_vector(vector, "float32")
+
+    assert base64.b64decode(encoded)[:4] == struct.pack(">f", vector[0])
+    assert decode_vector(encoded, "float32") == pytest.approx(vector, rel=1e-6)
+    assert len(encoded) * 3 < len(str(vector))
+
+
+def test_float16_round_trip_within_half_precision():
+    vector = [0.0123, -0.5, 0.25, 1e-3]
+    encoded = encode_vector(vector, "float16")
+    assert len(base64.b64decode(encoded)) == 2 * len(vector)
+    assert decode_vector(encoded, "float16") == pytest.approx(vector, rel=1e-3)
+
+
+def test_decode_ignores_postgres_line_breaks():
+    encoded = encode_vector([1.0] * 40, "float32")
+    wrapped = "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+    assert decode_vector(wrapped, "float32") == [1.0] * 40
+
+
+def test_unknown_format_and_normalization():
+    with pytest.raises(ValueError):
+        encode_vector([1.0], "int8")
+    assert l2_normalize([3.0, 4.0]) == pytest.approx([0.6, 0.8])
+    assert l2_normalize([0.0, 0.0]) == [0.0, 0.0]
@@ -0,0 +1,372 @@
+"""
+Tests for the vector store embedding pipeline.
+"""
+
+import os
+import sqlite3
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.embedding_cache import EmbeddingCache, cache_key
+from app.services.lexical_index import LexicalIndex, build_match_query
+from app.services.vector_store import VectorStoreService, reciprocal_rank_fusion
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    """Point the embedding cache and lexical index at throwaway DBs for every test."""
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), max_entries=10)
+    monkeypatch.setattr("app.services.vector_store.embedding_cache", cache)
+    monkeypatch.setattr("app.services.vector_store.lexical_index", LexicalIndex(path=str(tmp_path / "fts.db")))
+    return cache
+
+
+def _service(embed_side_effect):
+    service = VectorStoreService.__new__(VectorStoreService)
+    service.supabase = MagicMock()
+    service.local_index = None
+    service.client = MagicMock()
+    service.embedding_model = "test-embedding"
+    service.client.models.embed_content.side_effect = embed_side_effect
+    return service
+
+
+def _response(texts):
+    return SimpleNamespace(
+        embeddings=[SimpleNamespace(values=[float(len(t))]) for t in texts]
+    )
+
+
+def test_embed_batch_groups_calls(monkeypatch):
+    """Many chunks should be embedded in a few batched calls, preserving order."""
+    monkeypatch.setattr("app.services.vector_store.settings.embedding_batch_size", 2)
+    service = _service(lambda model, contents: _response(contents))
+
+    vectors = service.embed_batch(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    assert vectors == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert service.client.models.embed_content.call_count == 3
+
+
+def test_embed_batch_isolates_bad_chunk(monkeypatch):
+    """A batch that keeps failing falls back to per-chunk calls."""
+    monkeypatch.setattr("app.services.vector_store.settings.embedding_max_retries", 1)
+
+    def embed(model, contents):
+        items = contents if isinstance(contents, list) else [contents]
+        if "bad" in items:
+            raise ValueError("invalid input")
+        return _response(items)
+
+    service = _service(embed)
+    vectors = service.embed_batch(["ok", "bad", "fine"])
+
+    assert vectors == [[2.0], [], [4.0]]
+
+
+def test_embed_batch_reuses_cached_vectors():
+    """Identical text is only sent to Gemini once across calls."""
+    service = _service(lambda model, contents: _response(contents))
+
+    service.embed_batch(["alpha", "beta"])
+    vectors = service.embed_batch(["alpha", "beta", "gamma"])
+
+    assert vectors == [[5.0], [4.0], [5.0]]
+    assert service.client.models.embed_content.call_count == 2
+    assert service.embed_query("  alpha\n") == [5.0]
+    assert service.client.models.embed_content.call_count == 2
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "lru.db"), max_entries=3)
+    cache.put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    cache.get("m", "a")  # touch "a" so "b" is now the oldest
+    cache.put("m", "d", [4.0])
+
+    assert cache.get("m", "a") == [1.0]
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "d") == [4.0]
+
+
+def test_embedding_cache_rewrites_do_not_count_as_new_entries(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "lru.db"), max_entries=3)
+    for _ in range(3):
+        cache.put_many("m", ["a", "b"], [[1.0], [2.0]])
+    cache.put_many("m", ["c", "c"], [[3.0], [3.0]])
+
+    assert cache._count == 3
+    assert cache.get("m", "a") == [1.0]
+    assert cache.get("m", "b") == [2.0]
+
+
+def test_cache_key_is_model_scoped_and_whitespace_insensitive():
+    assert cache_key("m1", "hola  mundo") == cache_key("m1", " hola mundo\n")
+    assert cache_key("m1", "hola") != cache_key("m2", "hola")
+
+
+def test_search_similar_caches_until_invalidated(monkeypatch):
+    """Repeated questions skip the RPC until the knowledge base changes."""
+    from app.services.vector_store import SearchResultCache
+
+    monkeypatch.setattr("app.services.vector_store.search_cache", SearchResultCache(ttl=60, max_entries=8))
+    service = _service(lambda model, contents: _response([contents]))
+    service.supabase.rpc.return_value.execute.return_value = SimpleNamespace(
+        data=[{"document_id": "doc-1", "content": "Waumba Land"}]
+    )
+
+    first = service.search_similar("¿Qué es Waumba Land?", limit=3, mode="vector")
+    second = service.search_similar("  ¿qué es waumba land? ", limit=3, mode="vector")
+    assert first == second == "[Source: doc-1]\nWaumba Land"
+    assert service.supabase.rpc.call_count == 1
+
+    service.invalidate_search_cache()
+    service.search_similar("¿Qué es Waumba Land?", limit=3, mode="vector")
+    assert service.supabase.rpc.call_count == 2
+
+
+def test_local_index_exact_and_ivf_search(monkeypatch, tmp_path):
+    """Local ANN index finds nearest chunks, honours tombstones and survives IVF training."""
+    import numpy as np
+    from app.services.local_index import LocalVectorIndex
+
+    monkeypatch.setattr("app.services.local_index.settings.local_index_min_train_size", 50)
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(200, 16)).astype(np.float32)
+
+    index = LocalVectorIndex(path=str(tmp_path / "idx"))
+    index.add_document("doc-a", "src-a", "A", [(i, f"a{i}", vectors[i]) for i in range(100)])
+    index.add_document("doc-b", "src-b", "B", [(i, f"b{i}", vectors[100 + i]) for i in range(100)])
+
+    hits = index.search(vectors[150], limit=3)
+    assert hits[0]["content"] == "b50"
+    assert hits[0]["similarity"] > 0.99
+
+    index.train(nlist=8)
+    assert index.search(vectors[150], limit=1)[0]["content"] == "b50"
+
+    index.delete_document("doc-b")
+    assert index.count() == 100
+    assert all(h["document_id"] == "doc-a" for h in index.search(vectors[150], limit=5, threshold=-1))
+
+    # Reopening from disk restores the same state
+    reopened = LocalVectorIndex(path=str(tmp_path / "idx"))
+    assert reopened.count() == 100
+    assert reopened.search(vectors[10], limit=1)[0]["content"] == "a10"
+
+
+def test_local_index_drops_vectors_of_uncommitted_rows(tmp_path):
+    """Vectors appended without their rows (crash or failed insert) never shift later row ids."""
+    import numpy as np
+    from app.services.local_index import LocalVectorIndex
+
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(6, 8)).astype(np.float32)
+    index = LocalVectorIndex(path=str(tmp_path / "idx"))
+    index.add_document("doc-a", "src-a", "A", [(i, f"a{i}", vectors[i]) for i in range(2)])
+
+    # Crash between the vector append and the rows commit
+    with open(index._vectors_path, "ab") as f:
+        f.write(vectors[2:4].tobytes())
+    reopened = LocalVectorIndex(path=str(tmp_path / "idx"))
+    reopened.add_document("doc-b", "src-b", "B", [(0, "b0", vectors[4])])
+    assert reopened.search(vectors[4], limit=1)[0]["content"] == "b0"
+
+    # Failed rows insert: the appended vectors are truncated right away
+    reopened._conn.execute("CREATE TRIGGER no_rows BEFORE INSERT ON rows BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    with pytest.raises(sqlite3.IntegrityError):
+        reopened.add_document("doc-c", "src-c", "C", [(0, "c0", vectors[5])])
+    reopened._conn.execute("DROP TRIGGER no_rows")
+    assert os.path.getsize(reopened._vectors_path) == 3 * 8 * 4
+    assert reopened.get_document_id("src-c") is None
+    reopened.add_document("doc-d", "src-d", "D", [(0, "d0", vectors[5])])
+    assert reopened.search(vectors[5], limit=1)[0]["content"] == "d0"
+
+
+def test_lexical_index_matches_exact_names_without_accents(tmp_path):
+    index = LexicalIndex(path=str(tmp_path / "fts.db"))
+    index.add_document("doc-1", [(0, "GroupLink conecta adultos con grupos pequeños."), (1, "Otro tema.")])
+    index.add_document("doc-2", [(0, "Waumba Land es el programa para niños de 0 a 5 años.")])
+
+    assert index.search("waumba land")[0]["document_id"] == "doc-2"
+    assert index.search("ninos")[0]["document_id"] == "doc-2"
+    assert index.search('GroupLink" OR *')[0]["document_id"] == "doc-1"
+
+    index.delete_document("doc-2")
+    assert index.search("waumba") == []
+    assert build_match_query("¿?") == ""
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    vector = [{"document_id": "a", "content": "1"}, {"document_id": "b", "content": "2"}]
+    lexical = [{"document_id": "c", "content": "3"}, {"document_id": "b", "content": "2"}]
+
+    fused = reciprocal_rank_fusion([vector, lexical], limit=2)
+
+    assert [f["document_id"] for f in fused] == ["b", "a"]
+
+
+def test_store_document_replace_deletes_previous_version():
+    """replace=True stores the new document, then removes the old one's rows."""
+    service = _service(lambda model, contents: _response(contents))
+    table = service.supabase.table.return_value
+    table.select.return_value.eq.return_value.execute.return_value = SimpleNamespace(data=[{"id": "old"}])
+
+    assert service.store_document("Hello", "src", prepared=[("Hello", [1.0])]) is False
+    assert service.store_document("Hello", "src", prepared=[("Hello", [1.0])], replace=True) is True
+    deleted = [c.args for c in table.delete.return_value.eq.call_args_list]
+    assert ("document_id", "old") in deleted
+    assert ("id", "old") in deleted
+
+
+def test_output_dimensionality_is_requested_normalized_and_cached_apart(monkeypatch, isolated_cache):
+    monkeypatch.setattr("app.services.vector_store.settings.embedding_output_dimensionality", 2)
+    calls = []
+
+    def embed(model, contents, config=None):
+        calls.append(config)
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[3.0, 4.0]) for _ in contents])
+
+    service = _service(embed)
+    assert service.embed_batch(["a", "b"]) == [pytest.approx([0.6, 0.8])] * 2
+    assert calls[0].output_dimensionality == 2
+    assert isolated_cache.get("test-embedding@2", "a") == pytest.approx([0.6, 0.8])
+    assert isolated_cache.get("test-embedding", "a") is None
+
+
+class MissingColumn(Exception):
+    code = "42703"
+
+
+def _listing_service(pages):
+    """Service whose documents query returns `pages` (lists of rows, or exceptions) in turn."""
+    service = _service(lambda model, contents: _response(contents))
+    query = MagicMock()
+    for method in ("select", "eq", "neq", "like", "or_", "order", "limit"):
+        getattr(query, method).return_value = query
+    query.not_ = query
+    query.execute.side_effect = [p if isinstance(p, Exception) else SimpleNamespace(data=p) for p in pages]
+    service.supabase.table.return_value = query
+    return service, query
+
+
+def _doc(i):
+    return {"id": f"d{i}", "source": f"file://{i}", "created_at": f"2026-01-{10 - i:02d}T00:00:00+00:00", "chunk_count": i}
+
+
+def test_list_documents_pages_with_keyset_cursor():
+    service, query = _listing_service([[_doc(1), _doc(2), _doc(3)], [_doc(3)]])
+
+    docs, cursor = service.list_documents("direct", limit=2)
+    assert [d["id"] for d in docs] == ["d1", "d2"] and cursor
+    query.eq.assert_called_with("source_type", "direct")
+    query.limit.assert_called_with(3)
+    service.supabase.table.assert_called_with("documents")
+
+    docs, cursor = service.list_documents("direct", limit=2, cursor=cursor)
+    assert [d["id"] for d in docs] == ["d3"] and cursor is None
+    keyset = query.or_.call_args.args[0]
+    assert 'created_at.lt."2026-01-08T00:00:00+00:00"' in keyset and 'id.lt."d2"' in keyset
+
+
+def test_list_documents_counts_in_one_request_without_migration():
+    fallback = dict(_doc(1), document_chunks=[{"count": 7}])
+    del fallback["chunk_count"]
+    service, query = _listing_service([MissingColumn("column documents.chunk_count does not exist"), [fallback]])
+
+    docs, cursor = service.list_documents("web", limit=5)
+    assert docs[0]["chunk_count"] == 7 and "document_chunks" not in docs[0]
+    assert "document_chunks(count)" in query.select.call_args.args[0]
+    assert query.execute.call_count == 2
+    assert service._listing_columns is False
+
+
+def test_list_documents_rejects_bad_cursor():
+    service, _ = _listing_service([])
+    with pytest.raises(ValueError):
+        service.list_documents(cursor="not-a-cursor")
+
+
+def test_store_document_without_embeddings_writes_nothing():
+    service = _service(lambda model, contents: _response(contents))
+    table = service.supabase.table.return_value
+    table.select.return_value.eq.return_value.execute.return_value = SimpleNamespace(data=[])
+
+    assert service.store_document("Hello", "src", prepared=[("Hello", [])]) is False
+    service.supabase.rpc.assert_not_called()
+    table.insert.assert_not_called()
+
+
+def test_stored_chunks_renames_the_reused_header():
+    """Chunks reused for a duplicate asset carry its own header; only the first chunk is re-embedded."""
+    service = _service(lambda model, contents: _response(contents))
+    service._writer = MagicMock(client=service.supabase)
+    service._writer.read_chunks.return_value = [
+        ("Asset: Sermon (EN)\nType: video\n\n--- TRANSCRIPT ---\nHola", [0.1]),
+        ("segundo", [0.2]),
+    ]
+    table = service.supabase.table.return_value
+    table.select.return_value.eq.return_value.limit.return_value.execute.return_value = SimpleNamespace(
+        data=[{"id": "doc-1"}]
+    )
+
+    chunks = service.stored_chunks("src", header="Asset: Sermon (crop)\nType: video")
+
+    first = "Asset: Sermon (crop)\nType: video\n\n--- TRANSCRIPT ---\nHola"
+    assert chunks == [(first, [float(len(first))]), ("segundo", [0.2])]
+    assert service.client.models.embed_content.call_count == 1
+
+
+def test_hybrid_search_uses_vector_only_until_lexical_index_is_backfilled(monkeypatch, tmp_path):
+    """Documents indexed before the lexical index existed must not be outranked by the few it covers."""
+    from app.services.vector_store import SearchResultCache
+
+    monkeypatch.setattr("app.services.vector_store.search_cache", SearchResultCache(ttl=60, max_entries=8))
+    lexical = LexicalIndex(path=str(tmp_path / "fts.db"))
+    lexical.search = MagicMock(wraps=lexical.search)
+    monkeypatch.setattr("app.services.vector_store.lexical_index", lexical)
+    service = _service(lambda model, contents: _response([contents]))
+    service.supabase.rpc.return_value.execute.return_value = SimpleNamespace(
+        data=[{"document_id": "doc-1", "content": "Waumba Land"}]
+    )
+
+    # A new document alone does not make the index complete
+    lexical.add_document("doc-2", [(0, "Waumba Land para preescolares")])
+    assert "preescolares" not in service.search_similar("Waumba", limit=3, mode="hybrid")
+    lexical.search.assert_not_called()
+
+    client = MagicMock()
+    client.table.return_value.select.return_value.order.return_value.range.return_value.execute.return_value = \
+        SimpleNamespace(data=[{"document_id": "doc-2", "chunk_index": 0, "content": "Waumba Land para preescolares"}])
+    assert lexical.rebuild_from_supabase(client) == 1
+    assert "preescolares" in service.search_similar("Waumba", limit=3, mode="hybrid")
+    lexical.search.assert_called_once()
+    assert LexicalIndex(path=str(tmp_path / "fts.db")).is_backfilled()
+
+
+def test_match_skips_staged_documents_without_migration_007():
+    """match_documents results are filtered against staged documents when the published RPC is missing."""
+    class MissingFunction(Exception):
+        code = "PGRST202"
+
+    service = _service(lambda model, contents: _response(contents))
+
+    def rpc(name, params):
+        call = MagicMock()
+        if name == "match_published_documents":
+            call.execute.side_effect = MissingFunction("Could not find the function")
+        else:
+            call.execute.return_value = SimpleNamespace(data=[
+                {"document_id": "live", "content": "published", "similarity": 0.9},
+                {"document_id": "staged", "content": "half written", "similarity": 0.8},
+            ])
+        return call
+
+    service.supabase.rpc.side_effect = rpc
+    staged = service.supabase.table.return_value.select.return_value.in_.return_value.like.return_value
+    staged.execute.return_value = SimpleNamespace(data=[{"id": "staged"}])
+
+    rows = service._match([1.0], limit=5, threshold=0.5)
+    assert [r["document_id"] for r in rows] == ["live"]
+    assert service._published_match is False
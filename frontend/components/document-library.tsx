@@ -79,6 +79,8 @@ export function DocumentLibrary() {
     const [search, setSearch] = useState("");
     const [filter, setFilter] = useState<"all" | "direct" | "brandfolder" | "web">("all");
     const [deletingId, setDeletingId] = useState<string | null>(null);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
 
     const fetchDocuments = useCallback(async () => {
         setIsLoading(true);
@@ -86,6 +88,7 @@ export function DocumentLibrary() {
         try {
             const res = await api.get(`/knowledge/documents?source_type=${filter}&limit=200`);
             setDocuments(res.data.documents || []);
+            setNextCursor(res.data.next_cursor || null);
         } catch (e: any) {
             setError("No se pudieron cargar los documentos.");
         } finally {
@@ -93,6 +96,20 @@ export function DocumentLibrary() {
         }
     }, [filter]);
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setIsLoadingMore(true);
+        try {
+            const res = await api.get(`/knowledge/documents?source_type=${filter}&limit=200&cursor=${encodeURIComponent(nextCursor)}`);
+            setDocuments(prev => [...prev, ...(res.data.documents || [])]);
+            setNextCursor(res.data.next_cursor || null);
+        } catch (e: any) {
+            setError("No se pudieron cargar más documentos.");
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     useEffect(() => { fetchDocuments(); }, [fetchDocuments]);
 
     const handleDelete = async (doc: KnowledgeDocument) => {
@@ -243,9 +260,17 @@ export function DocumentLibrary() {
                 </Table>
             </div>
 
+            {!isLoading && nextCursor && (
+                <div className="flex justify-center">
+                    <Button variant="outline" size="sm" onClick={loadMore} disabled={isLoadingMore}>
+                        {isLoadingMore ? "Cargando…" : "Cargar más"}
+                    </Button>
+                </div>
+            )}
+
             {!isLoading && filtered.length > 0 && (
                 <p className="text-xs text-muted-foreground text-right">
-                    Mostrando {filtered.length} de {documents.length} documentos
+                    Mostrando {filtered.length} de {documents.length} documentos{nextCursor ? "+" : ""}
                 </p>
             )}
         </div>